@@ -1,219 +1,416 @@
+import functools
+import os
 import streamlit as st
-import pandas as pd
-from src.Backend.snowflake_connection import get_snowflake_connection
-from src.Backend.data_queries import (
-    fetch_sector_list,
-    calculate_top_sectors,
-    fetch_top_companies,
-    fetch_company_list,
-    fetch_timeseries_data,
-    fetch_latest_date
-)
-import plotly.express as px
-import plotly.graph_objects as go
+# Only light modules are imported up front. pandas, plotly and the backend (about a second on a cold start)
+# are imported where they are first used, so the page shell is on screen while they load.
+from src.Backend.query_tracing import traced_render, tracer
 
+COMPANY_DETAIL_PAGE_SIZE = 10
+# Drawn before anything is imported or queried, in page order
+SECTION_TITLES = ["Top 10 Sectors by Position", "Top 25% Companies", "Company Timeseries", "Export Data"]
+# Admin-only panel with per-query timings, cache and pool stats
+SHOW_PERFORMANCE_PANEL = os.getenv('SHOW_PERFORMANCE_PANEL', '0').lower() in ('1', 'true', 'yes')
+PERFORMANCE_PANEL_SPANS = 200
+# Label -> (fetch_price_analytics column, y-axis title, plotly tick format)
+INDICATORS = {
+    "Moving Average": ('ROLLING_MEAN', "Moving Average (USD)", None),
+    "Daily Return": ('DAILY_RETURN', "Daily Return", '.1%'),
+    "Log Return": ('LOG_RETURN', "Log Return", '.3f'),
+    "Rolling Volatility": ('ROLLING_VOLATILITY', "Annualized Volatility", '.0%'),
+    "Drawdown": ('DRAWDOWN', "Drawdown", '.0%'),
+}
+COMPANY_COLUMN_CONFIG = {
+    'TICKER': st.column_config.TextColumn("Ticker"),
+    'SECTOR_NAME': st.column_config.TextColumn("Sector"),
+    'SHARES': st.column_config.NumberColumn("Shares", format="localized"),
+    'LAST_CLOSE_PRICE_USD': st.column_config.NumberColumn("Last Close Price (USD)", format="dollar"),
+    'AVERAGE_POSITION_USD': st.column_config.NumberColumn("Average Position (USD)", format="dollar"),
+}
 
-#add more details to the company information
-def main():
-    st.set_page_config(page_title="BI Dashboard", layout="wide")
-    st.title("BI Dashboard")
-
-    try:
-        conn = get_snowflake_connection()
-        cursor = conn.cursor()
-        st.success("Connected to Snowflake successfully!")
-
-        col1, col2 = st.columns(2)
-
-        with col1:
-            start_date = st.date_input("Start Date", value=pd.to_datetime(fetch_latest_date(cursor)) - pd.Timedelta(days=30))
-            end_date = st.date_input("End Date", value=pd.to_datetime(fetch_latest_date(cursor)))
+@traced_render
+def render_top_sectors(top_sectors, selected_sectors):
+    import plotly.express as px
+    if len(selected_sectors) > 0:
+        if not top_sectors.empty:
+            fig = px.bar(top_sectors, x='TOTAL_POSITION_USD', y='SECTOR_NAME', orientation='h',
+                         labels={'TOTAL_POSITION_USD': 'Total Position (USD)', 'SECTOR_NAME': 'Sector'},
+                         hover_data={'TOTAL_POSITION_USD': ':.2f'},
+                         text='TOTAL_POSITION_USD',
+                         text_auto='.2s',
+                         color='SECTOR_NAME',
+                         color_discrete_sequence=px.colors.qualitative.Plotly)
+            
+            fig.update_layout(title=f"Comparison of {', '.join(selected_sectors)}",
+                              yaxis=dict(autorange="reversed"),
+                              height=500)
+            
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.warning("No data available for the selected sectors.")
+    else:
+        st.warning("Please select at least one sector to compare.")
 
-        with col2:
-            sector_list = fetch_sector_list(cursor)
-            sector_list = ['All'] + sector_list
-            selected_sectors = st.multiselect("Select Sectors to Compare", sector_list, default=['All'])
+@traced_render
+def render_top_companies(top_companies, search_index):
+    import pandas as pd
+    from src.Backend.rolling_window import top_quartile_kpis
+    # KPI Highlights
+    kpis = top_quartile_kpis(top_companies)
+    total_companies = kpis['total_companies']
+    top_sector = kpis['top_sector']
+    largest_position = kpis['largest_position']
 
-            if 'All' in selected_sectors:
-                selected_sectors = sector_list[1:]
+    st.markdown(f"**Total Companies Listed:** {total_companies}")
+    st.markdown(f"**Top Sector by Average Position (USD):** {top_sector}")
+    st.markdown(f"**Largest Position Overall:** ${largest_position:,.2f}")
 
-        # Top 10 Sectors by Position
-        st.header("Top 10 Sectors by Position")
-        if len(selected_sectors) > 0:
-            top_sectors = calculate_top_sectors(cursor, start_date, end_date, selected_sectors)
-            
-            if not top_sectors.empty:
-                fig = px.bar(top_sectors, x='TOTAL_POSITION_USD', y='SECTOR_NAME', orientation='h',
-                             labels={'TOTAL_POSITION_USD': 'Total Position (USD)', 'SECTOR_NAME': 'Sector'},
-                             hover_data={'TOTAL_POSITION_USD': ':.2f'},
-                             text='TOTAL_POSITION_USD',
-                             text_auto='.2s',
-                             color='SECTOR_NAME',
-                             color_discrete_sequence=px.colors.qualitative.Plotly)
-                
-                fig.update_layout(title=f"Comparison of {', '.join(selected_sectors)}",
-                                  yaxis=dict(autorange="reversed"),
-                                  height=500)
-                
-                st.plotly_chart(fig, use_container_width=True)
-            else:
-                st.warning("No data available for the selected sectors.")
-        else:
-            st.warning("Please select at least one sector to compare.")
+    # Multi-select sector filter
+    sector_filter = st.multiselect("Filter by Sector", options=["All"] + top_companies['SECTOR_NAME'].unique().tolist(), default=["All"])
 
-        # Top 25% Companies Table
-        st.header("Top 25% Companies")
-        top_companies = fetch_top_companies(cursor)
+    # Filter companies by selected sectors
+    if "All" in sector_filter:
+        filtered_companies = top_companies
+    else:
+        filtered_companies = top_companies[top_companies['SECTOR_NAME'].isin(sector_filter)]
 
-        # KPI Highlights
-        total_companies = top_companies.shape[0]
-        top_sector = top_companies.groupby('SECTOR_NAME')['AVERAGE_POSITION_USD'].mean().idxmax()
-        largest_position = top_companies['AVERAGE_POSITION_USD'].max()
+    # Search bar for Tickers: ranked exact, prefix and substring matches from the prebuilt index
+    search_term = st.text_input("Search by Ticker or Sector Name")
+    if search_term:
+        matches = search_index.search(search_term)['TICKER'].drop_duplicates()
+        match_rank = pd.Series(range(len(matches)), index=matches.values)
+        filtered_companies = filtered_companies[filtered_companies['TICKER'].isin(match_rank.index)]
+        filtered_companies = filtered_companies.iloc[match_rank[filtered_companies['TICKER']].argsort()]
+        # Close spellings are only offered, never filtered in
+        if filtered_companies.empty:
+            suggestions = search_index.suggest(search_term)
+            if suggestions:
+                st.caption(f"No matches. Did you mean: {', '.join(suggestions)}?")
 
-        st.markdown(f"**Total Companies Listed:** {total_companies}")
-        st.markdown(f"**Top Sector by Average Position (USD):** {top_sector}")
-        st.markdown(f"**Largest Position Overall:** ${largest_position:,.2f}")
+    # Detailed company information is only built once the user asks for it, one page at a time
+    if st.toggle("Detailed Information for Individual Company", key='show_company_details'):
+        render_company_details(filtered_companies)
 
-        # Multi-select sector filter
-        sector_filter = st.multiselect("Filter by Sector", options=["All"] + top_companies['SECTOR_NAME'].unique().tolist(), default=["All"])
+    # Numeric columns stay numeric; formatting is left to the grid, which only renders visible rows
+    st.dataframe(
+        filtered_companies[['TICKER', 'SECTOR_NAME', 'SHARES', 'LAST_CLOSE_PRICE_USD', 'AVERAGE_POSITION_USD']],
+        column_config=COMPANY_COLUMN_CONFIG,
+        hide_index=True,
+        use_container_width=True
+    )
 
-        # Filter companies by selected sectors
-        if "All" in sector_filter:
-            filtered_companies = top_companies
-        else:
-            filtered_companies = top_companies[top_companies['SECTOR_NAME'].isin(sector_filter)]
-
-        # Search bar for Tickers
-        search_term = st.text_input("Search by Ticker or Sector Name")
-        if search_term:
-            filtered_companies = filtered_companies[
-                filtered_companies['TICKER'].str.contains(search_term, case=False) |
-                filtered_companies['SECTOR_NAME'].str.contains(search_term, case=False)
-            ]
-
-        # Format the numerical columns
-        formatted_companies = filtered_companies.copy()
-        formatted_companies['SHARES'] = formatted_companies['SHARES'].map(lambda x: f"{x:,.0f}")
-        formatted_companies['LAST_CLOSE_PRICE_USD'] = formatted_companies['LAST_CLOSE_PRICE_USD'].map(lambda x: f"${x:,.2f}")
-        formatted_companies['AVERAGE_POSITION_USD'] = formatted_companies['AVERAGE_POSITION_USD'].map(lambda x: f"${x:,.2f}")
-
-        # Larger expander for detailed company information
-        with st.expander("Detailed Information for Individual Company", expanded=False):
-            for index, row in formatted_companies.iterrows():
-                st.write(f"### {row['TICKER']} - {row['SECTOR_NAME']}")
-                st.write(f"**Shares:** {row['SHARES']}")
-                st.write(f"**Last Close Price:** {row['LAST_CLOSE_PRICE_USD']}")
-                st.write(f"**Average Position:** {row['AVERAGE_POSITION_USD']}")
-                # Add more details as needed
-                st.write("**CEO Name:** [CEO Name Here]")  # Replace with actual data
-                st.write("**Headquarters:** [Headquarters Here]")  # Replace with actual data
-                st.write("**Latest Earnings:** [Earnings Here]")  # Replace with actual data
-                st.write("---")  # Separator for better readability
-
-        # Optionally, display the formatted companies table
-        st.dataframe(
-            formatted_companies[['TICKER', 'SECTOR_NAME', 'SHARES', 'LAST_CLOSE_PRICE_USD', 'AVERAGE_POSITION_USD']],
-            use_container_width=True
+#add more details to the company information
+@traced_render
+def render_company_details(companies):
+    pages = max(1, -(-len(companies) // COMPANY_DETAIL_PAGE_SIZE))
+    # A narrower filter can leave the remembered page past the end
+    if st.session_state.get('company_detail_page', 1) > pages:
+        st.session_state['company_detail_page'] = pages
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key='company_detail_page')
+    start = (page - 1) * COMPANY_DETAIL_PAGE_SIZE
+    page_companies = companies.iloc[start:start + COMPANY_DETAIL_PAGE_SIZE]
+    for ticker, sector, shares, close, average in zip(page_companies['TICKER'], page_companies['SECTOR_NAME'],
+                                                      page_companies['SHARES'], page_companies['LAST_CLOSE_PRICE_USD'],
+                                                      page_companies['AVERAGE_POSITION_USD']):
+        # Add more details as needed; CEO, headquarters and earnings are placeholders for actual data
+        st.markdown(
+            f"### {ticker} - {sector}\n\n"
+            f"**Shares:** {shares:,.0f}  \n"
+            f"**Last Close Price:** ${close:,.2f}  \n"
+            f"**Average Position:** ${average:,.2f}  \n"
+            "**CEO Name:** [CEO Name Here]  \n"
+            "**Headquarters:** [Headquarters Here]  \n"
+            "**Latest Earnings:** [Earnings Here]\n\n"
+            "---"
         )
 
-        # Company Timeseries Line Chart
-        st.header("Company Timeseries")
+@traced_render
+def render_timeseries(all_timeseries, selected_companies):
+    import plotly.graph_objects as go
+    # Create columns for summary metrics
+    if selected_companies:
+        metrics_cols = st.columns(3)
+        
+        # Initialize figure for plotly
+        fig = go.Figure()
+        
+        # One round trip for every selected ticker, downsampled to the chart width, then split per ticker locally
+        timeseries_by_company = {ticker: group for ticker, group in all_timeseries.groupby('TICKER', sort=False, observed=True)}
 
-        # Allow multiple company selection
-        company_list = fetch_company_list(cursor)
-        selected_companies = st.multiselect("Select Companies to Compare", company_list, default=[company_list[0]])
-
-        # Create columns for summary metrics
-        if selected_companies:
-            metrics_cols = st.columns(3)
+        for company in selected_companies:
+            timeseries_data = timeseries_by_company.get(company, all_timeseries.iloc[0:0])
             
-            # Initialize figure for plotly
-            fig = go.Figure()
+            # Calculate summary statistics
+            highest_price = timeseries_data['CLOSE_USD'].max()
+            lowest_price = timeseries_data['CLOSE_USD'].min()
+            # The chart points are downsampled; the average comes from every close in the range
+            avg_price = timeseries_data['AVERAGE_CLOSE_USD'].max()
             
-            for company in selected_companies:
-                timeseries_data = fetch_timeseries_data(cursor, company)
-                
-                # Calculate summary statistics
-                highest_price = timeseries_data['CLOSE_USD'].max()
-                lowest_price = timeseries_data['CLOSE_USD'].min()
-                avg_price = timeseries_data['CLOSE_USD'].mean()
-                
-                # Display metrics in columns
-                with metrics_cols[0]:
-                    st.metric(f"{company} Highest Price", f"${highest_price:,.2f}")
-                with metrics_cols[1]:
-                    st.metric(f"{company} Lowest Price", f"${lowest_price:,.2f}")
-                with metrics_cols[2]:
-                    st.metric(f"{company} Average Price", f"${avg_price:,.2f}")
-                
-                # Add trace for each company
-                fig.add_trace(go.Scatter(
-                    x=timeseries_data['DATE'],
-                    y=timeseries_data['CLOSE_USD'],
-                    name=company,
-                    mode='lines',
-                ))
+            # Display metrics in columns
+            with metrics_cols[0]:
+                st.metric(f"{company} Highest Price", f"${highest_price:,.2f}")
+            with metrics_cols[1]:
+                st.metric(f"{company} Lowest Price", f"${lowest_price:,.2f}")
+            with metrics_cols[2]:
+                st.metric(f"{company} Average Price", f"${avg_price:,.2f}")
             
-            # Toggle for annotations
-            show_annotations = st.checkbox("Show Key Events")
-            if show_annotations:
-                # Add example annotations - replace with actual events from your data
-                fig.add_annotation(
-                    x=timeseries_data['DATE'].iloc[-1],
-                    y=timeseries_data['CLOSE_USD'].iloc[-1],
-                    text="Latest Price",
-                    showarrow=True,
-                    arrowhead=1,
-                )
-            
-            # Update layout for better visualization
-            fig.update_layout(
-                title="Company Price Comparison",
-                xaxis_title="Date",
-                yaxis_title="Close Price (USD)",
-                hovermode='x unified',
-                height=600,
+            # Add trace for each company
+            fig.add_trace(go.Scatter(
+                x=timeseries_data['DATE'],
+                y=timeseries_data['CLOSE_USD'],
+                name=company,
+                mode='lines',
+            ))
+        
+        # Toggle for annotations
+        show_annotations = st.checkbox("Show Key Events")
+        if show_annotations:
+            # Add example annotations - replace with actual events from your data
+            fig.add_annotation(
+                x=timeseries_data['DATE'].iloc[-1],
+                y=timeseries_data['CLOSE_USD'].iloc[-1],
+                text="Latest Price",
+                showarrow=True,
+                arrowhead=1,
             )
-            
-            # Display the plot
-            st.plotly_chart(fig, use_container_width=True)
-        else:
-            st.warning("Please select at least one company to display")
+        
+        # Update layout for better visualization
+        fig.update_layout(
+            title="Company Price Comparison",
+            xaxis_title="Date",
+            yaxis_title="Close Price (USD)",
+            hovermode='x unified',
+            height=600,
+        )
+        
+        # Display the plot
+        st.plotly_chart(fig, use_container_width=True)
+    else:
+        st.warning("Please select at least one company to display")
+
+#Streamlit fragment: a change to one of its widgets reruns only this section, errors are shown in place
+def section(func):
+    @st.fragment
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            with tracer.span(func.__name__, 'section'):
+                return func(*args, **kwargs)
+        except Exception as e:
+            st.error(f"Error: {str(e)}")
+    return wrapper
+
+@traced_render
+def render_indicator(analytics, indicator):
+    import plotly.express as px
+    from src.Backend.downsampling import downsample_timeseries
+    column, title, tick_format = INDICATORS[indicator]
+    points = downsample_timeseries(analytics[['TICKER', 'DATE', column]], value_column=column)
+    fig = px.line(points, x='DATE', y=column, color='TICKER', labels={column: title, 'DATE': "Date", 'TICKER': "Company"})
+    fig.update_layout(title=indicator, hovermode='x unified', height=400)
+    if tick_format:
+        fig.update_yaxes(tickformat=tick_format)
+    st.plotly_chart(fig, use_container_width=True)
+
+@section
+def top_sectors_section(latest_date, sector_list_future):
+    import pandas as pd
+    from src.Backend.position_matrix import position_engine_queries
+    from src.Backend.query_scheduler import get_query_scheduler
+
+    col1, col2 = st.columns(2)
 
-        # Export Data
-        st.header("Export Data")
+    with col1:
+        start_date = st.date_input("Start Date", value=pd.to_datetime(latest_date) - pd.Timedelta(days=30), key='start_date')
+        end_date = st.date_input("End Date", value=pd.to_datetime(latest_date), key='end_date')
+
+    with col2:
+        sector_list = sector_list_future.result()
+        sector_list = ['All'] + sector_list
+        selected_sectors = st.multiselect("Select Sectors to Compare", sector_list, default=['All'], key='selected_sectors')
+
+        if 'All' in selected_sectors:
+            selected_sectors = sector_list[1:]
+
+    # Top 10 Sectors by Position, answered from memory by the sector x date rollup or the position matrix
+    _, fetch_top_sectors = position_engine_queries()
+    top_sectors = get_query_scheduler().submit(fetch_top_sectors, latest_date, start_date, end_date, selected_sectors).result()
+    render_top_sectors(top_sectors, selected_sectors)
+    st.session_state['export_top_sectors'] = top_sectors
+
+@section
+def top_companies_section(top_companies_future, search_index_future):
+    top_companies = top_companies_future.result()
+    render_top_companies(top_companies, search_index_future.result())
+    st.session_state['export_top_companies'] = top_companies
+
+#`prefetch` is (tickers, future) for the selection known when the page started, if any
+@section
+def timeseries_section(company_list_future, prefetch):
+    from src.Backend.data_queries import fetch_price_analytics, fetch_timeseries_downsampled
+    from src.Backend.query_scheduler import get_query_scheduler
+
+    # Allow multiple company selection
+    company_list = company_list_future.result()
+    selected_companies = st.multiselect("Select Companies to Compare", company_list, default=[company_list[0]], key='selected_companies')
+    if prefetch is not None and prefetch[0] == selected_companies:
+        all_timeseries = prefetch[1].result()
+    else:
+        all_timeseries = get_query_scheduler().submit(fetch_timeseries_downsampled, selected_companies).result()
+
+    # Zooming into a date range re-fetches it at full chart resolution
+    if not all_timeseries.empty:
+        first_date, last_date = all_timeseries['DATE'].min().date(), all_timeseries['DATE'].max().date()
+        zoom = st.session_state.get('timeseries_zoom')
+        if zoom is not None and not (first_date <= zoom[0] <= zoom[1] <= last_date):
+            st.session_state['timeseries_zoom'] = (first_date, last_date)
+        zoom = st.slider("Date Range", min_value=first_date, max_value=last_date, value=(first_date, last_date),
+                         key='timeseries_zoom')
+        if zoom != (first_date, last_date):
+            all_timeseries = get_query_scheduler().submit(fetch_timeseries_downsampled, selected_companies,
+                                                          zoom[0], zoom[1]).result()
+    render_timeseries(all_timeseries, selected_companies)
+
+    # Rolling analytics computed by the warehouse, cached per ticker and window
+    indicator = st.selectbox("Indicator", ["None"] + list(INDICATORS), key='timeseries_indicator')
+    if indicator != "None" and selected_companies:
+        window = st.number_input("Window (trading days)", min_value=2, max_value=260, value=20, step=1, key='timeseries_window')
+        zoom_range = zoom if not all_timeseries.empty else (None, None)
+        analytics = get_query_scheduler().submit(fetch_price_analytics, selected_companies, window, *zoom_range).result()
+        render_indicator(analytics, indicator)
+    st.session_state['export_timeseries_tickers'] = selected_companies
+
+@section
+def export_section():
+    import pandas as pd
+    from src.Backend.exports import EXPORT_FORMATS, export_file_name, export_frame, export_timeseries
+    from src.Backend.query_scheduler import get_query_scheduler
+
+    # Offers what the sections above last rendered
+    col1, col2 = st.columns(2)
+    with col1:
         export_option = st.selectbox("Select Data to Export", ["Top 25% Companies", "Company Timeseries", "Top 10 Sectors"])
+    with col2:
+        export_format = st.selectbox("Format", list(EXPORT_FORMATS), format_func=lambda fmt: EXPORT_FORMATS[fmt].label)
 
-        if export_option == "Top 25% Companies":
-            st.download_button(
-                label="Export to CSV",
-                data=top_companies.to_csv(index=False),
-                file_name=f"{export_option}.csv",
-                mime="text/csv"
-            )
-        elif export_option == "Company Timeseries":
-            st.download_button(
-                label="Export to CSV",
-                data=timeseries_data.to_csv(index=False),
-                file_name=f"{selected_company}_timeseries.csv",
-                mime="text/csv"
-            )
-        elif export_option == "Top 10 Sectors":
-            st.download_button(
-                label="Export to CSV",
-                data=top_sectors.to_csv(index=False),
-                file_name="Top_10_Sectors.csv",
-                mime="text/csv"
-            )
+    if export_option == "Company Timeseries":
+        tickers = st.session_state.get('export_timeseries_tickers') or []
+        if not tickers:
+            st.info("Select companies in the timeseries section to export their history.")
+            return
+        st.caption(f"Full daily close price history of {', '.join(tickers)}")
+        request = (export_option, export_format, tuple(tickers))
+        file_name = export_file_name("Company Timeseries", export_format, tickers)
+    else:
+        frame = st.session_state.get('export_top_companies' if export_option == "Top 25% Companies" else 'export_top_sectors')
+        if frame is None:
+            st.info("Nothing to export yet.")
+            return
+        request = (export_option, export_format, int(pd.util.hash_pandas_object(frame, index=False).sum()))
+        file_name = export_file_name(export_option, export_format)
+
+    # Files are only generated on request, written to disk batch by batch, and then served from there
+    prepared = st.session_state.get('export_prepared')
+    if prepared is None or prepared[0] != request or not os.path.exists(prepared[1]):
+        prepared = None
+        if st.button("Prepare Export", key='export_prepare'):
+            with st.spinner("Generating export..."):
+                if export_option == "Company Timeseries":
+                    path = get_query_scheduler().submit(export_timeseries, tickers, export_format).result()
+                else:
+                    path = export_frame(frame, export_format, export_option)
+            prepared = (request, str(path))
+            st.session_state['export_prepared'] = prepared
+    if prepared is not None:
+        with open(prepared[1], 'rb') as export_file:
+            st.download_button(label=f"Download {EXPORT_FORMATS[export_format].label}", data=export_file,
+                               file_name=file_name, mime=EXPORT_FORMATS[export_format].mime)
+
+@section
+def performance_section():
+    from src.Backend.data_queries import query_cache
+    from src.Backend.query_tracing import export_spans, spans_frame, summarize_spans
+    from src.Backend.snowflake_connection import get_connection_pool
+
+    st.button("Refresh", key='performance_refresh')
+    spans = tracer.finished(PERFORMANCE_PANEL_SPANS)
+    frame = spans_frame(spans)
+    st.subheader("Query functions")
+    st.dataframe(summarize_spans(frame), hide_index=True, use_container_width=True)
+    st.subheader("Recent spans")
+    st.dataframe(frame, hide_index=True, use_container_width=True)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**Query cache**")
+        st.json(query_cache.stats(), expanded=False)
+    with col2:
+        st.markdown("**Connection pool**")
+        st.json(get_connection_pool().stats(), expanded=False)
+    st.download_button("Export spans (OpenTelemetry JSON lines)", data=export_spans(spans),
+                       file_name="spans.jsonl", mime="application/x-ndjson")
+
+def main():
+    st.set_page_config(page_title="BI Dashboard", layout="wide")
+    st.title("BI Dashboard")
+    status = st.empty()
+    # The page shell: every section's place and header, sent before any import or query
+    containers = []
+    for title in SECTION_TITLES:
+        containers.append(st.container())
+        containers[-1].header(title)
+
+    try:
+        with tracer.span('page', 'page'):
+            with status, st.spinner("Loading..."):
+                from src.Backend.data_queries import (
+                    fetch_company_list, fetch_latest_date, fetch_sector_list, fetch_timeseries_downsampled
+                )
+                from src.Backend.position_matrix import position_engine_queries
+                from src.Backend.query_scheduler import as_ready, get_query_scheduler
+                from src.Backend.search_index import fetch_company_search_index
+                from src.Backend.snowflake_connection import BACKEND_NAMES, DATA_BACKEND
+                from src.Backend.warmup import start_warm_up
+
+                # Once per process: opens the pool's connections and fills the critical caches in the background
+                start_warm_up()
+
+                # Independent queries run concurrently on pooled connections; each section waits only for its own
+                scheduler = get_query_scheduler()
+                latest_date_future = scheduler.submit(fetch_latest_date)
+                sector_list_future = scheduler.submit(fetch_sector_list)
+                fetch_top_companies, _ = position_engine_queries()
+                top_companies_future = scheduler.submit(fetch_top_companies)
+                company_list_future = scheduler.submit(fetch_company_list)
+                search_index_future = scheduler.submit(fetch_company_search_index)
+                selected_companies = st.session_state.get('selected_companies')
+                timeseries_prefetch = None
+                if selected_companies is not None:
+                    timeseries_prefetch = (selected_companies, scheduler.submit(fetch_timeseries_downsampled, selected_companies))
+
+                latest_date = latest_date_future.result()
+            status.success(f"Connected to {BACKEND_NAMES[DATA_BACKEND]} successfully!")
+
+            # Each section is a fragment: changing a widget reruns that section only, not the whole page.
+            # A section is drawn in its place as soon as the queries it needs have finished, whatever its position.
+            sections = {
+                0: ([sector_list_future], functools.partial(top_sectors_section, latest_date, sector_list_future)),
+                1: ([top_companies_future, search_index_future],
+                    functools.partial(top_companies_section, top_companies_future, search_index_future)),
+                2: ([company_list_future] + ([timeseries_prefetch[1]] if timeseries_prefetch else []),
+                    functools.partial(timeseries_section, company_list_future, timeseries_prefetch)),
+            }
+            for index in as_ready({index: futures for index, (futures, _) in sections.items()}):
+                with containers[index]:
+                    sections[index][1]()
+            # Last: it offers what the other sections rendered
+            with containers[3]:
+                export_section()
 
     except Exception as e:
         st.error(f"Error: {str(e)}")
 
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
+    if SHOW_PERFORMANCE_PANEL:
+        with st.expander("Performance"):
+            performance_section()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
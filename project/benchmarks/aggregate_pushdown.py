@@ -0,0 +1,45 @@
+#Benchmark: client-side groupby over the full daily position vs SQL aggregate pushdown
+#Usage: python benchmarks/aggregate_pushdown.py [companies] [days]
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.Backend.data_queries import calculate_daily_position, fetch_company_sectors, fetch_position_aggregate, query_cache
+from local_engine import create_source, local_cursor
+
+def client_daily_total(cursor):
+    df = calculate_daily_position(cursor)
+    return df, df.groupby('DATE')['DAILY_POSITION_USD'].sum().reset_index()
+
+def client_sector_daily(cursor):
+    df = calculate_daily_position(cursor)
+    df['SECTOR_NAME'] = df['COMPANY_ID'].map(fetch_company_sectors(cursor))
+    return df, df.groupby(['DATE', 'SECTOR_NAME'], observed=True)['DAILY_POSITION_USD'].sum().reset_index()
+
+def pushdown(grain):
+    def run(cursor):
+        df = fetch_position_aggregate(cursor, grain)
+        return df, df
+    return run
+
+def measure(name, func, cursor, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        # Every repeat pays for its queries instead of reading the query cache
+        query_cache.clear()
+        start = time.perf_counter()
+        transferred, result = func(cursor)
+        timings.append(time.perf_counter() - start)
+    mb = transferred.memory_usage(deep=True).sum() / 1e6
+    print(f"{name:<22} {min(timings):8.3f}s  rows transferred {len(transferred):>10,}  ({mb:8.1f} MB)  result rows {len(result):>8,}")
+
+if __name__ == "__main__":
+    companies = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 750
+    cursor = local_cursor(create_source(companies, days))
+    print(f"{companies:,} companies x {days:,} days")
+    measure("client groupby date", client_daily_total, cursor)
+    measure("pushdown date", pushdown('date'), cursor)
+    measure("client groupby sector", client_sector_daily, cursor)
+    measure("pushdown sector_date", pushdown('sector_date'), cursor)
@@ -0,0 +1,71 @@
+#Benchmark: tuple fetchall() vs Arrow batch materialization for a daily-position sized result
+#Usage: python benchmarks/arrow_fetch.py [rows]
+import sys
+import time
+import tracemalloc
+from decimal import Decimal
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.Backend.data_queries import _fetch_dataframe
+
+BATCH_ROWS = 100_000
+
+#Stands in for a SnowflakeCursor holding an executed result set
+class FakeCursor:
+    def __init__(self, table: pa.Table):
+        self._table = table
+        self.description = [(name,) for name in table.column_names]
+
+    def fetchall(self):
+        # The connector hands back one Python object per cell (Decimal for NUMBER columns)
+        columns = [column.to_pylist() for column in self._table.columns]
+        return list(zip(*columns))
+
+    def fetch_arrow_batches(self):
+        for offset in range(0, self._table.num_rows, BATCH_ROWS):
+            yield self._table.slice(offset, BATCH_ROWS)
+
+def build_result(rows: int) -> pa.Table:
+    rng = np.random.default_rng(42)
+    shares = rng.integers(0, 1_000_000, rows)
+    close = np.round(rng.uniform(1, 500, rows), 4)
+    dates = pd.date_range('2000-01-01', periods=rows // 500 + 1, freq='D').values.astype('datetime64[D]')
+    return pa.table({
+        'COMPANY_ID': pa.array(np.arange(rows) % 500, pa.int64()),
+        'DATE': pa.array(np.repeat(dates, 500)[:rows], pa.date32()),
+        'SHARES': pa.array([Decimal(int(x)) for x in shares], pa.decimal128(38, 0)),
+        'CLOSE_USD': pa.array([Decimal(str(x)) for x in close], pa.decimal128(38, 4)),
+        'DAILY_POSITION_USD': pa.array(shares * close, pa.float64()),
+    })
+
+def tuple_path(cursor: FakeCursor) -> pd.DataFrame:
+    results = cursor.fetchall()
+    columns = [desc[0] for desc in cursor.description]
+    return pd.DataFrame(results, columns=columns)
+
+def arrow_path(cursor: FakeCursor) -> pd.DataFrame:
+    return _fetch_dataframe(cursor)
+
+def measure(name: str, func, table: pa.Table):
+    cursor = FakeCursor(table)
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = func(cursor)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    frame_mb = df.memory_usage(deep=True).sum() / 1e6
+    print(f"{name:<8} {elapsed:8.3f}s  peak python alloc {peak / 1e6:9.1f} MB  frame {frame_mb:9.1f} MB")
+    print(f"         dtypes: {', '.join(f'{c}={t}' for c, t in df.dtypes.items())}")
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    table = build_result(rows)
+    print(f"{rows:,} rows")
+    measure("tuples", tuple_path, table)
+    measure("arrow", arrow_path, table)
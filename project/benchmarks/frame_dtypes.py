@@ -0,0 +1,43 @@
+#Benchmark: memory and groupby time of daily-position sized frames with TICKER / SECTOR_NAME as Python strings
+#vs as categoricals of the company dimension (what the query functions now return)
+#Usage: python benchmarks/frame_dtypes.py [companies] [days]
+import sys
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.Backend.data_queries import calculate_daily_position, fetch_company_sectors, fetch_position_aggregate
+from src.Backend.dtypes import CATEGORICAL_COLUMNS
+from local_engine import create_source, local_cursor
+
+#The full daily position with each row's sector, as a client-side sector breakdown needs it
+def sector_daily_position(cursor) -> pd.DataFrame:
+    df = calculate_daily_position(cursor)
+    return df.assign(SECTOR_NAME=df['COMPANY_ID'].map(fetch_company_sectors(cursor)))
+
+def as_strings(frame: pd.DataFrame) -> pd.DataFrame:
+    return frame.astype({column: object for column in CATEGORICAL_COLUMNS if column in frame})
+
+def best_of(func, repeat=5) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def compare(name, frame: pd.DataFrame, keys, value_column):
+    for label, variant in (("strings", as_strings(frame)), ("categorical", frame)):
+        mb = variant.memory_usage(deep=True).sum() / 1e6
+        seconds = best_of(lambda: variant.groupby(keys, observed=True, sort=False)[value_column].sum())
+        print(f"{name:<28} {label:<12} {mb:8.1f} MB  groupby {seconds:8.3f}s")
+
+if __name__ == "__main__":
+    companies = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 750
+    cursor = local_cursor(create_source(companies, days))
+    print(f"{companies:,} companies x {days:,} days")
+    compare("daily position by sector", sector_daily_position(cursor), ['DATE', 'SECTOR_NAME'], 'DAILY_POSITION_USD')
+    compare("company_date by ticker", fetch_position_aggregate(cursor, 'company_date'), ['TICKER'], 'TOTAL_POSITION_USD')
@@ -0,0 +1,45 @@
+#Benchmark: cold import time of app.py (what runs before the page shell is drawn) and of the backend modules
+#it defers, each in a fresh interpreter, with the slowest imports from `python -X importtime`
+#Usage: python benchmarks/import_time.py [runs]
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, Tuple
+
+PROJECT_DIR = Path(__file__).resolve().parents[1]
+
+# Loading app.py as a module runs its imports but not main()
+TARGETS = {
+    'app.py shell': "import importlib.util as u; s = u.spec_from_file_location('app', 'app.py'); s.loader.exec_module(u.module_from_spec(s))",
+    'streamlit': "import streamlit",
+    'src.Backend.data_queries': "import src.Backend.data_queries",
+    'src.Backend.warmup': "import src.Backend.warmup",
+    'plotly.express': "import plotly.express",
+    'snowflake.connector': "import snowflake.connector",
+}
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+#Seconds spent importing for `code`, and its top-level imports with their cumulative microseconds.
+#Imports the interpreter makes on its own start-up (site, encodings, ...) are left out.
+def run(code: str, startup: frozenset = frozenset()) -> Tuple[float, List[Tuple[str, int]]]:
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=PROJECT_DIR,
+                            capture_output=True, text=True, check=True, env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'})
+    # Top-level imports only: their cumulative times add up to the whole
+    imports = [(match.group(4), int(match.group(2))) for match in map(IMPORTTIME_LINE.match, result.stderr.splitlines())
+               if match and len(match.group(3)) == 1 and match.group(4) not in startup]
+    return sum(us for _, us in imports) / 1e6, imports
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    startup = frozenset(module for module, _ in run("pass")[1])
+    for name, code in TARGETS.items():
+        timings = []
+        for _ in range(runs):
+            seconds, imports = run(code, startup)
+            timings.append(seconds)
+        slowest = sorted(imports, key=lambda item: -item[1])[:3]
+        print(f"{name:<26} {statistics.median(timings):7.3f}s  (min {min(timings):.3f}s)  "
+              f"slowest: {', '.join(f'{module} {us / 1e6:.2f}s' for module, us in slowest)}")
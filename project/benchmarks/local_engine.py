@@ -0,0 +1,56 @@
+#In-process DuckDB stand-in for the Snowflake source schema, used by the benchmarks
+import sys
+from pathlib import Path
+from typing import Dict
+import duckdb
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.Backend.duckdb_backend import DuckDBConnection, DuckDBCursor
+from src.Backend.materialization import refresh_daily_position
+
+SECTORS = ['Technology', 'Energy', 'Financials', 'Health Care', 'Industrials',
+           'Utilities', 'Materials', 'Real Estate', 'Consumer Staples', 'Communication']
+TRADING_DAYS_PER_YEAR = 252
+
+#Synthetic source.company/price/position frames: one price and one position row per company and business
+#day up to `end_date`. The same (companies, days, seed) always produces the same values.
+def generate_source(companies: int = 500, days: int = 750, seed: int = 42,
+                    end_date='2024-12-31') -> Dict[str, pd.DataFrame]:
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(end=pd.Timestamp(end_date).normalize(), periods=days)
+    company_ids = np.arange(1, companies + 1)
+    company = pd.DataFrame({
+        'ID': company_ids,
+        'TICKER': [f'TCK{i:05d}' for i in company_ids],
+        'SECTOR_NAME': rng.choice(SECTORS, companies),
+    })
+    ids = np.repeat(company_ids, days)
+    all_dates = np.tile(dates.values, companies)
+    returns = rng.normal(0, 0.02, (companies, days))
+    close = (rng.uniform(5, 500, (companies, 1)) * np.exp(np.cumsum(returns, axis=1))).ravel()
+    price = pd.DataFrame({'COMPANY_ID': ids, 'DATE': all_dates, 'CLOSE_USD': close.round(4)})
+    position = pd.DataFrame({'COMPANY_ID': ids, 'DATE': all_dates,
+                             'SHARES': rng.integers(0, 1_000_000, companies * days)})
+    return {'company': company, 'price': price, 'position': position}
+
+#Business days covering `years` of history
+def trading_days(years: float) -> int:
+    return max(int(round(years * TRADING_DAYS_PER_YEAR)), 1)
+
+#DuckDB database holding the generated source tables and the materialized daily position
+def create_source(companies: int = 500, days: int = 750, seed: int = 42, end_date='2024-12-31') -> DuckDBConnection:
+    conn = duckdb.connect()
+    conn.execute("CREATE SCHEMA source")
+    for name, frame in generate_source(companies, days, seed, end_date).items():
+        conn.register(f'{name}_frame', frame)
+        columns = "* REPLACE (CAST(DATE AS DATE) AS DATE)" if 'DATE' in frame else "*"
+        conn.execute(f"CREATE TABLE source.{name} AS SELECT {columns} FROM {name}_frame")
+        conn.unregister(f'{name}_frame')
+    connection = DuckDBConnection(conn)
+    refresh_daily_position(connection.cursor())
+    return connection
+
+def local_cursor(conn: DuckDBConnection) -> DuckDBCursor:
+    return conn.cursor()
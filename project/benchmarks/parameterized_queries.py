@@ -0,0 +1,68 @@
+#Benchmark: f-string SQL vs bound, normalized parameters for the top-sectors query.
+#Replays a workload of sector/date selections and reports how many distinct query texts each
+#approach produces, the result-cache hit ratio that implies and the latency on the backend.
+#Usage: python benchmarks/parameterized_queries.py [requests] [--snowflake]
+#With --snowflake it runs against the warehouse and also prints QUERY_HISTORY stats.
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.Backend.data_queries import build_position_aggregate_query, fetch_result_cache_stats, _query_dataframe
+from src.Backend.materialization import DAILY_POSITION_TABLE
+from src.Backend.snowflake_connection import QUERY_TAG, get_snowflake_connection
+from local_engine import SECTORS, create_source
+
+DATE_RANGES = [('2024-11-01', '2024-11-30'), ('2024-12-01', '2024-12-31'), ('2024-10-01', '2024-12-31')]
+
+#The SQL calculate_top_sectors used to build, with every value spliced into the text
+def fstring_query(start_date, end_date, sectors):
+    return f"""
+    SELECT SECTOR_NAME, SUM(DAILY_POSITION_USD) AS TOTAL_POSITION_USD
+    FROM {DAILY_POSITION_TABLE}
+    WHERE DATE BETWEEN '{start_date}' AND '{end_date}'
+        AND SECTOR_NAME IN ({','.join([f"'{sector}'" for sector in sectors])})
+    GROUP BY SECTOR_NAME
+    ORDER BY TOTAL_POSITION_USD DESC
+    LIMIT 10
+    """, None
+
+def bound_query(start_date, end_date, sectors):
+    return build_position_aggregate_query('sector', start_date, end_date, sectors, limit=10)
+
+#The same handful of logical requests, with sectors picked in whatever order the user clicked them
+def workload(requests: int, seed: int = 7):
+    rng = random.Random(seed)
+    choices = [rng.sample(SECTORS, rng.randint(1, 4)) for _ in range(6)]
+    for _ in range(requests):
+        sectors = list(rng.choice(choices))
+        rng.shuffle(sectors)
+        yield (*rng.choice(DATE_RANGES), sectors)
+
+def replay(name, build, cursor, requests):
+    texts, results, timings = set(), set(), []
+    for start_date, end_date, sectors in workload(requests):
+        query, params = build(start_date, end_date, sectors)
+        texts.add(query)
+        # A result cache can only serve a request whose text and bound values were seen before
+        results.add((query, tuple(params or ())))
+        start = time.perf_counter()
+        _query_dataframe(cursor, query, params)
+        timings.append(time.perf_counter() - start)
+    hit_ratio = 1 - len(results) / requests
+    print(f"{name:<8} distinct texts {len(texts):>4}  distinct requests {len(results):>4}  "
+          f"cacheable hit ratio {hit_ratio:6.1%}  mean latency {sum(timings) / len(timings) * 1000:7.2f} ms")
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    use_snowflake = '--snowflake' in sys.argv[1:]
+    requests = int(args[0]) if args else 200
+    conn = get_snowflake_connection() if use_snowflake else create_source(300, 250)
+    cursor = conn.cursor()
+    replay("f-string", fstring_query, cursor, requests)
+    replay("bound", bound_query, cursor, requests)
+    if use_snowflake:
+        stats = fetch_result_cache_stats(cursor, QUERY_TAG, hours=1)
+        print(f"QUERY_HISTORY hit ratio: {stats['RESULT_CACHE_HITS'].sum() / max(stats['EXECUTIONS'].sum(), 1):.1%}")
+        print(stats[['EXECUTIONS', 'RESULT_CACHE_HITS', 'AVG_ELAPSED_MS']].head(10))
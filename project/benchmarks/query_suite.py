@@ -0,0 +1,352 @@
+#Benchmark harness: times every data_queries function and the end-to-end app render against a generated
+#DuckDB source, records latency, rows transferred and peak memory, and flags regressions against the last run.
+#Usage: python benchmarks/query_suite.py [--companies N] [--years Y] [--baseline FILE] [--update-baseline] [--skip-app]
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import wait
+from contextlib import contextmanager
+from datetime import date, datetime
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+RESULTS_DIR = BENCHMARKS_DIR / 'results'
+# Cleared and refilled with generated data on every run, so never the developer's LOCAL_CACHE_DIR
+SOURCE_CACHE_DIR = BENCHMARKS_DIR / '.cache' / 'source'
+
+# The app reads these at import, so they have to be set before anything from src is loaded
+os.environ['DATA_BACKEND'] = 'duckdb'
+os.environ['LOCAL_CACHE_DIR'] = str(SOURCE_CACHE_DIR)
+
+sys.path.insert(0, str(BENCHMARKS_DIR.parent))
+import pandas as pd
+import pyarrow as pa
+from src.Backend import position_matrix, rolling_window, sector_rollup, warmup
+from src.Backend.analytics import price_analytics
+from src.Backend.data_queries import (
+    calculate_daily_position, calculate_top_sectors, fetch_companies, fetch_company_list, fetch_company_sectors,
+    fetch_latest_date, fetch_latest_positions, fetch_position_aggregate, fetch_price_analytics, fetch_sector_list,
+    fetch_timeseries_batch, fetch_timeseries_downsampled, fetch_top_companies, fetch_top_quartile_positions,
+    iter_daily_position, query_cache, reset_company_dimension
+)
+from src.Backend.duckdb_backend import DuckDBCursor
+from src.Backend.local_cache import LocalSourceCache
+from src.Backend.position_matrix import PositionMatrix
+from src.Backend.rolling_window import RollingPositionWindow
+from src.Backend.search_index import fetch_company_search_index
+from src.Backend.sector_rollup import SectorRollup
+from local_engine import create_source, local_cursor, trading_days
+
+APP_PATH = BENCHMARKS_DIR.parent / 'app.py'
+TIMESERIES_TICKERS = 10
+ANALYTICS_WINDOW = 20
+# Slower by more than this fraction (and by more than the noise floor) counts as a regression
+DEFAULT_TOLERANCE = 0.2
+NOISE_FLOOR_S = 0.01
+NOISE_FLOOR_MB = 1
+MEMORY_SAMPLE_INTERVAL_S = 0.002
+
+#Arguments shared by the benchmarks, taken from the generated data
+class Context(NamedTuple):
+    latest_date: str
+    year_ago: str
+    sectors: List[str]
+    tickers: List[str]
+
+class Case(NamedTuple):
+    name: str
+    run: Callable  # (cursor, Context) -> result
+
+CASES: List[Case] = [
+    Case('calculate_daily_position', lambda cursor, ctx: calculate_daily_position(cursor)),
+    Case('iter_daily_position', lambda cursor, ctx: sum(len(batch) for batch in iter_daily_position(cursor))),
+    Case('fetch_company_sectors', lambda cursor, ctx: fetch_company_sectors(cursor)),
+    *[Case(f'fetch_position_aggregate[{grain}]', lambda cursor, ctx, grain=grain: fetch_position_aggregate(cursor, grain))
+      for grain in ('date', 'sector', 'sector_date', 'company_date')],
+    Case('calculate_top_sectors', lambda cursor, ctx: calculate_top_sectors(cursor, ctx.year_ago, ctx.latest_date, ctx.sectors)),
+    Case('sector_rollup.top_sectors', lambda cursor, ctx: SectorRollup.load(cursor).top_sectors(ctx.year_ago, ctx.latest_date, ctx.sectors)),
+    Case('position_matrix.top_sectors', lambda cursor, ctx: PositionMatrix.load(cursor).top_sectors(ctx.year_ago, ctx.latest_date, ctx.sectors)),
+    Case('fetch_top_companies', lambda cursor, ctx: fetch_top_companies(cursor)),
+    Case('fetch_top_quartile_positions', lambda cursor, ctx: fetch_top_quartile_positions(cursor)),
+    Case('fetch_latest_positions', lambda cursor, ctx: fetch_latest_positions(cursor)),
+    Case('rolling_window.top_quartile', lambda cursor, ctx: _rolling_top_quartile(cursor, ctx.latest_date)),
+    Case('position_matrix.top_companies', lambda cursor, ctx: PositionMatrix.load(cursor).top_companies()),
+    Case('fetch_company_list', lambda cursor, ctx: fetch_company_list(cursor)),
+    Case('fetch_companies', lambda cursor, ctx: fetch_companies(cursor)),
+    Case('fetch_company_search_index', lambda cursor, ctx: fetch_company_search_index(cursor)),
+    Case('fetch_sector_list', lambda cursor, ctx: fetch_sector_list(cursor)),
+    Case('fetch_latest_date', lambda cursor, ctx: fetch_latest_date(cursor)),
+    Case('fetch_timeseries_batch', lambda cursor, ctx: fetch_timeseries_batch(cursor, ctx.tickers)),
+    Case('fetch_timeseries_batch[wide]', lambda cursor, ctx: fetch_timeseries_batch(cursor, ctx.tickers, wide=True)),
+    Case('fetch_timeseries_downsampled', lambda cursor, ctx: fetch_timeseries_downsampled(cursor, ctx.tickers)),
+    Case('fetch_price_analytics', lambda cursor, ctx: fetch_price_analytics(cursor, ctx.tickers, ANALYTICS_WINDOW)),
+    Case('analytics.price_analytics', lambda cursor, ctx: price_analytics(cursor, ctx.tickers, ANALYTICS_WINDOW)),
+]
+
+def _rolling_top_quartile(cursor, latest_date: str) -> pd.DataFrame:
+    window = RollingPositionWindow()
+    window.refresh(cursor, latest_date)
+    return window.top_quartile()
+
+#Counts the rows every DuckDB cursor in the process hands back, including those of the app's pooled connections
+class RowCounter:
+    def __init__(self):
+        self.rows = 0
+        self._lock = threading.Lock()
+
+    def add(self, rows: int):
+        with self._lock:
+            self.rows += rows
+
+    @contextmanager
+    def counting(self):
+        fetch_arrow_batches, fetchall, fetchone = DuckDBCursor.fetch_arrow_batches, DuckDBCursor.fetchall, DuckDBCursor.fetchone
+        counter = self
+
+        def counted_batches(cursor):
+            for batch in fetch_arrow_batches(cursor):
+                counter.add(batch.num_rows)
+                yield batch
+
+        def counted_fetchall(cursor):
+            rows = fetchall(cursor)
+            counter.add(len(rows))
+            return rows
+
+        def counted_fetchone(cursor):
+            row = fetchone(cursor)
+            counter.add(row is not None)
+            return row
+
+        DuckDBCursor.fetch_arrow_batches, DuckDBCursor.fetchall, DuckDBCursor.fetchone = counted_batches, counted_fetchall, counted_fetchone
+        try:
+            yield self
+        finally:
+            DuckDBCursor.fetch_arrow_batches, DuckDBCursor.fetchall, DuckDBCursor.fetchone = fetch_arrow_batches, fetchall, fetchone
+
+#Drop every cached result and in-memory structure so each run pays for its queries
+def reset_caches():
+    query_cache.clear()
+    reset_company_dimension()
+    with rolling_window._window_lock:
+        rolling_window._window = None
+    with sector_rollup._rollup_lock:
+        sector_rollup._rollup = None
+    with position_matrix._matrix_lock:
+        position_matrix._matrix = None
+    # The next app render starts the warm-up again, as a fresh process would
+    with warmup._warm_up_lock:
+        if warmup._warm_up:
+            wait(warmup._warm_up.values())
+        warmup._warm_up = None
+
+#Peaks sampled from a background thread while running: bytes held by Arrow's memory pool (query results
+#before and after their conversion to pandas) and the resident set size from /proc, which also covers
+#DuckDB's own memory (None where /proc is not available). tracemalloc sees neither.
+class MemorySampler:
+    def __init__(self, interval: float = MEMORY_SAMPLE_INTERVAL_S):
+        self.interval = interval
+        self.start_arrow = self.peak_arrow = pa.total_allocated_bytes()
+        self.start_rss = self.peak_rss = _current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def __enter__(self) -> "MemorySampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    @property
+    def arrow_mb(self) -> float:
+        return round((self.peak_arrow - self.start_arrow) / 1e6, 2)
+
+    @property
+    def rss_growth_mb(self) -> Optional[float]:
+        return None if self.start_rss is None else round((self.peak_rss - self.start_rss) / 1e6, 2)
+
+    def _sample(self):
+        while True:
+            self.peak_arrow = max(self.peak_arrow, pa.total_allocated_bytes())
+            if self.start_rss is not None:
+                self.peak_rss = max(self.peak_rss, _current_rss())
+            if self._stop.wait(self.interval):
+                break
+
+def _current_rss() -> Optional[int]:
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+#Time `func` `repeat` times from cold caches, then once more for memory: the peak Python heap from
+#tracemalloc plus the MemorySampler peaks. Tracing is kept out of the timed runs.
+def measure(func: Callable, repeat: int) -> Dict[str, float]:
+    timings = []
+    counter = RowCounter()
+    for _ in range(repeat):
+        reset_caches()
+        counter.rows = 0
+        with counter.counting():
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+    reset_caches()
+    tracemalloc.start()
+    try:
+        with MemorySampler() as sampled:
+            func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'min_s': round(min(timings), 5),
+        'median_s': round(statistics.median(timings), 5),
+        'rows': counter.rows,
+        'peak_mb': round(peak / 1e6, 2),
+        'arrow_peak_mb': sampled.arrow_mb,
+        'rss_growth_mb': sampled.rss_growth_mb,
+    }
+
+#Build the source at the requested scale and mirror it into the Parquet cache the app's DuckDB backend reads
+def prepare_source(companies: int, years: float, seed: int, end_date: date):
+    conn = create_source(companies, trading_days(years), seed, end_date)
+    cache = LocalSourceCache(str(SOURCE_CACHE_DIR))
+    cache.clear()
+    cache.sync(local_cursor(conn))
+    return conn
+
+def build_context(cursor) -> Context:
+    latest_date = fetch_latest_date(cursor)
+    tickers = fetch_company_list(cursor)[:TIMESERIES_TICKERS]
+    year_ago = (pd.Timestamp(latest_date) - pd.DateOffset(years=1)).strftime('%Y-%m-%d')
+    return Context(latest_date, year_ago, fetch_sector_list(cursor), tickers)
+
+def run_queries(cursor, ctx: Context, repeat: int, names: Optional[List[str]] = None) -> Dict[str, dict]:
+    results = {}
+    for case in CASES:
+        if names and case.name not in names:
+            continue
+        results[case.name] = measure(lambda: case.run(cursor, ctx), repeat)
+        print(_format_row(case.name, results[case.name]))
+    return results
+
+#Render app.py headless with Streamlit's AppTest: `app.main[cold]` from empty caches, `app.main[warm]` a rerun
+def run_app(repeat: int) -> Dict[str, dict]:
+    from streamlit.testing.v1 import AppTest
+
+    def render(app=None):
+        app = app or AppTest.from_file(str(APP_PATH), default_timeout=600)
+        app.run()
+        failures = [element.value for element in [*app.exception, *app.error]]
+        if failures:
+            raise RuntimeError(f"app.py failed to render: {failures[0]}")
+        return app
+
+    results = {'app.main[cold]': measure(render, repeat)}
+    print(_format_row('app.main[cold]', results['app.main[cold]']))
+    # A rerun of a rendered session: what every widget interaction outside a fragment costs
+    warm = render()
+    timings, counter = [], RowCounter()
+    with counter.counting():
+        for _ in range(repeat):
+            start = time.perf_counter()
+            render(warm)
+            timings.append(time.perf_counter() - start)
+    results['app.main[warm]'] = {'min_s': round(min(timings), 5), 'median_s': round(statistics.median(timings), 5),
+                                 'rows': counter.rows // repeat, 'peak_mb': None,
+                                 'arrow_peak_mb': None, 'rss_growth_mb': None}
+    print(_format_row('app.main[warm]', results['app.main[warm]']))
+    return results
+
+#Benchmarks that got slower, bigger or started moving a different number of rows since `baseline`
+def find_regressions(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if (current['min_s'] > previous['min_s'] * (1 + tolerance)
+                and current['min_s'] - previous['min_s'] > NOISE_FLOOR_S):
+            regressions.append(f"{name}: {previous['min_s']:.3f}s -> {current['min_s']:.3f}s")
+        # RSS growth is reported only: it depends on what the allocator kept from earlier benchmarks
+        for key, label in (('peak_mb', 'peak heap'), ('arrow_peak_mb', 'peak Arrow')):
+            now, before = current.get(key), previous.get(key)
+            if now is not None and before is not None and now > before * (1 + tolerance) and now - before > NOISE_FLOOR_MB:
+                regressions.append(f"{name}: {label} {before:.1f} MB -> {now:.1f} MB")
+        if current['rows'] != previous['rows']:
+            regressions.append(f"{name}: rows transferred {previous['rows']:,} -> {current['rows']:,}")
+    return regressions
+
+def _format_row(name: str, result: dict) -> str:
+    heap, arrow, rss = (f"{result[key]:7.1f} MB" if result[key] is not None else f"{'-':>7}   "
+                        for key in ('peak_mb', 'arrow_peak_mb', 'rss_growth_mb'))
+    return (f"{name:<40} {result['min_s']:7.3f}s  median {result['median_s']:7.3f}s  rows {result['rows']:>11,}"
+            f"  heap {heap}  arrow {arrow}  rss +{rss}")
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the query layer and the app render on generated data.")
+    parser.add_argument('--companies', type=int, default=500, help="companies in the generated source")
+    parser.add_argument('--years', type=float, default=3, help="years of daily prices and positions per company")
+    parser.add_argument('--seed', type=int, default=42, help="generator seed")
+    parser.add_argument('--repeat', type=int, default=3, help="timed runs per benchmark")
+    parser.add_argument('--only', nargs='+', choices=[case.name for case in CASES], help="query benchmarks to run")
+    parser.add_argument('--skip-app', action='store_true', help="do not benchmark the app render")
+    parser.add_argument('--output', help="results file (default: benchmarks/results/<companies>x<years>.json)")
+    parser.add_argument('--baseline', help="results file to compare against (default: the previous --output)")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="overwrite the baseline with this run even if it has regressions")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help="allowed slowdown / growth, as a fraction")
+    args = parser.parse_args(argv)
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{args.companies}x{args.years:g}.json"
+    baseline_path = Path(args.baseline) if args.baseline else output
+    baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else None
+
+    # The data ends today so the trailing-year queries (CURRENT_DATE based) have rows to work on
+    scale = {'companies': args.companies, 'years': args.years, 'seed': args.seed}
+    print(f"{args.companies:,} companies x {args.years:g} years ({trading_days(args.years):,} days), seed {args.seed}")
+    conn = prepare_source(args.companies, args.years, args.seed, date.today())
+    cursor = local_cursor(conn)
+    fresh = run_queries(cursor, build_context(cursor), args.repeat, args.only)
+    if not args.skip_app and not args.only:
+        fresh.update(run_app(args.repeat))
+
+    results = fresh
+    if args.only and baseline is not None and baseline['scale'] == scale:
+        # A partial run keeps the other benchmarks of the previous one, so it stays a full baseline
+        results = {**baseline['results'], **fresh}
+    run = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'scale': scale,
+        'results': results,
+    }
+    regressions = []
+    if baseline is not None:
+        if baseline['scale'] != scale:
+            print(f"Baseline {baseline_path} was run at {baseline['scale']}, not comparing")
+        else:
+            regressions = find_regressions(fresh, baseline['results'], args.tolerance)
+            print(f"Compared with {baseline_path} ({baseline['created']}): {len(regressions)} regression(s)")
+            for regression in regressions:
+                print(f"  REGRESSION {regression}")
+    # A regressed run would become the reference for the next one, so it only replaces the baseline on request
+    if regressions and output.resolve() == baseline_path.resolve() and not args.update_baseline:
+        print(f"Baseline {baseline_path} kept, pass --update-baseline to replace it with this run")
+    else:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(run, indent=2))
+        print(f"Results written to {output}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
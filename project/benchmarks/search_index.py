@@ -0,0 +1,46 @@
+#Benchmark: SearchIndex.search latency per query vs the str.contains filter it replaced, with a check
+#that both return the same rows
+#Usage: python benchmarks/search_index.py [companies]
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.Backend.search_index import SearchIndex
+from local_engine import generate_source
+
+QUERIES = ['T', 's', 'PM', 'sl', 'TCK0001', 'TCK12345', 'tech', 'ENERGY', 'health care', 'MSFT', 'ZZZ']
+
+def contains_filter(frame: pd.DataFrame, query: str) -> pd.DataFrame:
+    return frame[frame['TICKER'].str.contains(query, case=False, regex=False)
+                 | frame['SECTOR_NAME'].astype(str).str.contains(query, case=False, regex=False)]
+
+def best_of(func, repeat=50) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), float(np.median(timings))
+
+if __name__ == "__main__":
+    companies = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    frame = generate_source(companies, 1)['company'][['TICKER', 'SECTOR_NAME']]
+    frame = frame.astype({'SECTOR_NAME': 'category'})
+    start = time.perf_counter()
+    index = SearchIndex(frame)
+    print(f"{companies:,} companies, index built in {time.perf_counter() - start:.2f}s")
+    for query in QUERIES:
+        matches = index.search(query)
+        expected = contains_filter(frame, query)
+        same = set(matches.index) == set(expected.index)
+        best, median = best_of(lambda: index.search(query))
+        scan_best, _ = best_of(lambda: contains_filter(frame, query), repeat=5)
+        print(f"{query!r:<14} {len(matches):>7,} rows  search {best * 1e3:7.3f} ms (median {median * 1e3:7.3f})"
+              f"  str.contains {scan_best * 1e3:8.2f} ms  same rows {same}")
+    for query in ['TCK0001X', 'TEHCNOLOGY', 'MSFT']:
+        best, _ = best_of(lambda: index.suggest(query))
+        print(f"suggest {query!r:<14} {best * 1e3:7.3f} ms  {index.suggest(query)}")
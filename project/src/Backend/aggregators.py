@@ -0,0 +1,84 @@
+import pandas as pd
+from typing import Iterable, List, Optional
+from src.Backend.dtypes import UNKNOWN_SECTOR
+
+# Incremental aggregators over the batches yielded by iter_daily_position.
+# Each one only keeps its running result, so memory is bounded by the output size
+# (dates, sectors x dates or companies) instead of the number of streamed rows.
+
+class _GroupSumAggregator:
+    keys: List[str] = []
+    value_column = 'DAILY_POSITION_USD'
+    # Named as in fetch_position_aggregate, so a streamed result can stand in for the SQL one
+    result_column = 'TOTAL_POSITION_USD'
+
+    def __init__(self):
+        self._totals: Optional[pd.Series] = None
+
+    def _prepare(self, batch: pd.DataFrame) -> pd.DataFrame:
+        return batch
+
+    def update(self, batch: pd.DataFrame):
+        batch = self._prepare(batch)
+        partial = batch.groupby(self.keys, sort=False, observed=True)[self.value_column].sum()
+        self._totals = partial if self._totals is None else self._totals.add(partial, fill_value=0)
+
+    def result(self) -> pd.DataFrame:
+        if self._totals is None:
+            return pd.DataFrame(columns=self.keys + [self.result_column])
+        totals = self._totals.sort_index()
+        totals.index.names = self.keys
+        return totals.rename(self.result_column).reset_index()
+
+#Total portfolio value per date (what the ex1 batch report plots)
+class DailyTotalAggregator(_GroupSumAggregator):
+    keys = ['DATE']
+
+#Total position per sector and date; `sectors` maps COMPANY_ID -> SECTOR_NAME
+class SectorDailyAggregator(_GroupSumAggregator):
+    keys = ['DATE', 'SECTOR_NAME']
+
+    def __init__(self, sectors: pd.Series, unknown_sector: str = UNKNOWN_SECTOR):
+        super().__init__()
+        # A categorical mapping can only be filled with one of its categories
+        if isinstance(sectors.dtype, pd.CategoricalDtype) and unknown_sector not in sectors.cat.categories:
+            sectors = sectors.cat.add_categories([unknown_sector])
+        self._sectors = sectors
+        self._unknown_sector = unknown_sector
+
+    def _prepare(self, batch: pd.DataFrame) -> pd.DataFrame:
+        sector = batch['COMPANY_ID'].map(self._sectors).fillna(self._unknown_sector)
+        return batch.assign(SECTOR_NAME=sector)
+
+#Sum, day count and average position per company, optionally from `start_date` onwards
+class CompanyAggregator:
+    keys = ['COMPANY_ID']
+
+    def __init__(self, start_date=None):
+        self._start_date = pd.Timestamp(start_date) if start_date is not None else None
+        self._totals: Optional[pd.DataFrame] = None
+
+    def update(self, batch: pd.DataFrame):
+        if self._start_date is not None:
+            batch = batch[batch['DATE'] >= self._start_date]
+        partial = batch.groupby('COMPANY_ID', sort=False)['DAILY_POSITION_USD'].agg(['sum', 'count'])
+        self._totals = partial if self._totals is None else self._totals.add(partial, fill_value=0)
+
+    def result(self) -> pd.DataFrame:
+        if self._totals is None:
+            return pd.DataFrame(columns=['COMPANY_ID', 'TOTAL_POSITION_USD', 'DAYS', 'AVERAGE_POSITION_USD'])
+        totals = self._totals.sort_index()
+        result = pd.DataFrame({
+            'TOTAL_POSITION_USD': totals['sum'],
+            'DAYS': totals['count'].astype('int64'),
+            'AVERAGE_POSITION_USD': totals['sum'] / totals['count'],
+        })
+        result.index.name = 'COMPANY_ID'
+        return result.reset_index()
+
+#Feed every batch of a stream to all aggregators in a single pass
+def consume(batches: Iterable[pd.DataFrame], *aggregators):
+    for batch in batches:
+        for aggregator in aggregators:
+            aggregator.update(batch)
+    return aggregators
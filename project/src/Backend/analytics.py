@@ -0,0 +1,105 @@
+from typing import Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from src.Backend.data_queries import fetch_timeseries_batch
+from src.Backend.query_tracing import traced_query
+
+TRADING_DAYS_PER_YEAR = 252
+ANALYTICS_COLUMNS = ['ROLLING_MEAN', 'DAILY_RETURN', 'LOG_RETURN', 'ROLLING_VOLATILITY', 'DRAWDOWN']
+
+#Close prices as a tickers x dates matrix (NaN where a ticker has no price on a date)
+def price_matrix(timeseries: pd.DataFrame) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    wide = timeseries.pivot(index='DATE', columns='TICKER', values='CLOSE_USD').sort_index()
+    return wide.columns.tolist(), wide.index.values, wide.to_numpy(dtype=np.float64).T
+
+#Mean of the last `window` columns of every row; NaN until a row has `window` valid values in a row
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    sums, counts = _rolling_sums(values, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts == window, sums / window, np.nan)
+
+#Each row's valid values moved to the front, in order, with NaN padding after them, so windows over the
+#result count a ticker's own observations like the SQL ROWS frames instead of every date of the matrix.
+#Also returns the (rows, columns) of those values and their (rows, columns) in the compacted matrix.
+def compact_rows(values: np.ndarray) -> Tuple[np.ndarray, Tuple[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]]:
+    valid = ~np.isnan(values)
+    rows, columns = np.nonzero(valid)
+    slots = (np.cumsum(valid, axis=1) - 1)[rows, columns]
+    compact = np.full((values.shape[0], int(valid.sum(axis=1).max(initial=0))), np.nan)
+    compact[rows, slots] = values[rows, columns]
+    return compact, (rows, columns), (rows, slots)
+
+#Price over the previous one minus 1; NaN where the previous price is 0, as NULLIF in SQL
+def daily_returns(prices: np.ndarray) -> np.ndarray:
+    return _price_ratios(prices) - 1
+
+#Log of the price ratio; NaN unless the ratio is positive
+def log_returns(prices: np.ndarray) -> np.ndarray:
+    ratios = _price_ratios(prices)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(ratios > 0, np.log(ratios), np.nan)
+
+#Annualized sample standard deviation of log returns over the last `window` dates
+def rolling_volatility(prices: np.ndarray, window: int, periods_per_year: int = TRADING_DAYS_PER_YEAR) -> np.ndarray:
+    returns = log_returns(prices)
+    # Centre each row first so the sum-of-squares form does not lose precision
+    centred = returns - np.nanmean(returns, axis=1, keepdims=True)
+    sums, counts = _rolling_sums(centred, window)
+    squares, _ = _rolling_sums(centred ** 2, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variance = (squares - sums ** 2 / window) / (window - 1)
+    return np.where(counts == window, np.sqrt(np.maximum(variance, 0.0)) * np.sqrt(periods_per_year), np.nan)
+
+#Fall from the running peak, as a fraction (0 at a new high, -0.25 when 25% below it)
+def drawdown(prices: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return prices / np.fmax.accumulate(prices, axis=1) - 1
+
+#Every indicator for every ticker at once, over a tickers x dates price matrix
+def compute_analytics(prices: np.ndarray, window: int) -> Dict[str, np.ndarray]:
+    return {
+        'ROLLING_MEAN': rolling_mean(prices, window),
+        'DAILY_RETURN': daily_returns(prices),
+        'LOG_RETURN': log_returns(prices),
+        'ROLLING_VOLATILITY': rolling_volatility(prices, window),
+        'DRAWDOWN': drawdown(prices),
+    }
+
+#In-memory counterpart of fetch_price_analytics, with the same long (TICKER, DATE, CLOSE_USD, ...) layout
+#and values. The dashboard uses the SQL version; benchmarks/query_suite.py compares the two.
+@traced_query
+def price_analytics(cursor, company_tickers: List[str], window: int) -> pd.DataFrame:
+    tickers, dates, prices = price_matrix(fetch_timeseries_batch(cursor, company_tickers))
+    # Computed over each ticker's own prices, then put back on the shared dates
+    compact, positions, slots = compact_rows(prices)
+    analytics = {}
+    for column, values in compute_analytics(compact, window).items():
+        analytics[column] = np.full(prices.shape, np.nan)
+        analytics[column][positions] = values[slots]
+    frame = pd.DataFrame({
+        'TICKER': np.repeat(tickers, len(dates)),
+        'DATE': np.tile(dates, len(tickers)),
+        'CLOSE_USD': prices.ravel(),
+        **{column: analytics[column].ravel() for column in ANALYTICS_COLUMNS},
+    })
+    return frame[frame['CLOSE_USD'].notna()].reset_index(drop=True)
+
+def _price_ratios(prices: np.ndarray) -> np.ndarray:
+    ratios = np.full(prices.shape, np.nan)
+    previous = prices[:, :-1]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratios[:, 1:] = np.where(previous != 0, prices[:, 1:] / previous, np.nan)
+    return ratios
+
+def _rolling_sums(values: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    valid = ~np.isnan(values)
+    padded = np.zeros((values.shape[0], values.shape[1] + 1))
+    padded_counts = np.zeros((values.shape[0], values.shape[1] + 1), dtype=np.int64)
+    np.cumsum(np.where(valid, values, 0.0), axis=1, out=padded[:, 1:])
+    np.cumsum(valid, axis=1, out=padded_counts[:, 1:])
+    sums = np.full(values.shape, np.nan)
+    counts = np.zeros(values.shape, dtype=np.int64)
+    if window <= values.shape[1]:
+        sums[:, window - 1:] = padded[:, window:] - padded[:, :-window]
+        counts[:, window - 1:] = padded_counts[:, window:] - padded_counts[:, :-window]
+    return sums, counts
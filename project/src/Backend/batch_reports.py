@@ -0,0 +1,223 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple
+import pandas as pd
+import plotly.express as px
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter
+from src.Backend.aggregators import CompanyAggregator, DailyTotalAggregator, SectorDailyAggregator, consume
+from src.Backend.data_queries import fetch_company_sectors, fetch_position_aggregate, fetch_top_quartile_positions, iter_daily_position
+from src.Backend.position_matrix import PositionMatrix, query_position_matrix, quartile_ranks, trailing_year_start
+from src.Backend.snowflake_connection import get_connection
+
+REPORTS_DIR = os.getenv('REPORTS_DIR', str(Path(__file__).resolve().parents[2] / 'reports'))
+REPORT_FORMATS = ['parquet', 'png', 'html']
+# 'sql' aggregates in the warehouse; 'matrix' loads position and price into a PositionMatrix once and
+# computes every report from it in memory; 'stream' reads the daily position in batches and aggregates them
+# as they arrive, so memory is bounded by the report's size rather than by the history
+REPORT_ENGINES = ['sql', 'matrix', 'stream']
+
+#Same rows as fetch_position_aggregate(cursor, 'date'), from the streamed daily position
+def stream_daily_totals(cursor) -> pd.DataFrame:
+    daily_total, = consume(iter_daily_position(cursor), DailyTotalAggregator())
+    return daily_total.result()
+
+#Same rows as fetch_top_quartile_positions, from the streamed daily position
+def stream_top_quartile_positions(cursor) -> pd.DataFrame:
+    companies, = consume(iter_daily_position(cursor), CompanyAggregator(trailing_year_start()))
+    averages = companies.result()
+    top = averages[quartile_ranks(averages['AVERAGE_POSITION_USD'].to_numpy(dtype='float64')) == 1]
+    top = top.sort_values('AVERAGE_POSITION_USD', ascending=False, kind='stable')
+    return top[['COMPANY_ID', 'AVERAGE_POSITION_USD']].reset_index(drop=True)
+
+#Same rows as fetch_position_aggregate(cursor, 'sector_date'), from the streamed daily position
+def stream_sector_daily(cursor) -> pd.DataFrame:
+    # The sectors are fetched before the stream starts, the cursor runs one query at a time
+    sector_daily, = consume(iter_daily_position(cursor), SectorDailyAggregator(fetch_company_sectors(cursor)))
+    return sector_daily.result()
+
+#Exercise 1: total portfolio value over time
+def plot_daily_total_png(daily_total: pd.DataFrame) -> Figure:
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
+    ax.plot(daily_total['DATE'], daily_total['TOTAL_POSITION_USD'],
+            marker=None, linestyle='-', color='blue', linewidth=2)
+
+    ax.set_title('Total Portfolio Value Over Time')
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Total Position (USD)')
+    ax.tick_params(axis='x', labelrotation=45)
+    ax.grid(True, alpha=0.3)
+
+    # Format y-axis to show billions
+    ax.yaxis.set_major_formatter(FuncFormatter(lambda x, p: f'${x/1e9:.1f}B'))
+    fig.tight_layout()
+    return fig
+
+def plot_daily_total_html(daily_total: pd.DataFrame):
+    fig = px.line(daily_total, x='DATE', y='TOTAL_POSITION_USD', title='Total Portfolio Value Over Time',
+                  labels={'DATE': 'Date', 'TOTAL_POSITION_USD': 'Total Position (USD)'})
+    fig.update_yaxes(tickprefix='$', tickformat='.3s')
+    return fig
+
+#Exercise 2: top 25% companies by average position
+def plot_top_companies_png(df: pd.DataFrame) -> Figure:
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
+
+    # Create horizontal bar chart
+    bars = ax.barh(range(len(df)), df['AVERAGE_POSITION_USD'] / 1e9, color='skyblue')  # Convert to billions
+
+    ax.set_title('Top 25% Companies by Average Position', pad=20)
+    ax.set_xlabel('Average Position (Billion USD)')
+    ax.set_ylabel('Company ID')
+
+    # Add value labels on the bars
+    for bar in bars:
+        width = bar.get_width()
+        ax.text(width, bar.get_y() + bar.get_height()/2, f'${width:.2f}B',
+                ha='left', va='center', fontweight='bold')
+
+    # Set y-ticks to company IDs
+    ax.set_yticks(range(len(df)), df['COMPANY_ID'])
+
+    ax.grid(True, axis='x', alpha=0.3)
+    fig.tight_layout()
+    return fig
+
+def plot_top_companies_html(df: pd.DataFrame):
+    fig = px.bar(df, x='AVERAGE_POSITION_USD', y=df['COMPANY_ID'].astype(str), orientation='h',
+                 title='Top 25% Companies by Average Position',
+                 labels={'AVERAGE_POSITION_USD': 'Average Position (USD)', 'y': 'Company ID'})
+    fig.update_layout(yaxis=dict(autorange='reversed'))
+    return fig
+
+#Exercise 3: total sector position per date
+def plot_sector_positions_png(df: pd.DataFrame) -> Figure:
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
+
+    # Create horizontal bar chart
+    bars = ax.barh(df['SECTOR_NAME'], df['TOTAL_POSITION_USD'] / 1e9, color='skyblue')
+
+    ax.set_title('Total Sector Position in USD', fontsize=16, pad=20)
+    ax.set_xlabel('Total Position (Billion USD)', fontsize=12)
+
+    # Add value labels on the bars
+    for bar in bars:
+        width = bar.get_width()
+        ax.text(width + (width * 0.01), bar.get_y() + bar.get_height()/2,
+                f'${width:.2f}B', ha='left', va='center', fontweight='bold')
+
+    ax.grid(True, axis='x', alpha=0.3)
+    fig.tight_layout()
+    return fig
+
+def plot_sector_positions_html(df: pd.DataFrame):
+    return px.line(df, x='DATE', y='TOTAL_POSITION_USD', color='SECTOR_NAME', title='Total Sector Position in USD',
+                   labels={'DATE': 'Date', 'TOTAL_POSITION_USD': 'Total Position (USD)', 'SECTOR_NAME': 'Sector'})
+
+class Report(NamedTuple):
+    fetch: Callable
+    png: Callable
+    html: Callable
+    compute: Callable  # same result as `fetch`, from a PositionMatrix
+    stream: Callable  # same result as `fetch`, from the streamed daily position
+
+REPORTS: Dict[str, Report] = {
+    'ex1': Report(lambda cursor: fetch_position_aggregate(cursor, 'date'), plot_daily_total_png, plot_daily_total_html,
+                  PositionMatrix.daily_totals, stream_daily_totals),
+    'ex2': Report(fetch_top_quartile_positions, plot_top_companies_png, plot_top_companies_html,
+                  PositionMatrix.top_quartile_positions, stream_top_quartile_positions),
+    'ex3': Report(lambda cursor: fetch_position_aggregate(cursor, 'sector_date'), plot_sector_positions_png, plot_sector_positions_html,
+                  PositionMatrix.sector_daily, stream_sector_daily),
+}
+
+#Write one report's outputs; returns the files written
+def write_report(name: str, data: pd.DataFrame, output_dir: Path, formats: List[str]) -> List[Path]:
+    written = []
+    if 'parquet' in formats:
+        written.append(output_dir / f"{name}.parquet")
+        data.to_parquet(written[-1], index=False)
+    if 'png' in formats:
+        # Figure + Agg canvas rather than pyplot: no display and no global figure state
+        written.append(output_dir / f"{name}.png")
+        FigureCanvasAgg(REPORTS[name].png(data)).print_png(str(written[-1]))
+    if 'html' in formats:
+        written.append(output_dir / f"{name}.html")
+        REPORTS[name].html(data).write_html(written[-1], include_plotlyjs='cdn')
+    return written
+
+#Run the named reports concurrently, each on its own cursor of one shared connection, and write
+#their outputs as the queries finish. Returns name -> {'rows', 'seconds', 'files'} or {'error'}.
+def run_reports(names: List[str], output_dir: str = REPORTS_DIR, formats: List[str] = REPORT_FORMATS,
+                conn=None, engine: str = 'sql') -> Dict[str, dict]:
+    unknown = [name for name in names if name not in REPORTS]
+    if unknown:
+        raise ValueError(f"Unknown report(s) {', '.join(unknown)}, expected any of {', '.join(REPORTS)}")
+    if engine not in REPORT_ENGINES:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {', '.join(REPORT_ENGINES)}")
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    own_connection = conn is None
+    conn = conn or get_connection()
+
+    def fetch(name: str):
+        start = time.perf_counter()
+        cursor = conn.cursor()
+        try:
+            if engine == 'matrix':
+                # The first report loads the process-wide matrix, the others wait for it and reuse it
+                return query_position_matrix(cursor, REPORTS[name].compute), time.perf_counter() - start
+            if engine == 'stream':
+                return REPORTS[name].stream(cursor), time.perf_counter() - start
+            return REPORTS[name].fetch(cursor), time.perf_counter() - start
+        finally:
+            cursor.close()
+
+    results = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max(len(names), 1), thread_name_prefix='report') as executor:
+            futures = {executor.submit(fetch, name): name for name in names}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    data, seconds = future.result()
+                    files = write_report(name, data, output_dir, formats)
+                    results[name] = {'rows': len(data), 'seconds': round(seconds, 3), 'files': [str(f) for f in files]}
+                except Exception as e:
+                    # One failing report should not stop the others in an unattended run
+                    results[name] = {'error': f"{type(e).__name__}: {e}"}
+    finally:
+        if own_connection:
+            conn.close()
+    return results
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run exercise queries and write their results and charts.")
+    # Checked below rather than with `choices`, which argparse also applies to an empty list and then rejects
+    parser.add_argument('reports', nargs='*', metavar='report', help=f"reports to run, any of {', '.join(REPORTS)} (default: all)")
+    parser.add_argument('--output-dir', default=REPORTS_DIR, help="directory for the output files")
+    parser.add_argument('--format', dest='formats', nargs='+', choices=REPORT_FORMATS, default=REPORT_FORMATS,
+                        help="outputs to write per report")
+    parser.add_argument('--engine', choices=REPORT_ENGINES, default='sql', help="where the reports are computed")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.reports if name not in REPORTS]
+    if unknown:
+        parser.error(f"unknown report(s) {', '.join(unknown)}, expected any of {', '.join(REPORTS)}")
+
+    results = run_reports(args.reports or list(REPORTS), args.output_dir, args.formats, engine=args.engine)
+    for name, result in results.items():
+        if 'error' in result:
+            print(f"{name}: FAILED {result['error']}")
+        else:
+            print(f"{name}: {result['rows']} rows in {result['seconds']:.2f}s -> {', '.join(result['files'])}")
+    return 1 if any('error' in result for result in results.values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,123 +1,248 @@
+from __future__ import annotations
+import datetime
+import threading
 import pandas as pd
-from snowflake.connector.cursor import SnowflakeCursor
-from typing import List
-import streamlit as st
+import pyarrow as pa
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from src.Backend.downsampling import TIMESERIES_BUCKETS
+from src.Backend.dtypes import CATEGORICAL_COLUMNS, UNKNOWN_SECTOR, CompanyDimension, normalize_arrow
+from src.Backend.materialization import DAILY_POSITION_TABLE
+from src.Backend.query_cache import QUERY_CACHE_FRESHNESS_INTERVAL, QueryCache, stable_sort_key
+from src.Backend.query_tracing import current_span, record, timed_phase, traced_query
+
+# Only for annotations: the connector takes about a second to import and the local backend never needs it
+if TYPE_CHECKING:
+    from snowflake.connector.cursor import SnowflakeCursor
+
+REFERENCE_DATA_TTL = 3600
+
+#Freshness probe of the query cache: the latest date of every table the cached queries read, the
+#materialized daily position and source.price. Once either moves, every cached result is dropped.
+@traced_query
+def _probe_latest_dates(cursor: SnowflakeCursor) -> Tuple[Optional[datetime.date], Optional[datetime.date]]:
+    query = f"""
+    SELECT
+        (SELECT MAX(DATE) FROM {DAILY_POSITION_TABLE}) AS POSITION_DATE,
+        (SELECT MAX(DATE) FROM source.price) AS PRICE_DATE
+    """
+    _execute(cursor, query)
+    with timed_phase('fetch'):
+        result = cursor.fetchone()
+    return result[0], result[1]
+
+# Shared by every session in the process; see query_cache.stats() for hit/miss counters
+query_cache = QueryCache(freshness_probe=_probe_latest_dates)
+cached_query = query_cache.cached
+cached_query_items = query_cache.cached_items
+
+#Run a query and materialize the result through Arrow batches instead of Python tuples.
+#Values are always bound as ? parameters so the query text stays stable across requests.
+def _query_dataframe(cursor: SnowflakeCursor, query: str, params: Optional[Sequence] = None) -> pd.DataFrame:
+    _execute(cursor, query, params)
+    return _fetch_dataframe(cursor)
+
+#Execute on the cursor, recording the time and the Snowflake query ID on the current trace span
+def _execute(cursor: SnowflakeCursor, query: str, params: Optional[Sequence] = None):
+    with timed_phase('execute'):
+        cursor.execute(query, params)
+    record(queries=1)
+    # sfqid is the Snowflake query ID, to look the query up in QUERY_HISTORY; the local backend has none
+    span = current_span()
+    if span is not None and getattr(cursor, 'sfqid', None):
+        span.append('query_ids', cursor.sfqid)
+
+def _fetch_dataframe(cursor: SnowflakeCursor) -> pd.DataFrame:
+    table = _fetch_arrow_table(cursor)
+    # The result is fully fetched, so the cursor is free to load the dimension if needed
+    if any(column in table.column_names for column in CATEGORICAL_COLUMNS):
+        table = _encode_categoricals(cursor, table)
+    return _arrow_to_pandas(table)
+
+COMPANY_DIMENSION_QUERY = """
+    SELECT ID, TICKER, SECTOR_NAME
+    FROM source.company
+    """
+
+_dimension: Optional[CompanyDimension] = None
+_dimension_lock = threading.Lock()
+
+#Process-wide company dimension, loaded on first use. It is reloaded when a result holds tickers or
+#sectors it lacks (companies added since), and values still unknown after that are added to it.
+def company_dimension(cursor: SnowflakeCursor, missing: Optional[Dict[str, pa.Array]] = None) -> CompanyDimension:
+    global _dimension
+    with _dimension_lock:
+        if _dimension is None or (missing and _dimension.lacks(missing)):
+            _dimension = _load_company_dimension(cursor)
+            if missing and _dimension.lacks(missing):
+                _dimension = _dimension.including(missing)
+        return _dimension
+
+@traced_query
+def _load_company_dimension(cursor: SnowflakeCursor) -> CompanyDimension:
+    return CompanyDimension.from_table(query_arrow_table(cursor, COMPANY_DIMENSION_QUERY))
+
+def reset_company_dimension():
+    global _dimension
+    with _dimension_lock:
+        _dimension = None
+
+def _encode_categoricals(cursor: SnowflakeCursor, table: pa.Table) -> pa.Table:
+    table, missing = company_dimension(cursor).encode(table)
+    if missing:
+        table, _ = company_dimension(cursor, missing).encode(table)
+    return table
+
+def query_arrow_table(cursor: SnowflakeCursor, query: str, params: Optional[Sequence] = None) -> pa.Table:
+    _execute(cursor, query, params)
+    return _fetch_arrow_table(cursor)
+
+#Run a query and yield its result as the Arrow batches the cursor delivers, without ever holding all of it
+def iter_query_batches(cursor: SnowflakeCursor, query: str, params: Optional[Sequence] = None) -> Iterator[pa.Table]:
+    _execute(cursor, query, params)
+    for table in cursor.fetch_arrow_batches():
+        record(rows=table.num_rows, bytes=table.nbytes)
+        yield normalize_arrow(table)
+
+#Placeholders and parameters for an IN list. Values are de-duplicated and sorted so the same
+#set always binds the same way, and the placeholder count is padded to a power of two by
+#repeating the last value, so only a handful of distinct query texts exist for any list length.
+def bind_in_list(values: Iterable) -> Tuple[str, List]:
+    params = sorted(set(values), key=stable_sort_key)
+    if not params:
+        raise ValueError("IN list needs at least one value")
+    size = 1
+    while size < len(params):
+        size *= 2
+    params += [params[-1]] * (size - len(params))
+    return ', '.join(['?'] * size), params
+
+#Dates bind as datetime.date whatever the caller passed ('2024-01-31', Timestamp, date)
+def bind_date(value) -> datetime.date:
+    return pd.Timestamp(value).date()
+
+def _fetch_arrow_table(cursor: SnowflakeCursor) -> pa.Table:
+    with timed_phase('fetch'):
+        batches = [normalize_arrow(batch) for batch in cursor.fetch_arrow_batches()]
+        if not batches:
+            return pa.table({desc[0]: pa.nulls(0) for desc in cursor.description})
+        table = pa.concat_tables(batches)
+    record(rows=table.num_rows, bytes=table.nbytes)
+    return table
+
+def _arrow_to_pandas(table: pa.Table) -> pd.DataFrame:
+    # Dates stay datetime64, numerics stay NumPy-backed and dictionary columns become categoricals;
+    # Arrow buffers are freed as columns convert
+    with timed_phase('build'):
+        return normalize_arrow(table).to_pandas(date_as_object=False, split_blocks=True, self_destruct=True)
+
+STREAM_BATCH_ROWS = 250_000
+
+DAILY_POSITION_QUERY = f"""
+    SELECT 
+        COMPANY_ID,
+        DATE,
+        SHARES,
+        CLOSE_USD,
+        DAILY_POSITION_USD
+    FROM 
+        {DAILY_POSITION_TABLE}
+    """
+
 #Calculate Daily Position in USD
+@traced_query
+@cached_query()
 def calculate_daily_position(cursor: SnowflakeCursor) -> pd.DataFrame:
+    return _query_dataframe(cursor, DAILY_POSITION_QUERY)
+
+#Stream the daily position in bounded batches so callers can aggregate without holding the full join
+def iter_daily_position(cursor: SnowflakeCursor, batch_rows: int = STREAM_BATCH_ROWS) -> Iterator[pd.DataFrame]:
+    _execute(cursor, DAILY_POSITION_QUERY)
+    for table in cursor.fetch_arrow_batches():
+        record(rows=table.num_rows, bytes=table.nbytes)
+        for batch in table.to_batches(max_chunksize=batch_rows):
+            yield _arrow_to_pandas(pa.Table.from_batches([batch]))
+
+#Company dimension used to attach sectors to streamed batches
+@traced_query
+@cached_query(ttl=REFERENCE_DATA_TTL)
+def fetch_company_sectors(cursor: SnowflakeCursor) -> pd.Series:
     query = """
-    WITH position_data AS (
-        SELECT 
-            p.COMPANY_ID,
-            p.DATE,
-            p.SHARES
-        FROM 
-            source.position p
-    ),
+    SELECT ID AS COMPANY_ID, SECTOR_NAME
+    FROM source.company
+    """
+    companies = _query_dataframe(cursor, query)
+    return companies.set_index('COMPANY_ID')['SECTOR_NAME']
 
-    price_data AS (
-        SELECT 
-            pr.COMPANY_ID,
-            pr.DATE,
-            pr.CLOSE_USD
-        FROM 
-            source.price pr
-    )
+#Dimensions selected and grouped by for each aggregation grain
+AGGREGATE_GRAINS = {
+    'date': ['DATE'],
+    'sector': [f"COALESCE(SECTOR_NAME, '{UNKNOWN_SECTOR}') AS SECTOR_NAME"],
+    'sector_date': ['DATE', f"COALESCE(SECTOR_NAME, '{UNKNOWN_SECTOR}') AS SECTOR_NAME"],
+    'company_date': ['COMPANY_ID', 'TICKER', 'DATE'],
+}
 
-    SELECT 
-        pos.COMPANY_ID,
-        pos.DATE,
-        COALESCE(pos.SHARES, 0) AS SHARES,
-        COALESCE(pr.CLOSE_USD, 0) AS CLOSE_USD,
-        (COALESCE(pos.SHARES, 0) * COALESCE(pr.CLOSE_USD, 0)) AS DAILY_POSITION_USD
-    FROM 
-        position_data pos
-    INNER JOIN 
-        price_data pr
-    ON 
-        pos.COMPANY_ID = pr.COMPANY_ID AND pos.DATE = pr.DATE
-    """
-    cursor.execute(query)
-    # Convert results to pandas DataFrame
-    results = cursor.fetchall()
-    columns = [desc[0] for desc in cursor.description]
-    return pd.DataFrame(results, columns=columns)
-
-@st.cache_data
-def calculate_top_sectors(_cursor: SnowflakeCursor, start_date: str, end_date: str, selected_sectors: List[str]) -> pd.DataFrame:
-    if not selected_sectors:
-        return pd.DataFrame(columns=['SECTOR_NAME', 'TOTAL_POSITION_USD'])
+#Build the SQL (and its bind parameters) that sums the daily position in USD at the requested grain,
+#so only aggregated rows leave the warehouse
+def build_position_aggregate_query(grain: str, start_date=None, end_date=None,
+                                   sectors: Optional[List[str]] = None, limit: Optional[int] = None) -> Tuple[str, List]:
+    if grain not in AGGREGATE_GRAINS:
+        raise ValueError(f"Unknown grain '{grain}', expected one of {', '.join(AGGREGATE_GRAINS)}")
+    dimensions = AGGREGATE_GRAINS[grain]
+    select_columns = ',\n        '.join(dimensions)
+    group_columns = ', '.join(str(i + 1) for i in range(len(dimensions)))
+
+    filters, params = [], []
+    if start_date is not None:
+        filters.append("DATE >= ?")
+        params.append(bind_date(start_date))
+    if end_date is not None:
+        filters.append("DATE <= ?")
+        params.append(bind_date(end_date))
+    if sectors is not None:
+        placeholders, sector_params = bind_in_list(sectors)
+        filters.append(f"SECTOR_NAME IN ({placeholders})")
+        params.extend(sector_params)
+    where_clause = f"WHERE\n        {' AND '.join(filters)}" if filters else ""
+
+    # With a limit the caller wants the largest groups first, otherwise keep the natural dimension order
+    order_clause = f"ORDER BY\n        TOTAL_POSITION_USD DESC\n    LIMIT {int(limit)}" if limit else f"ORDER BY\n        {group_columns}"
 
     query = f"""
-    WITH daily_position AS (
-        SELECT 
-            p.DATE,
-            c.SECTOR_NAME,
-            COALESCE(p.SHARES, 0) * COALESCE(pr.CLOSE_USD, 0) AS DAILY_POSITION_USD
-        FROM 
-            source.position p
-        INNER JOIN 
-            source.price pr ON p.COMPANY_ID = pr.COMPANY_ID AND p.DATE = pr.DATE
-        INNER JOIN
-            source.company c ON p.COMPANY_ID = c.ID
-        WHERE 
-            p.DATE BETWEEN '{start_date}' AND '{end_date}'
-            AND c.SECTOR_NAME IN ({','.join([f"'{sector}'" for sector in selected_sectors])})
-    ),
-    top_sectors AS (
-        SELECT 
-            DATE,
-            SECTOR_NAME,
-            SUM(DAILY_POSITION_USD) AS TOTAL_POSITION_USD
-        FROM 
-            daily_position
-        GROUP BY
-            DATE, SECTOR_NAME
-    )
-    SELECT 
-        SECTOR_NAME,
-        SUM(TOTAL_POSITION_USD) AS TOTAL_POSITION_USD
+    SELECT
+        {select_columns},
+        SUM(DAILY_POSITION_USD) AS TOTAL_POSITION_USD
     FROM
-        top_sectors
+        {DAILY_POSITION_TABLE}
+    {where_clause}
     GROUP BY
-        SECTOR_NAME
-    ORDER BY
-        TOTAL_POSITION_USD DESC
-    LIMIT 10
+        {group_columns}
+    {order_clause}
     """
-    _cursor.execute(query)
-    results = _cursor.fetchall()
-    columns = [desc[0] for desc in _cursor.description]
-    return pd.DataFrame(results, columns=columns)
+    return query, params
 
-def fetch_top_companies(cursor: SnowflakeCursor) -> pd.DataFrame:
-    query = """
-    WITH daily_position AS (
-        SELECT 
-            pos.COMPANY_ID,
-            pos.DATE,
-            COALESCE(pos.SHARES, 0) * COALESCE(pr.CLOSE_USD, 0) AS DAILY_POSITION_USD
-        FROM 
-            source.position pos
-        INNER JOIN 
-            source.price pr
-        ON 
-            pos.COMPANY_ID = pr.COMPANY_ID AND pos.DATE = pr.DATE
-    ),
-    last_year_data AS (
-        SELECT 
-            COMPANY_ID,
-            DAILY_POSITION_USD
-        FROM 
-            daily_position
-        WHERE 
-            DATE >= DATEADD(YEAR, -1, CURRENT_DATE())
-    ),
+@traced_query
+@cached_query()
+def fetch_position_aggregate(cursor: SnowflakeCursor, grain: str, start_date=None, end_date=None,
+                             sectors: Optional[List[str]] = None, limit: Optional[int] = None) -> pd.DataFrame:
+    query, params = build_position_aggregate_query(grain, start_date, end_date, sectors, limit)
+    return _query_dataframe(cursor, query, params)
+
+@traced_query
+def calculate_top_sectors(cursor: SnowflakeCursor, start_date: str, end_date: str, selected_sectors: List[str]) -> pd.DataFrame:
+    if not selected_sectors:
+        return pd.DataFrame(columns=['SECTOR_NAME', 'TOTAL_POSITION_USD'])
+    return fetch_position_aggregate(cursor, 'sector', start_date, end_date, selected_sectors, limit=10)
+
+#Companies in the top quartile by average daily position over the last year
+TOP_QUARTILE_CTE = f"""
     average_position AS (
         SELECT 
             COMPANY_ID,
             AVG(DAILY_POSITION_USD) AS AVERAGE_POSITION_USD
         FROM 
-            last_year_data
+            {DAILY_POSITION_TABLE}
+        WHERE 
+            DATE >= DATEADD(YEAR, -1, CURRENT_DATE())
         GROUP BY 
             COMPANY_ID
     ),
@@ -135,44 +260,105 @@ def fetch_top_companies(cursor: SnowflakeCursor) -> pd.DataFrame:
         ) ranked_companies
         WHERE 
             POSITION_RANK = 1
+    )"""
+
+@traced_query
+@cached_query()
+def fetch_top_companies(cursor: SnowflakeCursor) -> pd.DataFrame:
+    query = f"""
+    WITH {TOP_QUARTILE_CTE},
+    latest_position AS (
+        SELECT 
+            COMPANY_ID,
+            TICKER,
+            SECTOR_NAME,
+            SHARES,
+            CLOSE_USD
+        FROM 
+            {DAILY_POSITION_TABLE}
+        WHERE 
+            DATE = (SELECT MAX(DATE) FROM {DAILY_POSITION_TABLE})
     )
     SELECT 
-        c.TICKER,
-        c.SECTOR_NAME,
-        p.SHARES,
-        pr.CLOSE_USD AS LAST_CLOSE_PRICE_USD,
+        l.TICKER,
+        l.SECTOR_NAME,
+        l.SHARES,
+        l.CLOSE_USD AS LAST_CLOSE_PRICE_USD,
         t.AVERAGE_POSITION_USD
     FROM 
         top_25_percent t
     INNER JOIN 
-        source.company c ON t.COMPANY_ID = c.ID
-    INNER JOIN 
-        source.position p ON t.COMPANY_ID = p.COMPANY_ID
-    INNER JOIN 
-        source.price pr ON t.COMPANY_ID = pr.COMPANY_ID
-    WHERE 
-        p.DATE = (SELECT MAX(DATE) FROM source.position)
-        AND pr.DATE = (SELECT MAX(DATE) FROM source.price)
+        latest_position l ON t.COMPANY_ID = l.COMPANY_ID
     ORDER BY 
         t.AVERAGE_POSITION_USD DESC;
     """
-    cursor.execute(query)
-    results = cursor.fetchall()
-    columns = [desc[0] for desc in cursor.description]
-    return pd.DataFrame(results, columns=columns)
+    return _query_dataframe(cursor, query)
+
+#Every company's row on the latest materialized date, keyed by COMPANY_ID
+@traced_query
+@cached_query()
+def fetch_latest_positions(cursor: SnowflakeCursor) -> pd.DataFrame:
+    query = f"""
+    SELECT 
+        COMPANY_ID,
+        TICKER,
+        SECTOR_NAME,
+        SHARES,
+        CLOSE_USD
+    FROM 
+        {DAILY_POSITION_TABLE}
+    WHERE 
+        DATE = (SELECT MAX(DATE) FROM {DAILY_POSITION_TABLE})
+    """
+    return _query_dataframe(cursor, query)
+
+#Exercise 2: COMPANY_ID and average position of the top quartile
+@traced_query
+@cached_query()
+def fetch_top_quartile_positions(cursor: SnowflakeCursor) -> pd.DataFrame:
+    query = f"""
+    WITH {TOP_QUARTILE_CTE}
+    SELECT 
+        COMPANY_ID,
+        AVERAGE_POSITION_USD
+    FROM 
+        top_25_percent
+    ORDER BY 
+        AVERAGE_POSITION_USD DESC
+    """
+    return _query_dataframe(cursor, query)
 
+@traced_query
+@cached_query(ttl=REFERENCE_DATA_TTL)
 def fetch_company_list(cursor: SnowflakeCursor) -> pd.DataFrame:
     query = """
     SELECT DISTINCT TICKER
     FROM source.company
+    ORDER BY TICKER
     """
-    cursor.execute(query)
-    results = cursor.fetchall()
-    return [row[0] for row in results]
+    return _query_dataframe(cursor, query)['TICKER'].tolist()
 
+@traced_query
+@cached_query(ttl=REFERENCE_DATA_TTL)
+def fetch_companies(cursor: SnowflakeCursor) -> pd.DataFrame:
+    query = """
+    SELECT ID, TICKER, SECTOR_NAME
+    FROM source.company
+    ORDER BY TICKER
+    """
+    return _query_dataframe(cursor, query)
+
+@traced_query
 def fetch_timeseries_data(cursor: SnowflakeCursor, company_ticker: str) -> pd.DataFrame:
+    timeseries = fetch_timeseries_batch(cursor, [company_ticker])
+    return timeseries[['DATE', 'CLOSE_USD']]
+
+#Full close price history of the tickers, sorted by (TICKER, DATE)
+def build_timeseries_query(company_tickers: List[str]) -> Tuple[str, List]:
+    placeholders, params = bind_in_list(company_tickers)
     query = f"""
     SELECT 
+        c.TICKER,
         p.DATE,
         p.CLOSE_USD
     FROM 
@@ -180,30 +366,227 @@ def fetch_timeseries_data(cursor: SnowflakeCursor, company_ticker: str) -> pd.Da
     INNER JOIN 
         source.company c ON p.COMPANY_ID = c.ID
     WHERE 
-        c.TICKER = '{company_ticker}'
+        c.TICKER IN ({placeholders})
+    ORDER BY 
+        c.TICKER, p.DATE
+    """
+    return query, params
+
+#Close prices for many tickers in one round trip, sorted by (TICKER, DATE); wide=True pivots to one column per ticker
+@traced_query
+@cached_query()
+def fetch_timeseries_batch(cursor: SnowflakeCursor, company_tickers: List[str], wide: bool = False) -> pd.DataFrame:
+    tickers = sorted(set(company_tickers))
+    if not tickers:
+        timeseries = pd.DataFrame(columns=['TICKER', 'DATE', 'CLOSE_USD'])
+    else:
+        timeseries = _query_dataframe(cursor, *build_timeseries_query(tickers))
+    if wide:
+        return timeseries.pivot(index='DATE', columns='TICKER', values='CLOSE_USD').reindex(columns=tickers)
+    return timeseries
+
+#Close prices for charting: M4-downsampled in SQL to the first, last, lowest and highest close of each
+#of `buckets` equal date ranges per ticker, so the payload stays bounded however long the history is.
+#Narrower start/end dates (a zoomed-in chart) give proportionally finer resolution.
+@traced_query
+@cached_query()
+def fetch_timeseries_downsampled(cursor: SnowflakeCursor, company_tickers: List[str], start_date=None, end_date=None,
+                                 buckets: int = TIMESERIES_BUCKETS) -> pd.DataFrame:
+    tickers = sorted(set(company_tickers))
+    if not tickers:
+        return pd.DataFrame(columns=['TICKER', 'DATE', 'CLOSE_USD', 'AVERAGE_CLOSE_USD'])
+    placeholders, params = bind_in_list(tickers)
+    filters = [f"c.TICKER IN ({placeholders})"]
+    if start_date is not None:
+        filters.append("p.DATE >= ?")
+        params.append(bind_date(start_date))
+    if end_date is not None:
+        filters.append("p.DATE <= ?")
+        params.append(bind_date(end_date))
+    where_clause = "\n            AND ".join(filters)
+    query = f"""
+    WITH series AS (
+        SELECT 
+            c.TICKER,
+            p.DATE,
+            p.CLOSE_USD,
+            AVG(p.CLOSE_USD) OVER (PARTITION BY c.TICKER) AS AVERAGE_CLOSE_USD,
+            p.DATE - MIN(p.DATE) OVER () AS DAY_OFFSET,
+            MAX(p.DATE) OVER () - MIN(p.DATE) OVER () AS DAY_SPAN
+        FROM 
+            source.price p
+        INNER JOIN 
+            source.company c ON p.COMPANY_ID = c.ID
+        WHERE 
+            {where_clause}
+    ),
+    bucketed AS (
+        SELECT 
+            TICKER,
+            DATE,
+            CLOSE_USD,
+            AVERAGE_CLOSE_USD,
+            LEAST(FLOOR(DAY_OFFSET * ? / GREATEST(DAY_SPAN, 1)), ? - 1) AS BUCKET
+        FROM 
+            series
+    ),
+    ranked AS (
+        SELECT 
+            TICKER,
+            DATE,
+            CLOSE_USD,
+            AVERAGE_CLOSE_USD,
+            ROW_NUMBER() OVER (PARTITION BY TICKER, BUCKET ORDER BY DATE) AS FIRST_RANK,
+            ROW_NUMBER() OVER (PARTITION BY TICKER, BUCKET ORDER BY DATE DESC) AS LAST_RANK,
+            ROW_NUMBER() OVER (PARTITION BY TICKER, BUCKET ORDER BY CLOSE_USD, DATE) AS LOW_RANK,
+            ROW_NUMBER() OVER (PARTITION BY TICKER, BUCKET ORDER BY CLOSE_USD DESC, DATE) AS HIGH_RANK
+        FROM 
+            bucketed
+    )
+    SELECT 
+        TICKER,
+        DATE,
+        CLOSE_USD,
+        AVERAGE_CLOSE_USD
+    FROM 
+        ranked
+    WHERE 
+        FIRST_RANK = 1 OR LAST_RANK = 1 OR LOW_RANK = 1 OR HIGH_RANK = 1
     ORDER BY 
-        p.DATE
+        TICKER, DATE
     """
-    cursor.execute(query)
-    results = cursor.fetchall()
-    columns = [desc[0] for desc in cursor.description]
-    return pd.DataFrame(results, columns=columns)
+    return _query_dataframe(cursor, query, params + [int(buckets), int(buckets)])
 
-@st.cache_data
-def fetch_sector_list(_cursor: SnowflakeCursor) -> List[str]:
+ANALYTICS_TRADING_DAYS = 252
+
+#Rolling mean, daily and log returns, annualized rolling volatility and drawdown per ticker, computed
+#with window functions in the warehouse. Windows count rows (trading days) and stay NULL until full.
+#Each ticker is cached on its own for a given window and date range; only uncached tickers are queried.
+@traced_query
+@cached_query_items()
+def _fetch_price_analytics_by_ticker(cursor: SnowflakeCursor, company_tickers: List[str], window: int,
+                                     start_date=None, end_date=None) -> dict:
+    window = int(window)
+    if window < 2:
+        raise ValueError(f"window must be at least 2 rows, got {window}")
+    placeholders, params = bind_in_list(company_tickers)
+    filters, range_params = [], []
+    if start_date is not None:
+        filters.append("DATE >= ?")
+        range_params.append(bind_date(start_date))
+    if end_date is not None:
+        filters.append("DATE <= ?")
+        range_params.append(bind_date(end_date))
+    # The range is applied after the windows, so the first rows in range still see their history
+    where_clause = f"WHERE\n        {' AND '.join(filters)}" if filters else ""
+    rows = f"ROWS BETWEEN {window - 1} PRECEDING AND CURRENT ROW"
+    query = f"""
+    WITH prices AS (
+        SELECT 
+            c.TICKER,
+            p.DATE,
+            p.CLOSE_USD,
+            p.CLOSE_USD / NULLIF(LAG(p.CLOSE_USD) OVER (PARTITION BY c.TICKER ORDER BY p.DATE), 0) AS PRICE_RATIO
+        FROM 
+            source.price p
+        INNER JOIN 
+            source.company c ON p.COMPANY_ID = c.ID
+        WHERE 
+            c.TICKER IN ({placeholders})
+    ),
+    returns AS (
+        SELECT 
+            TICKER,
+            DATE,
+            CLOSE_USD,
+            PRICE_RATIO - 1 AS DAILY_RETURN,
+            CASE WHEN PRICE_RATIO > 0 THEN LN(PRICE_RATIO) END AS LOG_RETURN
+        FROM 
+            prices
+    ),
+    analytics AS (
+        SELECT 
+            TICKER,
+            DATE,
+            CLOSE_USD,
+            CASE WHEN COUNT(CLOSE_USD) OVER (PARTITION BY TICKER ORDER BY DATE {rows}) = {window}
+                 THEN AVG(CLOSE_USD) OVER (PARTITION BY TICKER ORDER BY DATE {rows}) END AS ROLLING_MEAN,
+            DAILY_RETURN,
+            LOG_RETURN,
+            CASE WHEN COUNT(LOG_RETURN) OVER (PARTITION BY TICKER ORDER BY DATE {rows}) = {window}
+                 THEN STDDEV_SAMP(LOG_RETURN) OVER (PARTITION BY TICKER ORDER BY DATE {rows}) * SQRT({ANALYTICS_TRADING_DAYS}) END AS ROLLING_VOLATILITY,
+            CLOSE_USD / MAX(CLOSE_USD) OVER (PARTITION BY TICKER ORDER BY DATE ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW) - 1 AS DRAWDOWN
+        FROM 
+            returns
+    )
+    SELECT 
+        *
+    FROM 
+        analytics
+    {where_clause}
+    ORDER BY 
+        TICKER, DATE
+    """
+    analytics = _query_dataframe(cursor, query, params + range_params)
+    return {ticker: frame.reset_index(drop=True) for ticker, frame in analytics.groupby('TICKER', sort=False, observed=True)}
+
+@traced_query
+def fetch_price_analytics(cursor: SnowflakeCursor, company_tickers: List[str], window: int,
+                          start_date=None, end_date=None) -> pd.DataFrame:
+    columns = ['TICKER', 'DATE', 'CLOSE_USD', 'ROLLING_MEAN', 'DAILY_RETURN', 'LOG_RETURN', 'ROLLING_VOLATILITY', 'DRAWDOWN']
+    tickers = sorted(set(company_tickers))
+    if not tickers:
+        return pd.DataFrame(columns=columns)
+    by_ticker = _fetch_price_analytics_by_ticker(cursor, tickers, window, start_date, end_date)
+    frames = [frame for frame in by_ticker.values() if frame is not None]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+@traced_query
+@cached_query(ttl=REFERENCE_DATA_TTL)
+def fetch_sector_list(cursor: SnowflakeCursor) -> List[str]:
     query = """
     SELECT DISTINCT SECTOR_NAME
     FROM source.company
+    WHERE SECTOR_NAME IS NOT NULL
     """
-    _cursor.execute(query)
-    results = _cursor.fetchall()
-    return [row[0] for row in results]
+    # A NULL sector would come back from the categorical column as NaN, among the sector names
+    return _query_dataframe(cursor, query)['SECTOR_NAME'].tolist()
 
+#Latest date of the materialized daily position, the date every position query is current to
+@traced_query
+@cached_query(ttl=QUERY_CACHE_FRESHNESS_INTERVAL)
 def fetch_latest_date(cursor: SnowflakeCursor) -> str:
-    query = """
+    query = f"""
     SELECT MAX(DATE) AS LATEST_DATE
-    FROM source.position
+    FROM {DAILY_POSITION_TABLE}
+    """
+    _execute(cursor, query)
+    with timed_phase('fetch'):
+        result = cursor.fetchone()
+    return result[0].strftime('%Y-%m-%d')
+
+#Result-cache effectiveness of the dashboard's queries over the last `hours`, from Snowflake's query history.
+#A SELECT served from the result cache scans no bytes, which is what RESULT_CACHE_HITS counts.
+@traced_query
+def fetch_result_cache_stats(cursor: SnowflakeCursor, query_tag: str, hours: int = 24) -> pd.DataFrame:
+    query = f"""
+    SELECT 
+        QUERY_TEXT,
+        COUNT(*) AS EXECUTIONS,
+        SUM(IFF(BYTES_SCANNED = 0, 1, 0)) AS RESULT_CACHE_HITS,
+        RESULT_CACHE_HITS / EXECUTIONS AS HIT_RATIO,
+        AVG(TOTAL_ELAPSED_TIME) AS AVG_ELAPSED_MS
+    FROM 
+        TABLE(INFORMATION_SCHEMA.QUERY_HISTORY_BY_USER(
+            END_TIME_RANGE_START => DATEADD('hour', -{int(hours)}, CURRENT_TIMESTAMP()),
+            RESULT_LIMIT => 10000))
+    WHERE 
+        QUERY_TAG = ?
+        AND QUERY_TYPE = 'SELECT'
+        AND EXECUTION_STATUS = 'SUCCESS'
+    GROUP BY 
+        QUERY_TEXT
+    ORDER BY 
+        EXECUTIONS DESC
     """
-    cursor.execute(query)
-    result = cursor.fetchone()
-    return result[0].strftime('%Y-%m-%d') 
\ No newline at end of file
+    return _query_dataframe(cursor, query, [query_tag])
@@ -0,0 +1,64 @@
+import os
+from typing import Optional
+import numpy as np
+import pandas as pd
+
+# Pixel width of a price chart; Streamlit does not report it, so set it for the usual screen
+CHART_WIDTH_PX = int(os.getenv('CHART_WIDTH_PX', '1200'))
+
+#Buckets for a chart `width_px` pixels wide: M4 keeps up to four points per bucket, so this keeps about
+#one point per pixel column
+def chart_buckets(width_px: int = CHART_WIDTH_PX) -> int:
+    return max(int(width_px) // 4, 1)
+
+TIMESERIES_BUCKETS = chart_buckets()
+
+#M4 downsampling: split the x range into equal-width buckets and keep the first, last, minimum and
+#maximum point of each, which draws the same line as the full series at one bucket per pixel and
+#close to it at one bucket per four pixels.
+#`first`/`span` bucket several series on one shared range. Returns the kept positions in order.
+def m4_indices(x: np.ndarray, y: np.ndarray, buckets: int = TIMESERIES_BUCKETS,
+               first: Optional[float] = None, span: Optional[float] = None) -> np.ndarray:
+    n = len(x)
+    if n <= 4 * buckets:
+        return np.arange(n)
+    x, y = _as_float(x), np.asarray(y, dtype=np.float64)
+    first = x[0] if first is None else first
+    span = max(x[-1] - x[0] if span is None else span, 1)
+    bucket = np.clip(((x - first) * buckets // span).astype(np.int64), 0, buckets - 1)
+    # x is sorted, so every bucket is one contiguous run
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], n]
+    keep = np.zeros(n, dtype=bool)
+    keep[starts] = True
+    keep[ends - 1] = True
+    # Sorting by (bucket, y) leaves each bucket on the same positions, ordered by value
+    order = np.lexsort((y, bucket))
+    keep[order[starts]] = True
+    keep[order[ends - 1]] = True
+    return np.flatnonzero(keep)
+
+#NumPy fallback for fetch_timeseries_downsampled: downsample a (TICKER, DATE, <value_column>) frame per ticker
+def downsample_timeseries(timeseries: pd.DataFrame, buckets: int = TIMESERIES_BUCKETS,
+                          value_column: str = 'CLOSE_USD') -> pd.DataFrame:
+    if value_column == 'CLOSE_USD':
+        # Mean over the full series, which the kept points would bias
+        timeseries = timeseries.assign(AVERAGE_CLOSE_USD=timeseries.groupby('TICKER', observed=True)['CLOSE_USD'].transform('mean'))
+    timeseries = timeseries[timeseries[value_column].notna()]
+    if timeseries.empty:
+        return timeseries
+    dates = _as_float(timeseries['DATE'].values)
+    closes = timeseries[value_column].to_numpy(dtype=np.float64)
+    # Every ticker is bucketed on the same date range, as the SQL version does
+    first, span = dates.min(), dates.max() - dates.min()
+    keep = []
+    for positions in timeseries.groupby('TICKER', sort=False, observed=True).indices.values():
+        positions = positions[np.argsort(dates[positions], kind='stable')]
+        keep.append(positions[m4_indices(dates[positions], closes[positions], buckets, first, span)])
+    return timeseries.iloc[np.sort(np.concatenate(keep))].reset_index(drop=True)
+
+def _as_float(x) -> np.ndarray:
+    x = np.asarray(x)
+    if x.dtype.kind == 'M':
+        return x.astype('datetime64[D]').astype(np.int64).astype(np.float64)
+    return x.astype(np.float64)
@@ -0,0 +1,73 @@
+from typing import Dict, Optional, Tuple
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Text columns held as categoricals of the company dimension instead of one Python string per row
+CATEGORICAL_COLUMNS = ('TICKER', 'SECTOR_NAME')
+# What the sector aggregates COALESCE a missing sector to
+UNKNOWN_SECTOR = 'UNKNOWN'
+
+#The distinct tickers and sectors of source.company, used as the shared dictionary of every TICKER and
+#SECTOR_NAME column. Results encoded against one dimension get equal CategoricalDtypes, so they concat,
+#merge and group on integer codes instead of comparing strings.
+class CompanyDimension:
+    def __init__(self, dictionaries: Dict[str, pa.Array]):
+        # Sorted, so ordering by a categorical column orders by its text as before
+        self.dictionaries = {column: pc.unique(values.cast(pa.string())).drop_null().sort() for column, values in dictionaries.items()}
+        self.dtypes = {column: pd.CategoricalDtype(dictionary.to_pylist()) for column, dictionary in self.dictionaries.items()}
+
+    @classmethod
+    def from_table(cls, companies: pa.Table) -> "CompanyDimension":
+        return cls({
+            'TICKER': companies['TICKER'].combine_chunks(),
+            'SECTOR_NAME': pa.concat_arrays([companies['SECTOR_NAME'].combine_chunks().cast(pa.string()), pa.array([UNKNOWN_SECTOR])]),
+        })
+
+    #Dictionary-encode the table's categorical columns. Returns the table and, per column, the distinct
+    #values missing from the dimension; columns holding any are left as they were.
+    def encode(self, table: pa.Table) -> Tuple[pa.Table, Dict[str, pa.Array]]:
+        missing = {}
+        for column in CATEGORICAL_COLUMNS:
+            if column not in table.column_names or column not in self.dictionaries:
+                continue
+            values = table[column]
+            if not (pa.types.is_string(values.type) or pa.types.is_large_string(values.type)):
+                continue
+            values = values.cast(pa.string())
+            dictionary = self.dictionaries[column]
+            indices = pc.index_in(values, value_set=dictionary)
+            if indices.null_count > values.null_count:
+                missing[column] = pc.unique(pc.filter(values, pc.and_(pc.is_null(indices), pc.is_valid(values))))
+                continue
+            chunks = [pa.DictionaryArray.from_arrays(chunk, dictionary) for chunk in indices.chunks]
+            table = table.set_column(table.column_names.index(column), column,
+                                     pa.chunked_array(chunks, type=pa.dictionary(indices.type, pa.string())))
+        return table, missing
+
+    #A dimension that also holds `extra` values, e.g. a sector label made up by a query
+    def including(self, extra: Dict[str, pa.Array]) -> "CompanyDimension":
+        return CompanyDimension({column: pa.concat_arrays([dictionary, extra[column].cast(pa.string())]) if column in extra else dictionary
+                                 for column, dictionary in self.dictionaries.items()})
+
+    def lacks(self, values: Dict[str, pa.Array]) -> bool:
+        return any(not pc.all(pc.is_in(array.cast(pa.string()), value_set=self.dictionaries[column])).as_py()
+                   for column, array in values.items() if column in self.dictionaries)
+
+#Numeric columns as 64-bit NumPy types whatever the connector delivered: NUMBER columns arrive as decimal128,
+#which pandas would turn into Decimal objects, or as integers as narrow as each batch's values allow
+def normalize_arrow(table: pa.Table) -> pa.Table:
+    for i, field in enumerate(table.schema):
+        target = _numeric_target(field.type)
+        if target is not None and field.type != target:
+            table = table.set_column(i, field.name, table.column(i).cast(target))
+    return table
+
+def _numeric_target(arrow_type: pa.DataType) -> Optional[pa.DataType]:
+    if pa.types.is_decimal(arrow_type):
+        return pa.int64() if arrow_type.scale == 0 else pa.float64()
+    if pa.types.is_integer(arrow_type):
+        return pa.int64()
+    if pa.types.is_floating(arrow_type):
+        return pa.float64()
+    return None
@@ -0,0 +1,109 @@
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import duckdb
+import pyarrow as pa
+from src.Backend.local_cache import CACHE_DIR, FACT_TABLES, SYNC_ON_CONNECT, TABLE_SCHEMAS, sync_from_snowflake
+from src.Backend.materialization import refresh_daily_position
+
+# Snowflake-only syntax used by data_queries and the exercise SQL, rewritten for DuckDB
+DUCKDB_REWRITES: List[Tuple[re.Pattern, str]] = [
+    (re.compile(r"\bDATEADD\(\s*([A-Za-z]+)\s*,", re.IGNORECASE), r"DATEADD('\1',"),
+    (re.compile(r"\bCURRENT_DATE\(\s*\)", re.IGNORECASE), "CURRENT_DATE"),
+    (re.compile(r"\bCURRENT_TIMESTAMP\(\s*\)", re.IGNORECASE), "CURRENT_TIMESTAMP"),
+]
+
+# DATEADD(<part>, <n>, <date>) with the part passed as a string after rewriting
+DUCKDB_MACROS = [
+    "CREATE OR REPLACE MACRO DATEADD(part, n, d) AS d + n * CAST('1 ' || part AS INTERVAL)",
+]
+
+def translate_sql(query: str) -> str:
+    for pattern, replacement in DUCKDB_REWRITES:
+        query = pattern.sub(replacement, query)
+    return query
+
+#Cursor exposing the SnowflakeCursor methods data_queries relies on
+class DuckDBCursor:
+    def __init__(self, cursor: duckdb.DuckDBPyConnection):
+        self._cursor = cursor
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, query: str, params=None):
+        self._cursor.execute(translate_sql(query), params)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetch_arrow_batches(self):
+        reader = self._cursor.to_arrow_reader() if hasattr(self._cursor, 'to_arrow_reader') else self._cursor.fetch_record_batch()
+        for batch in reader:
+            yield pa.Table.from_batches([batch])
+
+    def close(self):
+        self._cursor.close()
+
+#Connection wrapper so a DuckDB database can stand in for a Snowflake connection, including in the pool
+class DuckDBConnection:
+    def __init__(self, conn: duckdb.DuckDBPyConnection, create_macros: bool = True):
+        self._conn = conn
+        self._closed = False
+        self._lock = threading.Lock()
+        if create_macros:
+            for macro in DUCKDB_MACROS:
+                conn.execute(macro)
+
+    def cursor(self) -> DuckDBCursor:
+        # DuckDB cursors are independent connections to the same database, safe to use from other threads
+        with self._lock:
+            return DuckDBCursor(self._conn.cursor())
+
+    def is_closed(self) -> bool:
+        return self._closed
+
+    def close(self):
+        self._closed = True
+        self._conn.close()
+
+# One database per (cache directory, database file), built on first use and kept for the process
+_databases: Dict[Tuple[str, str], duckdb.DuckDBPyConnection] = {}
+_databases_lock = threading.Lock()
+
+#Connection to the in-process DuckDB database exposing the local Parquet cache as source.company/price/position.
+#Every connection, e.g. each one in the pool, is a cursor of the same database, so the daily position
+#table is materialized once and shared instead of once per connection.
+def get_duckdb_connection(cache_dir: str = CACHE_DIR, database: Optional[str] = None) -> DuckDBConnection:
+    key = (str(Path(cache_dir).resolve()), database or ':memory:')
+    with _databases_lock:
+        if key not in _databases:
+            _databases[key] = _open_database(Path(cache_dir), database)
+        return DuckDBConnection(_databases[key].cursor(), create_macros=False)
+
+def _open_database(root: Path, database: Optional[str]) -> duckdb.DuckDBPyConnection:
+    if SYNC_ON_CONNECT:
+        sync_from_snowflake(str(root))
+    if not (root / 'company' / 'data.parquet').exists():
+        raise FileNotFoundError(f"Local cache at {root} is empty, run `python -m src.Backend.local_cache` first")
+
+    conn = duckdb.connect(database or ':memory:')
+    conn.execute("CREATE SCHEMA IF NOT EXISTS source")
+    conn.execute(f"CREATE OR REPLACE VIEW source.company AS SELECT * FROM read_parquet('{(root / 'company' / 'data.parquet').as_posix()}')")
+    for table in FACT_TABLES:
+        columns = ', '.join(TABLE_SCHEMAS[table].names)
+        files = (root / table / '*' / '*.parquet').as_posix()
+        conn.execute(f"CREATE OR REPLACE VIEW source.{table} AS SELECT {columns} FROM read_parquet('{files}', hive_partitioning = true)")
+    # Build the daily position table the queries read from, incrementally when the database is persistent
+    cursor = DuckDBConnection(conn).cursor()
+    try:
+        refresh_daily_position(cursor)
+    finally:
+        cursor.close()
+    return conn
@@ -0,0 +1,122 @@
+import os
+import re
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from src.Backend.data_queries import build_timeseries_query, iter_query_batches
+from src.Backend.query_tracing import traced_query
+
+EXPORT_DIR = os.getenv('EXPORT_DIR', str(Path(tempfile.gettempdir()) / 'bi_dashboard_exports'))
+# Prepared files older than this are deleted whenever a new export is written
+EXPORT_MAX_AGE = float(os.getenv('EXPORT_MAX_AGE', '3600'))
+EXPORT_BATCH_ROWS = 250_000
+
+class ExportFormat(NamedTuple):
+    label: str
+    extension: str
+    mime: str
+
+EXPORT_FORMATS: Dict[str, ExportFormat] = {
+    'parquet': ExportFormat("Parquet", '.parquet', 'application/vnd.apache.parquet'),
+    'csv.gz': ExportFormat("CSV (gzip)", '.csv.gz', 'application/gzip'),
+    'csv': ExportFormat("CSV", '.csv', 'text/csv'),
+}
+
+TIMESERIES_SCHEMA = pa.schema([('TICKER', pa.string()), ('DATE', pa.date32()), ('CLOSE_USD', pa.float64())])
+
+#Writes Arrow batches to one file as they arrive, so only a batch at a time is ever in memory
+class BatchFileWriter:
+    def __init__(self, path: Path, fmt: str, schema: pa.Schema):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format '{fmt}', expected any of {', '.join(EXPORT_FORMATS)}")
+        self.schema = schema
+        self.rows = 0
+        self._stream = None
+        if fmt == 'parquet':
+            self._writer = pq.ParquetWriter(str(path), schema, compression='zstd')
+        else:
+            self._stream = pa.CompressedOutputStream(str(path), 'gzip') if fmt == 'csv.gz' else pa.OSFile(str(path), 'wb')
+            self._writer = pacsv.CSVWriter(self._stream, schema)
+
+    def write(self, table: pa.Table):
+        # Batches of one result can still differ in integer width or nullability
+        if table.schema != self.schema:
+            table = table.select(self.schema.names).cast(self.schema)
+        self._writer.write_table(table)
+        self.rows += table.num_rows
+
+    def close(self):
+        self._writer.close()
+        if self._stream is not None:
+            self._stream.close()
+
+#Write `batches` to a new file under EXPORT_DIR and return its path. The schema comes from the first batch,
+#or from `schema` when there are none. The file only appears once complete.
+def export_batches(batches: Iterable[pa.Table], fmt: str, name: str, schema: Optional[pa.Schema] = None) -> Path:
+    export_dir = Path(EXPORT_DIR)
+    export_dir.mkdir(parents=True, exist_ok=True)
+    prune_exports(export_dir)
+    # Unique per export so sessions never overwrite each other's files; `name` only helps when browsing the directory
+    path = export_dir / f"{uuid.uuid4().hex}-{re.sub(r'[^A-Za-z0-9_-]+', '_', name)}{EXPORT_FORMATS[fmt].extension}"
+    partial = path.with_name(path.name + '.partial')
+    batches = iter(batches)
+    first = next(batches, None)
+    if first is None and schema is None:
+        raise ValueError("Cannot export an empty result without a schema")
+    writer = BatchFileWriter(partial, fmt, schema or first.schema)
+    try:
+        if first is not None:
+            writer.write(first)
+        for table in batches:
+            writer.write(table)
+    except BaseException:
+        writer.close()
+        partial.unlink(missing_ok=True)
+        raise
+    writer.close()
+    partial.rename(path)
+    return path
+
+#An in-memory frame (the top companies, say) exported in the same formats
+def export_frame(frame: pd.DataFrame, fmt: str, name: str) -> Path:
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    return export_batches(_slices(table, EXPORT_BATCH_ROWS), fmt, name, table.schema)
+
+#Full price history of every ticker, streamed from the cursor into the file batch by batch
+@traced_query
+def export_timeseries(cursor, company_tickers: List[str], fmt: str) -> Path:
+    tickers = sorted(set(company_tickers))
+    if not tickers:
+        raise ValueError("Select at least one company to export")
+    batches = iter_query_batches(cursor, *build_timeseries_query(tickers))
+    return export_batches(batches, fmt, 'timeseries', TIMESERIES_SCHEMA)
+
+#Download name for an export, e.g. "Company Timeseries - AAPL, MSFT.csv.gz"
+def export_file_name(title: str, fmt: str, tickers: Optional[List[str]] = None) -> str:
+    if tickers:
+        title += f" - {', '.join(tickers)}" if len(tickers) <= 3 else f" - {len(tickers)} companies"
+    return title + EXPORT_FORMATS[fmt].extension
+
+#Delete prepared files (and partial ones left by a crash) older than `max_age` seconds
+def prune_exports(export_dir: Path, max_age: float = EXPORT_MAX_AGE) -> int:
+    cutoff = time.time() - max_age
+    removed = 0
+    for path in export_dir.iterdir():
+        try:
+            if path.is_file() and path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            # Another session pruned it first
+            pass
+    return removed
+
+def _slices(table: pa.Table, rows: int) -> Iterator[pa.Table]:
+    for offset in range(0, table.num_rows, rows):
+        yield table.slice(offset, rows)
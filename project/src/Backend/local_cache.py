@@ -0,0 +1,166 @@
+import json
+import os
+import shutil
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from src.Backend.data_queries import query_arrow_table
+
+CACHE_DIR = os.getenv('LOCAL_CACHE_DIR', str(Path(__file__).resolve().parents[2] / '.cache' / 'source'))
+# Sync the cache from Snowflake whenever the DuckDB backend opens it
+SYNC_ON_CONNECT = os.getenv('LOCAL_CACHE_SYNC', '0') == '1'
+
+# Fixed schemas so every incremental file of a table can be read as one dataset
+TABLE_SCHEMAS = {
+    'company': pa.schema([('ID', pa.int64()), ('TICKER', pa.string()), ('SECTOR_NAME', pa.string())]),
+    'price': pa.schema([('COMPANY_ID', pa.int64()), ('DATE', pa.date32()), ('CLOSE_USD', pa.float64())]),
+    'position': pa.schema([('COMPANY_ID', pa.int64()), ('DATE', pa.date32()), ('SHARES', pa.float64())]),
+}
+FACT_TABLES = ['price', 'position']
+PARTITION_COLUMN = 'MONTH'
+PARTITIONING = ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor='hive')
+MANIFEST_FILE = 'manifest.json'
+
+#On-disk Parquet copy of source.company/price/position.
+#Fact tables are hive-partitioned by month and appended with the rows from the cached MAX(DATE) on.
+#That date is reloaded as well, in case rows for it landed after the previous sync.
+class LocalSourceCache:
+    def __init__(self, root: str = CACHE_DIR):
+        self.root = Path(root)
+
+    def table_path(self, table: str) -> Path:
+        return self.root / table
+
+    def max_date(self, table: str) -> Optional[date]:
+        value = self._read_manifest().get(table)
+        return date.fromisoformat(value) if value else None
+
+    def latest_date(self) -> Optional[str]:
+        latest = self.max_date('position')
+        return latest.strftime('%Y-%m-%d') if latest else None
+
+    #Pull the company dimension and every fact row from the cached MAX(DATE) on; returns rows written per table
+    def sync(self, cursor) -> Dict[str, int]:
+        self.root.mkdir(parents=True, exist_ok=True)
+        written = {'company': self._refresh_company(cursor)}
+        for table in FACT_TABLES:
+            written[table] = self._append_delta(cursor, table)
+        return written
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def read(self, table: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+             columns: Optional[List[str]] = None) -> pa.Table:
+        path = self.table_path(table)
+        schema = TABLE_SCHEMAS[table]
+        columns = columns or schema.names
+        if table not in FACT_TABLES:
+            return pq.read_table(path / 'data.parquet', columns=columns) if path.exists() else schema.empty_table().select(columns)
+        if not path.exists():
+            return schema.empty_table().select(columns)
+
+        dataset = ds.dataset(path, format='parquet', partitioning=PARTITIONING,
+                             schema=schema.append(pa.field(PARTITION_COLUMN, pa.string())))
+        # Month bounds prune whole partitions, the DATE bounds use Parquet row-group statistics
+        condition = None
+        if start_date is not None:
+            start = pd.Timestamp(start_date).date()
+            condition = _and(condition, (ds.field(PARTITION_COLUMN) >= start.strftime('%Y-%m')) & (ds.field('DATE') >= start))
+        if end_date is not None:
+            end = pd.Timestamp(end_date).date()
+            condition = _and(condition, (ds.field(PARTITION_COLUMN) <= end.strftime('%Y-%m')) & (ds.field('DATE') <= end))
+        return dataset.to_table(columns=columns, filter=condition)
+
+    def _refresh_company(self, cursor) -> int:
+        # The dimension is small and can change in place, so it is replaced on every sync
+        table = query_arrow_table(cursor, """
+        SELECT ID, TICKER, SECTOR_NAME
+        FROM source.company
+        """).cast(TABLE_SCHEMAS['company'])
+        path = self.table_path('company')
+        path.mkdir(parents=True, exist_ok=True)
+        pq.write_table(table, path / 'data.parquet.tmp')
+        os.replace(path / 'data.parquet.tmp', path / 'data.parquet')
+        return table.num_rows
+
+    def _append_delta(self, cursor, table: str) -> int:
+        since = self.max_date(table)
+        columns = ', '.join(TABLE_SCHEMAS[table].names)
+        where_clause = "WHERE DATE >= ?" if since else ""
+        delta = query_arrow_table(cursor, f"""
+        SELECT {columns}
+        FROM source.{table}
+        {where_clause}
+        """, [since] if since else None).cast(TABLE_SCHEMAS[table])
+
+        # File names are derived from the previous watermark, so leftovers of a sync that died before
+        # the manifest was updated, or of an earlier sync from the same watermark, are removed and
+        # rewritten instead of duplicating rows
+        prefix = f"delta-{since.isoformat() if since else 'full'}-"
+        for stale in self.table_path(table).glob(f"*/{prefix}*.parquet"):
+            stale.unlink()
+        if since:
+            self._drop_date(table, since)
+        if delta.num_rows == 0:
+            return 0
+
+        months = pc.strftime(delta['DATE'], format='%Y-%m')
+        delta = delta.append_column(PARTITION_COLUMN, months)
+        ds.write_dataset(delta, self.table_path(table), format='parquet',
+                         partitioning=PARTITIONING,
+                         basename_template=prefix + "{i}.parquet",
+                         existing_data_behavior='overwrite_or_ignore')
+
+        manifest = self._read_manifest()
+        manifest[table] = pc.max(delta['DATE']).as_py().isoformat()
+        self._write_manifest(manifest)
+        return delta.num_rows
+
+    #Remove the rows of `day` written by earlier syncs, so the delta replaces them
+    def _drop_date(self, table: str, day: date):
+        partition = self.table_path(table) / f"{PARTITION_COLUMN}={day.strftime('%Y-%m')}"
+        for path in partition.glob('*.parquet'):
+            data = pq.ParquetFile(path).read()
+            kept = data.filter(pc.not_equal(data['DATE'], pa.scalar(day, pa.date32())))
+            if kept.num_rows == data.num_rows:
+                continue
+            if kept.num_rows == 0:
+                path.unlink()
+                continue
+            pq.write_table(kept, path.with_suffix('.tmp'))
+            os.replace(path.with_suffix('.tmp'), path)
+
+    def _read_manifest(self) -> Dict[str, str]:
+        path = self.root / MANIFEST_FILE
+        return json.loads(path.read_text()) if path.exists() else {}
+
+    def _write_manifest(self, manifest: Dict[str, str]):
+        path = self.root / MANIFEST_FILE
+        path.with_suffix('.tmp').write_text(json.dumps(manifest, indent=2))
+        os.replace(path.with_suffix('.tmp'), path)
+
+def _and(left, right):
+    return right if left is None else left & right
+
+#Sync the cache at `root` from Snowflake; returns rows written per table
+def sync_from_snowflake(root: str = CACHE_DIR) -> Dict[str, int]:
+    from src.Backend.snowflake_connection import get_snowflake_connection
+
+    conn = get_snowflake_connection()
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        return LocalSourceCache(root).sync(cursor)
+    finally:
+        if cursor is not None:
+            cursor.close()
+        conn.close()
+
+if __name__ == "__main__":
+    print(f"Synced into {CACHE_DIR}: {sync_from_snowflake()}")
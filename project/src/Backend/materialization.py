@@ -0,0 +1,83 @@
+import os
+from typing import Dict
+
+# Daily position in USD keyed by (COMPANY_ID, DATE), denormalized with ticker and sector.
+# Every query in data_queries reads this table instead of re-joining position x price.
+DAILY_POSITION_TABLE = os.getenv('DAILY_POSITION_TABLE', 'source.daily_position_usd')
+
+CREATE_DAILY_POSITION_SQL = f"""
+CREATE TABLE IF NOT EXISTS {DAILY_POSITION_TABLE} (
+    COMPANY_ID BIGINT NOT NULL,
+    DATE DATE NOT NULL,
+    TICKER VARCHAR,
+    SECTOR_NAME VARCHAR,
+    SHARES DOUBLE,
+    CLOSE_USD DOUBLE,
+    DAILY_POSITION_USD DOUBLE
+)
+"""
+
+# {where_clause} restricts the rebuild to the dates being (re)loaded
+LOAD_DAILY_POSITION_SQL = f"""
+INSERT INTO {DAILY_POSITION_TABLE} (COMPANY_ID, DATE, TICKER, SECTOR_NAME, SHARES, CLOSE_USD, DAILY_POSITION_USD)
+SELECT
+    pos.COMPANY_ID,
+    pos.DATE,
+    c.TICKER,
+    c.SECTOR_NAME,
+    COALESCE(pos.SHARES, 0),
+    COALESCE(pr.CLOSE_USD, 0),
+    COALESCE(pos.SHARES, 0) * COALESCE(pr.CLOSE_USD, 0)
+FROM
+    source.position pos
+INNER JOIN
+    source.price pr ON pos.COMPANY_ID = pr.COMPANY_ID AND pos.DATE = pr.DATE
+LEFT JOIN
+    source.company c ON pos.COMPANY_ID = c.ID
+{{where_clause}}
+"""
+
+def create_daily_position_table(cursor):
+    cursor.execute(CREATE_DAILY_POSITION_SQL)
+
+def fetch_materialized_date(cursor):
+    cursor.execute(f"SELECT MAX(DATE) FROM {DAILY_POSITION_TABLE}")
+    return cursor.fetchone()[0]
+
+#Bring the table up to date and return how many rows were (re)loaded.
+#The last materialized date is reloaded as well, in case prices for it landed after the previous run.
+def refresh_daily_position(cursor, rebuild: bool = False) -> Dict[str, object]:
+    create_daily_position_table(cursor)
+    watermark = None if rebuild else fetch_materialized_date(cursor)
+
+    params = None if watermark is None else [watermark]
+    table_filter = "" if watermark is None else "WHERE DATE >= ?"
+    source_filter = "" if watermark is None else "WHERE pos.DATE >= ?"
+
+    cursor.execute("BEGIN")
+    try:
+        cursor.execute(f"DELETE FROM {DAILY_POSITION_TABLE} {table_filter}", params)
+        cursor.execute(LOAD_DAILY_POSITION_SQL.format(where_clause=source_filter), params)
+        cursor.execute("COMMIT")
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+
+    cursor.execute(f"SELECT COUNT(*) FROM {DAILY_POSITION_TABLE} {table_filter}", params)
+    return {
+        'from_date': watermark,
+        'rows_loaded': cursor.fetchone()[0],
+        'latest_date': fetch_materialized_date(cursor),
+    }
+
+if __name__ == "__main__":
+    import sys
+    from src.Backend.snowflake_connection import get_connection
+
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        print(refresh_daily_position(cursor, rebuild='--rebuild' in sys.argv[1:]))
+    finally:
+        cursor.close()
+        conn.close()
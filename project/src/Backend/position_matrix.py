@@ -0,0 +1,309 @@
+import datetime
+import os
+import threading
+from typing import Any, Callable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from src.Backend.analytics import rolling_mean
+from src.Backend.data_queries import bind_date, company_dimension, fetch_companies, fetch_latest_date, query_arrow_table
+from src.Backend.dtypes import UNKNOWN_SECTOR, CompanyDimension
+from src.Backend.query_tracing import traced_query
+from src.Backend.rolling_window import TOP_COMPANIES_COLUMNS, fetch_top_companies_rolling
+from src.Backend.sector_rollup import fetch_top_sectors
+
+# Which structures answer the dashboard's top companies and top sectors: 'rollup' (the rolling window and
+# the sector rollup, a few MB) or 'matrix' (PositionMatrix, companies x dates x 24 bytes)
+POSITION_ENGINE = os.getenv('POSITION_ENGINE', 'rollup')
+POSITION_ENGINES = ('rollup', 'matrix')
+
+#Dense companies x dates matrices of shares, close and daily position in USD, loaded once from source.position
+#and source.price. Row i is company_ids[i], column j is dates[j]. A cell is NaN where the company has no row
+#on that date; the daily position is only set where both rows exist, as in the materialized table (inner join,
+#NULL shares or close counted as 0). Sector totals are the sector membership matrix times the daily position.
+#New dates are appended as columns, into buffers that grow by doubling.
+class PositionMatrix:
+    def __init__(self, companies: pd.DataFrame, dimension: CompanyDimension):
+        self.company_ids = np.empty(0, dtype=np.int64)
+        self._company_index = pd.Index(self.company_ids)
+        self.dates = np.empty(0, dtype='datetime64[D]')
+        self._shares = np.empty((0, 0))
+        self._close = np.empty((0, 0))
+        self._position = np.empty((0, 0))
+        self.checked_through: Optional[np.datetime64] = None
+        self.describe(companies, dimension)
+
+    @classmethod
+    def load(cls, cursor) -> "PositionMatrix":
+        companies = fetch_companies(cursor)
+        matrix = cls(companies, company_dimension(cursor))
+        matrix.update(_read_fact(cursor, 'position', 'SHARES'), _read_fact(cursor, 'price', 'CLOSE_USD'))
+        matrix.checked_through = matrix.latest_date
+        return matrix
+
+    @property
+    def shares(self) -> np.ndarray:
+        return self._shares[:, :len(self.dates)]
+
+    @property
+    def close(self) -> np.ndarray:
+        return self._close[:, :len(self.dates)]
+
+    @property
+    def position(self) -> np.ndarray:
+        return self._position[:, :len(self.dates)]
+
+    @property
+    def latest_date(self) -> Optional[np.datetime64]:
+        return self.dates[-1] if len(self.dates) else None
+
+    @property
+    def nbytes(self) -> int:
+        return self._shares.nbytes + self._close.nbytes + self._position.nbytes
+
+    #Attach tickers and sectors (ID, TICKER, SECTOR_NAME rows) to the matrix rows, adding rows for new companies.
+    #TICKER and SECTOR_NAME come back as categoricals of `dimension`, like the query functions' results.
+    def describe(self, companies: pd.DataFrame, dimension: CompanyDimension):
+        self._companies = companies.set_index('ID')
+        self._dimension = dimension
+        self._add_rows(companies['ID'].to_numpy(dtype=np.int64))
+
+    #Catch up with the source: reload the last date (late prices) and append the dates after it
+    def refresh(self, cursor, latest_date) -> int:
+        latest_date = _day(latest_date)
+        if self.checked_through is not None and latest_date <= self.checked_through:
+            return 0
+        companies = fetch_companies(cursor)
+        self.describe(companies, company_dimension(cursor))
+        start = self.latest_date
+        added = self.update(_read_fact(cursor, 'position', 'SHARES', start), _read_fact(cursor, 'price', 'CLOSE_USD', start))
+        # Caught up with the position and price tables, which can run ahead of or lag the materialized table
+        self.checked_through = self.latest_date
+        return added
+
+    #Write (COMPANY_ID, DATE, SHARES) and (COMPANY_ID, DATE, CLOSE_USD) rows dated on or after the last column.
+    #The last date is rewritten, later ones become new columns; returns the number of new columns.
+    def update(self, position: pa.Table, price: pa.Table) -> int:
+        position_ids, position_dates, shares = _fact_arrays(position, 'SHARES')
+        price_ids, price_dates, close = _fact_arrays(price, 'CLOSE_USD')
+        dates = np.union1d(position_dates, price_dates)
+        if not len(dates):
+            return 0
+        if len(self.dates) and dates[0] < self.dates[-1]:
+            raise ValueError(f"Dates before {self.dates[-1]} cannot be appended, got {dates[0]}")
+        first = np.searchsorted(self.dates, dates[0])
+        new_dates = dates[dates > self.dates[-1]] if len(self.dates) else dates
+        self._add_rows(np.union1d(position_ids, price_ids))
+        self._add_columns(new_dates)
+        columns = slice(first, len(self.dates))
+        self._shares[:, columns] = np.nan
+        self._close[:, columns] = np.nan
+        self._shares[self._company_index.get_indexer(position_ids), np.searchsorted(self.dates, position_dates)] = shares
+        self._close[self._company_index.get_indexer(price_ids), np.searchsorted(self.dates, price_dates)] = close
+        self._position[:, columns] = self._shares[:, columns] * self._close[:, columns]
+        return len(new_dates)
+
+    #Append one date column from per-company arrays; NaN marks a company without a row on that date
+    def append(self, date, company_ids: np.ndarray, shares: np.ndarray, close: np.ndarray) -> int:
+        company_ids = np.asarray(company_ids, dtype=np.int64)
+        dates = np.full(len(company_ids), _day(date))
+        has_shares, has_close = ~np.isnan(shares), ~np.isnan(close)
+        return self.update(
+            pa.table({'COMPANY_ID': company_ids[has_shares], 'DATE': dates[has_shares], 'SHARES': np.asarray(shares)[has_shares]}),
+            pa.table({'COMPANY_ID': company_ids[has_close], 'DATE': dates[has_close], 'CLOSE_USD': np.asarray(close)[has_close]}))
+
+    #Rows of the companies (-1 for unknown ones)
+    def company_rows(self, company_ids) -> np.ndarray:
+        return self._company_index.get_indexer(np.asarray(company_ids, dtype=np.int64))
+
+    def ticker_rows(self, tickers: List[str]) -> np.ndarray:
+        return self._ticker_index.get_indexer(tickers)
+
+    #Columns of the dates in [start_date, end_date]; either bound may be left open
+    def date_columns(self, start_date=None, end_date=None) -> slice:
+        start = 0 if start_date is None else int(np.searchsorted(self.dates, _day(start_date), side='left'))
+        end = len(self.dates) if end_date is None else int(np.searchsorted(self.dates, _day(end_date), side='right'))
+        return slice(start, end)
+
+    #Same rows as fetch_position_aggregate(cursor, 'date'): dates on which any company has a position
+    def daily_totals(self, start_date=None, end_date=None) -> pd.DataFrame:
+        columns = self.date_columns(start_date, end_date)
+        position = self.position[:, columns]
+        present = ~np.isnan(position).all(axis=0)
+        return pd.DataFrame({
+            'DATE': _as_datetime(self.dates[columns][present]),
+            'TOTAL_POSITION_USD': np.nansum(position, axis=0)[present],
+        })
+
+    #Sectors x dates totals and position counts over the date range
+    def sector_totals(self, start_date=None, end_date=None) -> Tuple[np.ndarray, np.ndarray]:
+        position = self.position[:, self.date_columns(start_date, end_date)]
+        present = ~np.isnan(position)
+        return self.membership @ np.where(present, position, 0.0), self.membership @ present
+
+    #Same rows as fetch_position_aggregate(cursor, 'sector_date'), ordered by date and sector
+    def sector_daily(self, start_date=None, end_date=None) -> pd.DataFrame:
+        columns = self.date_columns(start_date, end_date)
+        totals, counts = self.sector_totals(start_date, end_date)
+        date_columns, sector_rows = np.nonzero(counts.T > 0)
+        return pd.DataFrame({
+            'DATE': _as_datetime(self.dates[columns][date_columns]),
+            'SECTOR_NAME': pd.Categorical.from_codes(sector_rows, dtype=self._dimension.dtypes['SECTOR_NAME']),
+            'TOTAL_POSITION_USD': totals.T[date_columns, sector_rows],
+        })
+
+    #Same result as calculate_top_sectors; each company's range total is summed before the membership product
+    def top_sectors(self, start_date, end_date, sectors: List[str], limit: int = 10) -> pd.DataFrame:
+        if not sectors:
+            return pd.DataFrame(columns=['SECTOR_NAME', 'TOTAL_POSITION_USD'])
+        position = self.position[:, self.date_columns(start_date, end_date)]
+        totals = self.membership @ np.nansum(position, axis=1)
+        counts = self.membership @ (~np.isnan(position)).sum(axis=1)
+        rows = np.flatnonzero(np.isin(self.sectors, list(sectors)) & (counts > 0))
+        rows = rows[np.argsort(-totals[rows], kind='stable')][:limit]
+        return pd.DataFrame({'SECTOR_NAME': [self.sectors[i] for i in rows], 'TOTAL_POSITION_USD': totals[rows]})
+
+    #Average daily position per company from `start_date` on (one year back by default, as TOP_QUARTILE_CTE),
+    #for companies with at least one position in that range
+    def average_positions(self, start_date=None) -> pd.Series:
+        position = self.position[:, self.date_columns(trailing_year_start() if start_date is None else start_date)]
+        counts = (~np.isnan(position)).sum(axis=1)
+        present = counts > 0
+        return pd.Series(np.nansum(position, axis=1)[present] / counts[present], index=self.company_ids[present],
+                         name='AVERAGE_POSITION_USD')
+
+    #Companies x dates mean daily position over the last `window` dates, NaN until the window is full
+    def rolling_average(self, window: int) -> np.ndarray:
+        return rolling_mean(self.position, window)
+
+    #Same rows as fetch_top_quartile_positions: COMPANY_ID and average of the top NTILE(4) bucket
+    def top_quartile_positions(self, start_date=None) -> pd.DataFrame:
+        averages = self.average_positions(start_date)
+        top = averages[quartile_ranks(averages.to_numpy()) == 1].sort_values(ascending=False)
+        return pd.DataFrame({'COMPANY_ID': top.index.to_numpy(), 'AVERAGE_POSITION_USD': top.to_numpy()})
+
+    #Same result as fetch_top_companies: the top quartile with each company's shares and close on the latest date
+    def top_companies(self, start_date=None) -> pd.DataFrame:
+        top = self.top_quartile_positions(start_date)
+        latest = np.flatnonzero(~np.isnan(self.position).all(axis=0))
+        if top.empty or not len(latest):
+            return pd.DataFrame(columns=TOP_COMPANIES_COLUMNS)
+        rows = self.company_rows(top['COMPANY_ID'])
+        # Inner join with the latest date's rows, as in SQL
+        on_latest = ~np.isnan(self.position[rows, latest[-1]])
+        rows = rows[on_latest]
+        return pd.DataFrame({
+            'TICKER': self.tickers[rows],
+            'SECTOR_NAME': pd.Categorical.from_codes(self.sector_codes[rows], dtype=self._dimension.dtypes['SECTOR_NAME']),
+            'SHARES': self.shares[rows, latest[-1]],
+            'LAST_CLOSE_PRICE_USD': self.close[rows, latest[-1]],
+            'AVERAGE_POSITION_USD': top['AVERAGE_POSITION_USD'].to_numpy()[on_latest],
+        })
+
+    def _add_rows(self, company_ids: np.ndarray):
+        new_ids = company_ids[self._company_index.get_indexer(company_ids) < 0]
+        if len(new_ids):
+            self.company_ids = np.concatenate([self.company_ids, np.unique(new_ids)])
+            self._company_index = pd.Index(self.company_ids)
+            extra = len(self.company_ids) - self._shares.shape[0]
+            self._shares, self._close, self._position = (
+                np.vstack([buffer, np.full((extra, buffer.shape[1]), np.nan)])
+                for buffer in (self._shares, self._close, self._position))
+        # Ticker and sector of every row as codes of the shared dimension, whose sectors include UNKNOWN;
+        # companies without a sector, or missing from source.company, fall in the UNKNOWN sector
+        described = self._companies.reindex(self.company_ids)
+        self.tickers = pd.Categorical(described['TICKER'], dtype=self._dimension.dtypes['TICKER'])
+        self._ticker_index = pd.Index(self.tickers)
+        sector_dtype = self._dimension.dtypes['SECTOR_NAME']
+        self.sector_codes = pd.Categorical(described['SECTOR_NAME'], dtype=sector_dtype).codes.astype(np.int64)
+        self.sector_codes[self.sector_codes < 0] = sector_dtype.categories.get_loc(UNKNOWN_SECTOR)
+        self.sectors = list(sector_dtype.categories)
+        self.membership = np.zeros((len(self.sectors), len(self.company_ids)))
+        self.membership[self.sector_codes, np.arange(len(self.company_ids))] = 1.0
+
+    def _add_columns(self, dates: np.ndarray):
+        needed = len(self.dates) + len(dates)
+        if needed > self._shares.shape[1]:
+            capacity = max(needed, 2 * self._shares.shape[1])
+            self._shares, self._close, self._position = (
+                np.hstack([buffer[:, :len(self.dates)], np.full((buffer.shape[0], capacity - len(self.dates)), np.nan)])
+                for buffer in (self._shares, self._close, self._position))
+        self.dates = np.concatenate([self.dates, dates.astype('datetime64[D]')])
+
+#NTILE(buckets) of every value ordered from largest to smallest, 1 being the largest; as in SQL the first
+#`len(values) % buckets` buckets hold one value more
+def quartile_ranks(values: np.ndarray, buckets: int = 4) -> np.ndarray:
+    sizes = np.full(buckets, len(values) // buckets)
+    sizes[:len(values) % buckets] += 1
+    ranks = np.empty(len(values), dtype=np.int64)
+    ranks[np.argsort(-values, kind='stable')] = np.repeat(np.arange(1, buckets + 1), sizes)
+    return ranks
+
+def trailing_year_start() -> datetime.date:
+    return (pd.Timestamp(datetime.date.today()) - pd.DateOffset(years=1)).date()
+
+def _read_fact(cursor, table: str, value_column: str, start_date=None) -> pa.Table:
+    where_clause = "WHERE DATE >= ?" if start_date is not None else ""
+    query = f"""
+    SELECT COMPANY_ID, DATE, {value_column}
+    FROM source.{table}
+    {where_clause}
+    """
+    return query_arrow_table(cursor, query, [bind_date(start_date)] if start_date is not None else None)
+
+def _fact_arrays(table: pa.Table, value_column: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    return (
+        np.asarray(table['COMPANY_ID'].to_numpy(), dtype=np.int64),
+        np.asarray(table['DATE'].to_numpy(), dtype='datetime64[D]'),
+        np.asarray(pc.fill_null(table[value_column], 0).to_numpy(), dtype=np.float64),
+    )
+
+def _day(value) -> np.datetime64:
+    return np.datetime64(pd.Timestamp(value).date(), 'D')
+
+# The DATE dtype the query functions return
+def _as_datetime(dates: np.ndarray) -> np.ndarray:
+    return dates.astype('datetime64[ms]')
+
+_matrix: Optional[PositionMatrix] = None
+_matrix_lock = threading.Lock()
+
+#Run `func` on the process-wide matrix, loaded on first use and brought up to the source's latest date.
+#The lock is held throughout, so a concurrent refresh cannot reallocate the arrays under `func`.
+def query_position_matrix(cursor, func: Callable[[PositionMatrix], Any], latest_date=None):
+    latest_date = fetch_latest_date(cursor) if latest_date is None else latest_date
+    with _matrix_lock:
+        return func(_current_matrix(cursor, latest_date))
+
+#Process-wide matrix, returned while the lock is held, e.g. to load it ahead of the first query.
+#A later refresh can reallocate its arrays, so read them through query_position_matrix.
+def get_position_matrix(cursor, latest_date=None) -> PositionMatrix:
+    latest_date = fetch_latest_date(cursor) if latest_date is None else latest_date
+    with _matrix_lock:
+        return _current_matrix(cursor, latest_date)
+
+# Called with _matrix_lock held
+def _current_matrix(cursor, latest_date) -> PositionMatrix:
+    global _matrix
+    if _matrix is None:
+        _matrix = PositionMatrix.load(cursor)
+    else:
+        _matrix.refresh(cursor, latest_date)
+    return _matrix
+
+@traced_query
+def fetch_top_companies_matrix(cursor) -> pd.DataFrame:
+    return query_position_matrix(cursor, PositionMatrix.top_companies)
+
+@traced_query
+def fetch_top_sectors_matrix(cursor, latest_date, start_date, end_date, sectors: List[str], limit: int = 10) -> pd.DataFrame:
+    return query_position_matrix(cursor, lambda matrix: matrix.top_sectors(start_date, end_date, sectors, limit), latest_date)
+
+#The dashboard's (top companies, top sectors) query functions for `engine`
+def position_engine_queries(engine: str = POSITION_ENGINE) -> Tuple[Callable, Callable]:
+    if engine not in POSITION_ENGINES:
+        raise ValueError(f"Unknown position engine '{engine}', expected one of {', '.join(POSITION_ENGINES)}")
+    if engine == 'matrix':
+        return fetch_top_companies_matrix, fetch_top_sectors_matrix
+    return fetch_top_companies_rolling, fetch_top_sectors
@@ -0,0 +1,231 @@
+import datetime
+import functools
+import inspect
+import os
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional
+import pandas as pd
+from src.Backend.query_tracing import annotate
+
+QUERY_CACHE_MAX_MB = float(os.getenv('QUERY_CACHE_MAX_MB', '256'))
+QUERY_CACHE_TTL = float(os.getenv('QUERY_CACHE_TTL', '900'))
+QUERY_CACHE_FRESHNESS_INTERVAL = float(os.getenv('QUERY_CACHE_FRESHNESS_INTERVAL', '60'))
+
+#Process-wide LRU cache for query results, shared by every Streamlit session.
+#Entries expire after their TTL, the least recently used ones are evicted once the size budget is
+#exceeded, and everything is dropped when the freshness probe (the source MAX(DATE)) changes.
+#Concurrent misses on one key run the query once; the other callers wait for its result.
+class QueryCache:
+    def __init__(self, freshness_probe: Optional[Callable[[Any], Hashable]] = None,
+                 max_bytes: int = int(QUERY_CACHE_MAX_MB * 1024 * 1024), default_ttl: float = QUERY_CACHE_TTL,
+                 freshness_interval: float = QUERY_CACHE_FRESHNESS_INTERVAL):
+        self.freshness_probe = freshness_probe
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.freshness_interval = freshness_interval
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._loading: Dict[Hashable, Future] = {}  # key -> result of the query computing it
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._freshness_token = None
+        self._freshness_checked_at = None
+        self._counters = Counter()
+        self._hits = Counter()
+        self._misses = Counter()
+
+    #Decorator for query functions taking the cursor as first argument; the cursor is not part of the key
+    def cached(self, ttl: Optional[float] = None):
+        def decorator(func):
+            name = func.__qualname__
+            signature = inspect.signature(func)
+
+            @functools.wraps(func)
+            def wrapper(cursor, *args, **kwargs):
+                self.ensure_fresh(cursor)
+                # Bind against the signature so positional, keyword and defaulted calls share an entry
+                bound = signature.bind(cursor, *args, **kwargs)
+                bound.apply_defaults()
+                key = (name, _normalize(tuple(bound.arguments.items())[1:]))
+                found, value = self.get(key)
+                # Shown on the caller's trace span, so a fast query can be told apart from a cache hit
+                annotate(cache='hit' if found else 'miss')
+                if found:
+                    self._hits[name] += 1
+                    return _shallow_copy(value)
+                self._misses[name] += 1
+                return _shallow_copy(self._load(key, lambda: func(cursor, *args, **kwargs), ttl))
+
+            wrapper.uncached = func
+            return wrapper
+        return decorator
+
+    #Like `cached`, for batched queries whose second argument is a list of items (tickers, say) and whose
+    #result is a dict keyed by item: each item is cached on its own and only the missing ones are fetched
+    def cached_items(self, ttl: Optional[float] = None):
+        def decorator(func):
+            name = func.__qualname__
+            signature = inspect.signature(func)
+
+            @functools.wraps(func)
+            def wrapper(cursor, items, *args, **kwargs):
+                self.ensure_fresh(cursor)
+                bound = signature.bind(cursor, items, *args, **kwargs)
+                bound.apply_defaults()
+                rest = _normalize(tuple(bound.arguments.items())[2:])
+                items = list(dict.fromkeys(items))
+                results, missing = {}, []
+                for item in items:
+                    found, value = self.get((name, item, rest))
+                    if found:
+                        self._hits[name] += 1
+                        results[item] = value
+                    else:
+                        self._misses[name] += 1
+                        missing.append(item)
+                annotate(cache_hits=len(items) - len(missing), cache_misses=len(missing))
+                if missing:
+                    fetched = func(cursor, missing, *args, **kwargs)
+                    for item in missing:
+                        results[item] = fetched.get(item)
+                        self.set((name, item, rest), results[item], ttl)
+                return {item: _shallow_copy(results[item]) for item in items}
+
+            wrapper.uncached = func
+            return wrapper
+        return decorator
+
+    #Run the freshness probe at most once per interval and drop every entry if the data moved on
+    def ensure_fresh(self, cursor):
+        if self.freshness_probe is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if self._freshness_checked_at is not None and now - self._freshness_checked_at < self.freshness_interval:
+                return
+            self._freshness_checked_at = now
+        token = self.freshness_probe(cursor)
+        with self._lock:
+            if self._freshness_token is not None and token != self._freshness_token:
+                self._counters['invalidations'] += 1
+                self._clear_entries()
+            self._freshness_token = token
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            value, size, expires_at = entry
+            if time.monotonic() >= expires_at:
+                self._counters['expirations'] += 1
+                self._remove(key)
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            self._counters['oversized'] += 1
+            return
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._counters['evictions'] += 1
+
+    #Compute and store a missing entry, or wait for the caller already computing it
+    def _load(self, key, compute: Callable[[], Any], ttl: Optional[float]):
+        with self._lock:
+            found, value = self.get(key)
+            if found:
+                return value
+            loading = self._loading.get(key)
+            owner = loading is None
+            if owner:
+                loading = self._loading[key] = Future()
+            else:
+                self._counters['coalesced'] += 1
+        if not owner:
+            annotate(cache='coalesced')
+            return loading.result()
+        try:
+            value = compute()
+        except BaseException as e:
+            loading.set_exception(e)
+            raise
+        else:
+            self.set(key, value, ttl)
+            loading.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._clear_entries()
+            self._freshness_token = None
+            self._freshness_checked_at = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits, misses = sum(self._hits.values()), sum(self._misses.values())
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': hits,
+                'misses': misses,
+                'hit_ratio': hits / (hits + misses) if hits + misses else 0.0,
+                'freshness_token': self._freshness_token,
+                **{name: self._counters[name] for name in ('evictions', 'expirations', 'invalidations', 'oversized', 'coalesced')},
+                'by_function': {name: {'hits': self._hits[name], 'misses': self._misses[name]}
+                                for name in sorted(set(self._hits) | set(self._misses))},
+            }
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _clear_entries(self):
+        self._entries.clear()
+        self._bytes = 0
+
+#Sort key ordering values of any mix of types, e.g. a NaN among strings, without comparing across types
+def stable_sort_key(value):
+    return (type(value).__name__, repr(value))
+
+#Logically identical arguments map to the same key: list order and duplicates do not matter, dates compare by day
+def _normalize(value):
+    if isinstance(value, (list, set, frozenset)):
+        return tuple(sorted({_normalize(item) for item in value}, key=stable_sort_key))
+    if isinstance(value, tuple):
+        return tuple(_normalize(item) for item in value)
+    if isinstance(value, (datetime.date, pd.Timestamp)):
+        return pd.Timestamp(value).date().isoformat()
+    return value
+
+def _estimate_size(value) -> int:
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(deep=False).sum()) if isinstance(value, pd.DataFrame) else int(value.memory_usage(deep=False))
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(sys.getsizeof(item) for item in value)
+    return sys.getsizeof(value)
+
+#Callers can add, drop or rename columns on what they get back without touching the cached frame
+def _shallow_copy(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=False)
+    if isinstance(value, list):
+        return list(value)
+    return value
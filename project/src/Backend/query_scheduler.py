@@ -0,0 +1,55 @@
+import contextvars
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Hashable, Iterator, Optional, Sequence
+from src.Backend.snowflake_connection import ConnectionPool, get_connection_pool
+
+#Runs independent query functions concurrently, each on its own pooled connection.
+#Query functions take the cursor as first argument, like everything in data_queries.
+class QueryScheduler:
+    def __init__(self, pool: Optional[ConnectionPool] = None, max_workers: Optional[int] = None):
+        self.pool = pool or get_connection_pool()
+        # More workers than connections would only queue up inside the pool
+        self._executor = ThreadPoolExecutor(max_workers=max_workers or self.pool.max_size,
+                                            thread_name_prefix='query')
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        # The worker runs in the caller's context, so query spans nest under the caller's trace span
+        context = contextvars.copy_context()
+        return self._executor.submit(context.run, self._run, func, *args, **kwargs)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, func: Callable, *args, **kwargs):
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                return func(cursor, *args, **kwargs)
+            finally:
+                cursor.close()
+
+#Yield each name once all of its futures have finished, in the order that happens. Results and errors
+#stay with the futures, so a failed query raises where its result is read, not here.
+def as_ready(futures: Dict[Hashable, Sequence[Future]]) -> Iterator[Hashable]:
+    waiting = {name: set(group) for name, group in futures.items()}
+    pending = set().union(*waiting.values())
+    while waiting:
+        for name in [name for name, group in waiting.items() if not group]:
+            del waiting[name]
+            yield name
+        if waiting:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for group in waiting.values():
+                group -= done
+
+_scheduler: Optional[QueryScheduler] = None
+_scheduler_lock = threading.Lock()
+
+#Process-wide scheduler over the process-wide connection pool
+def get_query_scheduler() -> QueryScheduler:
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = QueryScheduler()
+        return _scheduler
@@ -0,0 +1,200 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+QUERY_TRACE_BUFFER = int(os.getenv('QUERY_TRACE_BUFFER', '1000'))
+# Optional JSON-lines file every finished span is appended to
+QUERY_TRACE_FILE = os.getenv('QUERY_TRACE_FILE')
+
+logger = logging.getLogger('bi_dashboard.tracing')
+
+#One timed unit of work: a page run, a section, a query function or a render.
+#Query spans collect the phases below from the data_queries helpers, summed over every query they run:
+#  execute_ms  cursor.execute() until the warehouse has the result (compile, queue and execution)
+#  fetch_ms    pulling the result batches to the client, with rows and bytes
+#  build_ms    converting the Arrow result to a DataFrame
+class Span:
+    def __init__(self, name: str, kind: str, trace_id: str, parent_id: Optional[str]):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+        self._start = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+
+    def add(self, key: str, value: float):
+        self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def append(self, key: str, value):
+        self.attributes.setdefault(key, []).append(value)
+
+    def finish(self, error: Optional[BaseException] = None):
+        self.duration_ms = (time.perf_counter() - self._start) * 1000
+        self.end_ns = self.start_ns + int(self.duration_ms * 1e6)
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+
+    #OpenTelemetry span layout (as in the OTLP JSON export), so the lines can be shipped to a collector as is
+    def to_otel(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_span_id': self.parent_id,
+            'start_time_unix_nano': self.start_ns,
+            'end_time_unix_nano': self.end_ns,
+            'attributes': {'bi.kind': self.kind, **self.attributes},
+            'status': {'code': 'ERROR', 'message': self.error} if self.error else {'code': 'OK'},
+        }
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar('current_span', default=None)
+
+#Keeps the most recent finished spans for the performance panel, and writes every finished span
+#as one JSON line to the 'bi_dashboard.tracing' logger and to QUERY_TRACE_FILE when set
+class Tracer:
+    def __init__(self, buffer: int = QUERY_TRACE_BUFFER, export_file: Optional[str] = QUERY_TRACE_FILE):
+        self._spans = deque(maxlen=buffer)
+        self._lock = threading.Lock()
+        self.export_file = export_file
+
+    #Time the block as a child of the current span, or as a new trace when there is none
+    @contextmanager
+    def span(self, name: str, kind: str = 'internal', **attributes) -> Iterator[Span]:
+        parent = _current_span.get()
+        span = Span(name, kind, parent.trace_id if parent else secrets.token_hex(16), parent.span_id if parent else None)
+        span.attributes.update(attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.finish(e)
+            raise
+        else:
+            span.finish()
+        finally:
+            _current_span.reset(token)
+            self._record(span)
+
+    def finished(self, limit: Optional[int] = None) -> List[Span]:
+        with self._lock:
+            spans = list(self._spans)
+        return spans if limit is None else spans[-limit:]
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+    def _record(self, span: Span):
+        line = export_spans([span]).rstrip('\n')
+        with self._lock:
+            self._spans.append(span)
+            if self.export_file:
+                with open(self.export_file, 'a') as f:
+                    f.write(line + '\n')
+        logger.info(line)
+
+# Shared by every session in the process
+tracer = Tracer()
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+#Set attributes on the current span; a no-op outside any span
+def annotate(**attributes):
+    span = _current_span.get()
+    if span is not None:
+        span.attributes.update(attributes)
+
+#Add to numeric attributes (rows, bytes) of the current span, summing over repeated calls
+def record(**values: float):
+    span = _current_span.get()
+    if span is not None:
+        for key, value in values.items():
+            span.add(key, value)
+
+#Add the block's duration to the current span's `<phase>_ms`
+@contextmanager
+def timed_phase(phase: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(**{f'{phase}_ms': (time.perf_counter() - start) * 1000})
+
+#Decorator running every call of `func` in a span of the given kind, named after the function
+def traced(kind: str) -> Callable:
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(func.__name__, kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+traced_query = traced('query')
+traced_render = traced('render')
+
+SPAN_COLUMNS = ['START', 'TRACE_ID', 'KIND', 'NAME', 'DURATION_MS', 'EXECUTE_MS', 'FETCH_MS', 'BUILD_MS',
+                'QUERIES', 'ROWS', 'BYTES', 'CACHE', 'QUERY_IDS', 'ERROR']
+
+#One row per span, newest first, for the performance panel.
+#pandas is imported here only: app.py imports this module before anything heavy is loaded.
+def spans_frame(spans: List[Span]) -> "pd.DataFrame":
+    import pandas as pd
+    rows = [{
+        'START': pd.Timestamp(span.start_ns, unit='ns', tz='UTC'),
+        'TRACE_ID': span.trace_id,
+        'KIND': span.kind,
+        'NAME': span.name,
+        'DURATION_MS': span.duration_ms,
+        'EXECUTE_MS': span.attributes.get('execute_ms'),
+        'FETCH_MS': span.attributes.get('fetch_ms'),
+        'BUILD_MS': span.attributes.get('build_ms'),
+        'QUERIES': span.attributes.get('queries'),
+        'ROWS': span.attributes.get('rows'),
+        'BYTES': span.attributes.get('bytes'),
+        'CACHE': span.attributes.get('cache'),
+        'QUERY_IDS': ', '.join(span.attributes.get('query_ids', [])),
+        'ERROR': span.error,
+    } for span in reversed(spans)]
+    return pd.DataFrame(rows, columns=SPAN_COLUMNS)
+
+#Per query function: calls, cache hit rate, latency percentiles and where the time went on average
+def summarize_spans(frame: "pd.DataFrame") -> "pd.DataFrame":
+    import pandas as pd
+    queries = frame[frame['KIND'] == 'query']
+    if queries.empty:
+        return pd.DataFrame(columns=['NAME', 'CALLS', 'CACHE_HIT_RATE', 'P50_MS', 'P95_MS', 'EXECUTE_MS', 'FETCH_MS', 'BUILD_MS', 'ROWS'])
+    # Uncached functions have no CACHE value and are left out of the hit rate
+    grouped = queries.assign(HIT=queries['CACHE'].map({'hit': 1.0, 'miss': 0.0})).groupby('NAME')
+    summary = grouped.agg(
+        CALLS=('DURATION_MS', 'size'),
+        CACHE_HIT_RATE=('HIT', 'mean'),
+        P50_MS=('DURATION_MS', 'median'),
+        P95_MS=('DURATION_MS', lambda durations: durations.quantile(0.95)),
+        EXECUTE_MS=('EXECUTE_MS', 'mean'),
+        FETCH_MS=('FETCH_MS', 'mean'),
+        BUILD_MS=('BUILD_MS', 'mean'),
+        ROWS=('ROWS', 'mean'),
+    )
+    return summary.sort_values('P95_MS', ascending=False).reset_index()
+
+#Finished spans as OpenTelemetry JSON lines, as written to QUERY_TRACE_FILE
+def export_spans(spans: List[Span]) -> str:
+    return ''.join(json.dumps(span.to_otel(), default=str) + '\n' for span in spans)
@@ -0,0 +1,139 @@
+import datetime
+import threading
+from collections import deque
+from typing import Dict, Optional
+import numpy as np
+import pandas as pd
+from src.Backend.data_queries import fetch_latest_date, fetch_latest_positions, fetch_position_aggregate
+from src.Backend.query_tracing import traced_query
+
+TOP_COMPANIES_COLUMNS = ['TICKER', 'SECTOR_NAME', 'SHARES', 'LAST_CLOSE_PRICE_USD', 'AVERAGE_POSITION_USD']
+
+#Per-company running sum and count of the daily position in USD over a trailing window
+#(one year back from today, as in TOP_QUARTILE_CTE). New days are added as the data advances and days
+#falling out of the window are subtracted, so the averages and the top quartile cost O(companies).
+class RollingPositionWindow:
+    def __init__(self, window: pd.DateOffset = pd.DateOffset(years=1)):
+        self.window = window
+        self.company_ids = np.empty(0, dtype=np.int64)
+        self._company_index = pd.Index(self.company_ids)
+        self._sums = np.zeros(0, dtype=np.float64)
+        self._counts = np.zeros(0, dtype=np.int64)
+        # (date, company slots, positions) of every day in the window, oldest first
+        self._days = deque()
+        self._latest = pd.DataFrame(columns=['COMPANY_ID', 'TICKER', 'SECTOR_NAME', 'SHARES', 'CLOSE_USD'])
+        self.checked_through: Optional[datetime.date] = None
+
+    @property
+    def start_date(self) -> datetime.date:
+        return (pd.Timestamp(datetime.date.today()) - self.window).date()
+
+    #Catch up with the source: add the days after the window's last one and drop those before its start
+    def refresh(self, cursor, latest_date) -> int:
+        latest_date = pd.Timestamp(latest_date).date()
+        start = self.start_date
+        self._evict_before(start)
+        if self.checked_through is not None and latest_date <= self.checked_through:
+            return 0
+        # The last loaded day is reloaded too: the materialization job rewrites it when late prices land
+        if self._days:
+            start = max(start, self._days[-1][0])
+            self._drop_last()
+        frame = fetch_position_aggregate(cursor, 'company_date', start_date=start)
+        dates = pd.to_datetime(frame['DATE']).dt.date.values
+        for positions in frame.groupby(dates, sort=True).indices.values():
+            self._add_day(dates[positions[0]], frame['COMPANY_ID'].values[positions],
+                          frame['TOTAL_POSITION_USD'].to_numpy(dtype=np.float64)[positions])
+        self._latest = fetch_latest_positions(cursor)
+        # Caught up with the materialized table, which can lag the source's latest date
+        self.checked_through = self._days[-1][0] if self._days else None
+        return len(frame)
+
+    #COMPANY_ID -> trailing average, for companies with at least one day in the window
+    def averages(self) -> pd.Series:
+        present = self._counts > 0
+        return pd.Series(self._sums[present] / self._counts[present], index=self.company_ids[present],
+                         name='AVERAGE_POSITION_USD')
+
+    #Same result as fetch_top_companies: the first NTILE(4) bucket by trailing average, with each
+    #company's latest shares and close; selected with a partition instead of a full sort
+    def top_quartile(self) -> pd.DataFrame:
+        averages = self.averages()
+        if averages.empty:
+            return pd.DataFrame(columns=TOP_COMPANIES_COLUMNS)
+        # NTILE(4) gives the remainder rows to the first buckets, so the top one holds ceil(n / 4)
+        k = -(-len(averages) // 4)
+        top = np.argpartition(-averages.values, k - 1)[:k]
+        top = averages.iloc[top]
+        latest = self._latest.set_index('COMPANY_ID')
+        top = top[top.index.isin(latest.index)].sort_values(ascending=False)
+        latest = latest.loc[top.index]
+        return pd.DataFrame({
+            'TICKER': latest['TICKER'].values,
+            'SECTOR_NAME': latest['SECTOR_NAME'].values,
+            'SHARES': latest['SHARES'].values,
+            'LAST_CLOSE_PRICE_USD': latest['CLOSE_USD'].values,
+            'AVERAGE_POSITION_USD': top.values,
+        })
+
+    def _add_day(self, date: datetime.date, company_ids: np.ndarray, positions: np.ndarray):
+        slots = self._slots_for(company_ids)
+        np.add.at(self._sums, slots, positions)
+        np.add.at(self._counts, slots, 1)
+        self._days.append((date, slots, positions))
+
+    def _drop_last(self):
+        _, slots, positions = self._days.pop()
+        self._subtract(slots, positions)
+
+    def _evict_before(self, start: datetime.date):
+        while self._days and self._days[0][0] < start:
+            _, slots, positions = self._days.popleft()
+            self._subtract(slots, positions)
+
+    def _subtract(self, slots: np.ndarray, positions: np.ndarray):
+        np.subtract.at(self._sums, slots, positions)
+        np.subtract.at(self._counts, slots, 1)
+        # Clear float residue once a company has no day left in the window
+        self._sums[self._counts == 0] = 0.0
+
+    def _slots_for(self, company_ids: np.ndarray) -> np.ndarray:
+        slots = self._company_index.get_indexer(company_ids)
+        if (slots < 0).any():
+            new_ids = pd.unique(company_ids[slots < 0]).astype(np.int64)
+            self.company_ids = np.concatenate([self.company_ids, new_ids])
+            self._company_index = pd.Index(self.company_ids)
+            self._sums = np.concatenate([self._sums, np.zeros(len(new_ids))])
+            self._counts = np.concatenate([self._counts, np.zeros(len(new_ids), dtype=np.int64)])
+            slots = self._company_index.get_indexer(company_ids)
+        return slots
+
+#KPI highlights of a top-quartile frame in one pass: company count, sector with the highest mean
+#average position and the largest average position
+def top_quartile_kpis(top_companies: pd.DataFrame) -> Dict[str, object]:
+    if top_companies.empty:
+        return {'total_companies': 0, 'top_sector': None, 'largest_position': float('nan')}
+    codes, sectors = pd.factorize(top_companies['SECTOR_NAME'])
+    averages = top_companies['AVERAGE_POSITION_USD'].to_numpy(dtype=np.float64)
+    known = codes >= 0
+    sector_means = (np.bincount(codes[known], weights=averages[known], minlength=len(sectors))
+                    / np.maximum(np.bincount(codes[known], minlength=len(sectors)), 1))
+    return {
+        'total_companies': len(top_companies),
+        'top_sector': sectors[int(np.argmax(sector_means))] if len(sectors) else None,
+        'largest_position': float(averages.max()),
+    }
+
+_window: Optional[RollingPositionWindow] = None
+_window_lock = threading.Lock()
+
+#Process-wide window, loaded on first use and advanced whenever the source's latest date moves
+@traced_query
+def fetch_top_companies_rolling(cursor) -> pd.DataFrame:
+    global _window
+    latest_date = fetch_latest_date(cursor)
+    with _window_lock:
+        if _window is None:
+            _window = RollingPositionWindow()
+        _window.refresh(cursor, latest_date)
+        return _window.top_quartile()
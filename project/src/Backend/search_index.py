@@ -0,0 +1,157 @@
+import bisect
+from collections import defaultdict
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+from src.Backend.data_queries import REFERENCE_DATA_TTL, cached_query, fetch_companies
+from src.Backend.query_tracing import traced_query
+
+SEARCH_FIELDS = ['TICKER', 'SECTOR_NAME']
+SUGGEST_MIN_SIMILARITY = 0.3
+SUGGESTION_LIMIT = 5
+
+# Match tiers, best first
+EXACT, PREFIX, SUBSTRING = range(3)
+
+#Case-insensitive ranked search over a frame's text columns, built once and queried on every keystroke.
+#Distinct values are kept in a sorted array, so a prefix is two binary searches. Substrings are looked up
+#in postings of every 1-, 2- and 3-character substring instead of scanning every value. Trigram
+#similarity only drives suggest(): a misspelt query offers close values but never matches rows.
+class SearchIndex:
+    def __init__(self, frame: pd.DataFrame, fields: List[str] = SEARCH_FIELDS):
+        self.frame = frame.reset_index(drop=True)
+        self._fields = list(fields)
+        # One entry per distinct (value, field); an entry maps to every row holding that value
+        entries = defaultdict(list)
+        values = {}
+        for field_rank, field in enumerate(fields):
+            originals = self.frame[field].astype(object).fillna('').astype(str)
+            for row, (original, value) in enumerate(zip(originals, originals.str.upper())):
+                if value:
+                    entries[(value, field_rank)].append(row)
+                    values.setdefault((value, field_rank), original)
+        ordered = sorted(entries)
+        self._keys = [key for key, _ in ordered]
+        self._values = [values[entry] for entry in ordered]
+        self._field_ranks = np.array([field_rank for _, field_rank in ordered], dtype=np.int64)
+        self._key_lengths = np.array([len(key) for key in self._keys], dtype=np.int64)
+        # Entries in result order within a tier: ticker before sector, shorter values first, then alphabetical
+        self._rank_order = np.lexsort((np.arange(len(ordered)), self._key_lengths, self._field_ranks))
+        self._rank_positions = np.empty(len(ordered), dtype=np.int64)
+        self._rank_positions[self._rank_order] = np.arange(len(ordered))
+        # Rows of entry i are _row_ids[_row_offsets[i]:_row_offsets[i + 1]]
+        sizes = np.array([len(entries[entry]) for entry in ordered], dtype=np.int64)
+        self._row_offsets = np.concatenate([[0], np.cumsum(sizes)])
+        self._row_ids = np.array([row for entry in ordered for row in entries[entry]], dtype=np.int64)
+
+        # Sorted entry ids per gram: every substring of up to 3 characters, plus the padded trigrams
+        postings = defaultdict(list)
+        self._gram_counts = np.zeros(len(ordered), dtype=np.int64)
+        for i, key in enumerate(self._keys):
+            grams = _trigrams(key)
+            self._gram_counts[i] = len(grams)
+            grams |= {key[start:start + n] for n in (1, 2) for start in range(len(key) - n + 1)}
+            for gram in grams:
+                postings[gram].append(i)
+        self._postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    @property
+    def nbytes(self) -> int:
+        return (int(self.frame.memory_usage(deep=True).sum())
+                + sum(len(key) for key in self._keys)
+                + self._row_ids.nbytes
+                + sum(ids.nbytes for ids in self._postings.values()))
+
+    #Rows whose value equals, starts with or contains `query`, best first in that order.
+    #Within a tier ticker matches come before sector matches and shorter values before longer ones.
+    def search(self, query: str, limit: Optional[int] = None) -> pd.DataFrame:
+        query = query.strip().upper()
+        if not query:
+            return self.frame if limit is None else self.frame.head(limit)
+
+        # Prefix matches are one contiguous run of the sorted keys
+        lo = bisect.bisect_left(self._keys, query)
+        hi = bisect.bisect_left(self._keys, query + '\uffff')
+        containing = self._containing(query)
+        containing = containing[(containing < lo) | (containing >= hi)]
+        entries = np.concatenate([np.arange(lo, hi), containing])
+        tiers = np.concatenate([np.where(self._key_lengths[lo:hi] == len(query), EXACT, PREFIX),
+                                np.full(len(containing), SUBSTRING)])
+        entries = self._ranked(entries, tiers)
+
+        sizes = self._row_offsets[entries + 1] - self._row_offsets[entries]
+        if limit is not None and len(entries):
+            # A row is reachable through at most one value per field, so this many rows always cover `limit`
+            cut = int(np.searchsorted(np.cumsum(sizes), limit * len(self._fields))) + 1
+            entries, sizes = entries[:cut], sizes[:cut]
+        starts = np.repeat(self._row_offsets[entries] - np.cumsum(sizes) + sizes, sizes)
+        rows = self._row_ids[starts + np.arange(sizes.sum())]
+        # A row matched through several values keeps its best rank
+        positions = np.arange(len(rows))
+        best = np.full(len(self.frame), len(rows), dtype=np.int64)
+        np.minimum.at(best, rows, positions)
+        rows = rows[best[rows] == positions]
+        if limit is not None:
+            rows = rows[:limit]
+        return self.frame.iloc[rows]
+
+    #Values resembling `query` by trigram similarity, best first, for a "did you mean" hint.
+    #Values containing the query are left out, search() already returns them.
+    def suggest(self, query: str, limit: int = SUGGESTION_LIMIT) -> List[str]:
+        query = query.strip().upper()
+        grams = _trigrams(query)
+        known = [self._postings[gram] for gram in grams if gram in self._postings]
+        if not query or not known:
+            return []
+        shared = np.bincount(np.concatenate(known), minlength=len(self._keys))
+        candidates = np.flatnonzero(shared)
+        similarity = shared[candidates] / (len(grams) + self._gram_counts[candidates] - shared[candidates])
+        keep = similarity >= SUGGEST_MIN_SIMILARITY
+        candidates, similarity = candidates[keep], similarity[keep]
+        order = np.lexsort((self._key_lengths[candidates], self._field_ranks[candidates], -similarity))
+        suggestions = []
+        for entry in candidates[order]:
+            if query not in self._keys[entry] and self._values[entry] not in suggestions:
+                suggestions.append(self._values[entry])
+                if len(suggestions) == limit:
+                    break
+        return suggestions
+
+    #`entries` ordered by tier, then by their precomputed rank within a tier
+    def _ranked(self, entries: np.ndarray, tiers: np.ndarray) -> np.ndarray:
+        if len(entries) * 8 < len(self._keys):
+            # Few matches: sort them by (tier, rank) packed into one integer
+            packed = np.sort((tiers.astype(np.int64) << 32) | self._rank_positions[entries])
+            return self._rank_order[packed & 0xFFFFFFFF]
+        # Many matches: walk every entry in rank order once, then a stable (radix) sort by tier
+        by_entry = np.full(len(self._keys), -1, dtype=np.int8)
+        by_entry[entries] = tiers
+        by_rank = by_entry[self._rank_order]
+        matched = by_rank >= 0
+        return self._rank_order[matched][np.argsort(by_rank[matched], kind='stable')]
+
+    #Entries whose value contains `query`. Up to 3 characters that is one postings list; longer queries
+    #intersect the lists of their trigrams, rarest first, and check the few candidates left.
+    def _containing(self, query: str) -> np.ndarray:
+        if len(query) <= 3:
+            return self._postings.get(query, np.empty(0, dtype=np.int32))
+        lists = [self._postings.get(query[i:i + 3]) for i in range(len(query) - 2)]
+        if any(ids is None for ids in lists):
+            return np.empty(0, dtype=np.int32)
+        lists.sort(key=len)
+        candidates = lists[0]
+        for ids in lists[1:]:
+            found = np.searchsorted(ids, candidates)
+            candidates = candidates[ids[np.minimum(found, len(ids) - 1)] == candidates]
+        return np.array([entry for entry in candidates if query in self._keys[entry]], dtype=np.int32)
+
+#Trigrams of a value padded like pg_trgm, so short values and word starts still produce grams
+def _trigrams(value: str) -> set:
+    padded = f"  {value} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+#Index over the company dimension, rebuilt whenever the query cache drops it on a data refresh
+@traced_query
+@cached_query(ttl=REFERENCE_DATA_TTL)
+def fetch_company_search_index(cursor) -> SearchIndex:
+    return SearchIndex(fetch_companies(cursor))
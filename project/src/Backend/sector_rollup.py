@@ -0,0 +1,119 @@
+import threading
+from typing import List, Optional
+import numpy as np
+import pandas as pd
+from src.Backend.data_queries import fetch_position_aggregate
+from src.Backend.query_tracing import traced_query
+
+#In-memory sectors x dates cube of total position in USD with prefix sums over dates,
+#so the total of any date range for any sector subset costs O(sectors) instead of a warehouse query.
+class SectorRollup:
+    def __init__(self, sectors: List[str], dates: np.ndarray, totals: np.ndarray, counts: np.ndarray):
+        self.sectors = list(sectors)
+        self.dates = dates.astype('datetime64[D]')
+        self._sector_index = {sector: i for i, sector in enumerate(self.sectors)}
+        # Column j of a prefix array holds the sum over dates[:j]
+        self._total_prefix = _prefix_sum(totals)
+        self._count_prefix = _prefix_sum(counts)
+        self.checked_through: Optional[np.datetime64] = self.latest_date
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> "SectorRollup":
+        # `frame` is the 'sector_date' aggregate: DATE, SECTOR_NAME, TOTAL_POSITION_USD
+        dates = pd.to_datetime(frame['DATE']).values.astype('datetime64[D]')
+        cube = pd.DataFrame({'DATE': dates, 'SECTOR_NAME': frame['SECTOR_NAME'], 'TOTAL': frame['TOTAL_POSITION_USD']})
+        # observed: a categorical SECTOR_NAME would otherwise add a row for every sector of the dimension
+        totals = cube.pivot_table(index='SECTOR_NAME', columns='DATE', values='TOTAL', aggfunc='sum', fill_value=0.0, observed=True)
+        counts = cube.pivot_table(index='SECTOR_NAME', columns='DATE', values='TOTAL', aggfunc='count', fill_value=0, observed=True)
+        return cls(totals.index.tolist(), totals.columns.values, totals.to_numpy(dtype='float64'), counts.to_numpy(dtype='int64'))
+
+    @classmethod
+    def load(cls, cursor) -> "SectorRollup":
+        return cls.from_frame(fetch_position_aggregate(cursor, 'sector_date'))
+
+    @property
+    def latest_date(self) -> Optional[np.datetime64]:
+        return self.dates[-1] if len(self.dates) else None
+
+    #Reload the cube's last date and append the dates after it; returns the number of dates loaded
+    def refresh(self, cursor, latest_date) -> int:
+        latest_date = np.datetime64(pd.Timestamp(latest_date).date(), 'D')
+        if self.checked_through is not None and latest_date <= self.checked_through:
+            return 0
+        # The last loaded date is reloaded too: the materialization job rewrites it when late prices land
+        start = None if self.latest_date is None else str(self.latest_date)
+        delta = SectorRollup.from_frame(fetch_position_aggregate(cursor, 'sector_date', start_date=start))
+        self._drop_last_date()
+        self._extend(delta)
+        # Caught up with the materialized table, which can lag the source's latest date
+        self.checked_through = self.latest_date
+        return len(delta.dates)
+
+    def totals(self, start_date, end_date, sectors: Optional[List[str]] = None) -> pd.DataFrame:
+        start = np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start_date).date(), 'D'), side='left')
+        end = np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end_date).date(), 'D'), side='right')
+        rows = [self._sector_index[s] for s in sectors if s in self._sector_index] if sectors is not None else list(range(len(self.sectors)))
+        totals = self._total_prefix[rows, end] - self._total_prefix[rows, start]
+        counts = self._count_prefix[rows, end] - self._count_prefix[rows, start]
+        result = pd.DataFrame({'SECTOR_NAME': [self.sectors[i] for i in rows], 'TOTAL_POSITION_USD': totals})
+        # Sectors without any position in the range are left out, as the SQL aggregate would
+        return result[counts > 0].reset_index(drop=True)
+
+    #Same result as calculate_top_sectors, answered from memory
+    def top_sectors(self, start_date, end_date, sectors: List[str], limit: int = 10) -> pd.DataFrame:
+        if not sectors:
+            return pd.DataFrame(columns=['SECTOR_NAME', 'TOTAL_POSITION_USD'])
+        totals = self.totals(start_date, end_date, sectors)
+        return totals.sort_values('TOTAL_POSITION_USD', ascending=False).head(limit).reset_index(drop=True)
+
+    def _drop_last_date(self):
+        if not len(self.dates):
+            return
+        self._total_prefix = self._total_prefix[:, :-1]
+        self._count_prefix = self._count_prefix[:, :-1]
+        self.dates = self.dates[:-1]
+
+    def _extend(self, delta: "SectorRollup"):
+        if not len(delta.dates):
+            return
+        new_sectors = [sector for sector in delta.sectors if sector not in self._sector_index]
+        sectors = self.sectors + new_sectors
+        index = {sector: i for i, sector in enumerate(sectors)}
+        rows = [index[sector] for sector in delta.sectors]
+
+        def extend(prefix: np.ndarray, delta_prefix: np.ndarray) -> np.ndarray:
+            # Pad with zero rows for new sectors, then continue each row's running sum over the new dates
+            grown = np.zeros((len(sectors), prefix.shape[1] + len(delta.dates)), dtype=prefix.dtype)
+            grown[:len(self.sectors), :prefix.shape[1]] = prefix
+            grown[:, prefix.shape[1]:] = grown[:, prefix.shape[1] - 1:prefix.shape[1]]
+            grown[rows, prefix.shape[1]:] += delta_prefix[:, 1:]
+            return grown
+
+        self._total_prefix = extend(self._total_prefix, delta._total_prefix)
+        self._count_prefix = extend(self._count_prefix, delta._count_prefix)
+        self.sectors = sectors
+        self._sector_index = index
+        self.dates = np.concatenate([self.dates, delta.dates])
+
+def _prefix_sum(values: np.ndarray) -> np.ndarray:
+    prefix = np.zeros((values.shape[0], values.shape[1] + 1), dtype=values.dtype)
+    np.cumsum(values, axis=1, out=prefix[:, 1:])
+    return prefix
+
+_rollup: Optional[SectorRollup] = None
+_rollup_lock = threading.Lock()
+
+#Process-wide rollup, loaded on first use and extended whenever the source's latest date advances
+def get_sector_rollup(cursor, latest_date) -> SectorRollup:
+    global _rollup
+    with _rollup_lock:
+        if _rollup is None:
+            _rollup = SectorRollup.load(cursor)
+        else:
+            _rollup.refresh(cursor, latest_date)
+        return _rollup
+
+#Query-function shaped entry point, so the top sectors can be scheduled like any other query
+@traced_query
+def fetch_top_sectors(cursor, latest_date, start_date, end_date, sectors: List[str], limit: int = 10) -> pd.DataFrame:
+    return get_sector_rollup(cursor, latest_date).top_sectors(start_date, end_date, sectors, limit)
@@ -1,10 +1,32 @@
 import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
 from dotenv import load_dotenv
-import snowflake.connector
 
 load_dotenv()
 
+# 'snowflake' queries the warehouse, 'duckdb' runs the same queries in-process over the local Parquet cache
+DATA_BACKEND = os.getenv('DATA_BACKEND', 'snowflake').lower()
+# How the dashboard names each backend to the user
+BACKEND_NAMES = {'snowflake': 'Snowflake', 'duckdb': 'the local DuckDB cache'}
+
+POOL_SIZE = int(os.getenv('SNOWFLAKE_POOL_SIZE', '4'))
+POOL_TIMEOUT = float(os.getenv('SNOWFLAKE_POOL_TIMEOUT', '30'))
+POOL_HEALTH_CHECK_INTERVAL = float(os.getenv('SNOWFLAKE_POOL_HEALTH_CHECK_INTERVAL', '60'))
+
+# Tags every dashboard query so it can be found in QUERY_HISTORY
+QUERY_TAG = os.getenv('SNOWFLAKE_QUERY_TAG', 'bi_dashboard')
+
+# Snowflake error codes raised when the session token is no longer valid
+SESSION_EXPIRED_ERRNOS = {390111, 390112, 390114}
+
 def get_snowflake_connection():
+    # Imported on first connect rather than with this module: the connector alone takes about a second,
+    # which would otherwise hold up the first page render
+    import snowflake.connector
     conn = snowflake.connector.connect(
         user=os.getenv('SNOWFLAKE_USER'),
         password=os.getenv('SNOWFLAKE_PASSWORD'),
@@ -12,6 +34,175 @@ def get_snowflake_connection():
         warehouse=os.getenv('SNOWFLAKE_WAREHOUSE'),
         database=os.getenv('SNOWFLAKE_DATABASE'),
         schema=os.getenv('SNOWFLAKE_SCHEMA'),
-        role=os.getenv('SNOWFLAKE_ROLE')
+        role=os.getenv('SNOWFLAKE_ROLE'),
+        client_session_keep_alive=True,
+        # Bind ? parameters server side so the query text, and with it the result cache key, stays stable
+        paramstyle='qmark',
+        session_parameters={'QUERY_TAG': QUERY_TAG}
     )
-    return conn 
\ No newline at end of file
+    return conn
+
+#Connection for the configured DATA_BACKEND; both expose the cursor API used by data_queries
+def get_connection():
+    if DATA_BACKEND == 'snowflake':
+        return get_snowflake_connection()
+    if DATA_BACKEND == 'duckdb':
+        from src.Backend.duckdb_backend import get_duckdb_connection
+        return get_duckdb_connection()
+    raise ValueError(f"Unsupported DATA_BACKEND '{DATA_BACKEND}', expected 'snowflake' or 'duckdb'")
+
+class PoolTimeoutError(Exception):
+    pass
+
+class ConnectionPool:
+    # Bounded pool of connections shared by every Streamlit session in the process.
+    # `connect` is any zero-argument factory, so a fake connector can be plugged in.
+    def __init__(self, connect: Callable = get_connection, max_size: int = POOL_SIZE,
+                 timeout: float = POOL_TIMEOUT, health_check_interval: float = POOL_HEALTH_CHECK_INTERVAL):
+        self._connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._idle = deque()  # (connection, monotonic time of last successful use)
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._metrics = {
+            'checkouts': 0,
+            'created': 0,
+            'reconnects': 0,
+            'timeouts': 0,
+            'total_wait_s': 0.0,
+            'max_wait_s': 0.0,
+        }
+
+    def acquire(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        conn, last_used = None, None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    # Reserve the slot now, open the connection outside the lock
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._metrics['timeouts'] += 1
+                    raise PoolTimeoutError(f"No connection available after {self.timeout:.1f}s")
+                self._cond.wait(remaining)
+
+        try:
+            if conn is None:
+                conn = self._open()
+            elif not self._is_healthy(conn, last_used):
+                self._close_quietly(conn)
+                conn = self._open()
+                with self._cond:
+                    self._metrics['reconnects'] += 1
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self._metrics['checkouts'] += 1
+            self._metrics['total_wait_s'] += waited
+            self._metrics['max_wait_s'] = max(self._metrics['max_wait_s'], waited)
+        return conn
+
+    def release(self, conn, discard: bool = False):
+        with self._cond:
+            if discard or self._closed or _is_closed(conn):
+                self._size -= 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+                conn = None
+            self._cond.notify()
+        if conn is not None:
+            self._close_quietly(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        discard = False
+        try:
+            yield conn
+        except Exception as e:
+            # snowflake.connector errors carry the Snowflake error code as errno
+            discard = getattr(e, 'errno', None) in SESSION_EXPIRED_ERRNOS
+            raise
+        finally:
+            self.release(conn, discard=discard)
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            stats = dict(self._metrics)
+            stats['max_size'] = self.max_size
+            stats['size'] = self._size
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._size - len(self._idle)
+        stats['avg_wait_s'] = stats['total_wait_s'] / stats['checkouts'] if stats['checkouts'] else 0.0
+        return stats
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._size -= len(idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in idle:
+            self._close_quietly(conn)
+
+    def _open(self):
+        conn = self._connect()
+        with self._cond:
+            self._metrics['created'] += 1
+        return conn
+
+    def _is_healthy(self, conn, last_used: float) -> bool:
+        if _is_closed(conn):
+            return False
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        # Idle for a while: make sure the session has not expired server side
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def _is_closed(conn) -> bool:
+    is_closed = getattr(conn, 'is_closed', None)
+    return bool(is_closed()) if callable(is_closed) else False
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+#Process-wide pool, created on first use and reused across Streamlit reruns and sessions
+def get_connection_pool() -> ConnectionPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool()
+        return _pool
@@ -0,0 +1,49 @@
+import os
+import threading
+from concurrent.futures import Future
+from typing import Dict, Optional
+from src.Backend.data_queries import (
+    fetch_company_list, fetch_latest_date, fetch_sector_list, fetch_timeseries_downsampled
+)
+from src.Backend.position_matrix import POSITION_ENGINE, get_position_matrix, position_engine_queries
+from src.Backend.query_scheduler import get_query_scheduler
+from src.Backend.search_index import fetch_company_search_index
+from src.Backend.sector_rollup import get_sector_rollup
+
+# Set to 0 to skip the warm-up, e.g. where every process is short-lived
+CACHE_WARM_UP = os.getenv('CACHE_WARM_UP', '1').lower() in ('1', 'true', 'yes')
+
+#Load whichever structure answers the top sectors
+def _warm_position_engine(cursor):
+    if POSITION_ENGINE == 'matrix':
+        return get_position_matrix(cursor)
+    return get_sector_rollup(cursor, fetch_latest_date(cursor))
+
+#The chart's default selection is the first company
+def _warm_default_timeseries(cursor):
+    return fetch_timeseries_downsampled(cursor, fetch_company_list(cursor)[:1])
+
+# What the first page needs before it can render anything beyond its shell
+WARM_UP_QUERIES = [
+    fetch_latest_date,
+    fetch_sector_list,
+    fetch_company_list,
+    position_engine_queries()[0],
+    fetch_company_search_index,
+    _warm_position_engine,
+    _warm_default_timeseries,
+]
+
+_warm_up: Optional[Dict[str, Future]] = None
+_warm_up_lock = threading.Lock()
+
+#Open the pool's connections and fill the critical caches in the background, once per process.
+#Streamlit has no server-start hook, so this runs on the first script run; the page then submits
+#the same queries and, through the query cache, waits on these instead of running them again.
+def start_warm_up() -> Dict[str, Future]:
+    global _warm_up
+    with _warm_up_lock:
+        if _warm_up is None:
+            scheduler = get_query_scheduler()
+            _warm_up = {func.__name__: scheduler.submit(func) for func in WARM_UP_QUERIES} if CACHE_WARM_UP else {}
+        return _warm_up
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Tests import the app's modules as `src.Backend.*`, as app.py does when run from project/
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
@@ -0,0 +1,75 @@
+from datetime import date, timedelta
+import duckdb
+import pandas as pd
+import pytest
+from src.Backend.aggregators import CompanyAggregator, DailyTotalAggregator, SectorDailyAggregator, consume
+from src.Backend.batch_reports import run_reports, stream_sector_daily, stream_top_quartile_positions
+from src.Backend.data_queries import (
+    fetch_company_sectors, fetch_position_aggregate, fetch_top_quartile_positions, iter_daily_position, query_cache,
+    reset_company_dimension
+)
+from src.Backend.duckdb_backend import DuckDBConnection, get_duckdb_connection
+from src.Backend.local_cache import LocalSourceCache
+
+TODAY = date.today()
+# Ten recent days and one outside the trailing year, which the per-company averages leave out
+DATES = [TODAY - timedelta(days=400)] + [TODAY - timedelta(days=i) for i in range(10, 0, -1)]
+
+#Parquet cache of 9 companies over DATES behind the DuckDB backend; company 9 has no sector and
+#company 10 has positions but no row in source.company
+@pytest.fixture
+def conn(tmp_path):
+    source = duckdb.connect()
+    source.execute("CREATE SCHEMA source")
+    source.execute("CREATE TABLE source.company (ID BIGINT, TICKER VARCHAR, SECTOR_NAME VARCHAR)")
+    source.execute("CREATE TABLE source.price (COMPANY_ID BIGINT, DATE DATE, CLOSE_USD DOUBLE)")
+    source.execute("CREATE TABLE source.position (COMPANY_ID BIGINT, DATE DATE, SHARES DOUBLE)")
+    sectors = ['Energy', 'Utilities', 'Materials']
+    for company in range(1, 10):
+        source.execute("INSERT INTO source.company VALUES (?, ?, ?)",
+                       [company, f"T{company}", sectors[company % 3] if company != 9 else None])
+    for i, day in enumerate(DATES):
+        for company in range(1, 11):
+            source.execute("INSERT INTO source.price VALUES (?, ?, ?)", [company, day, 10.0 + company + i])
+            source.execute("INSERT INTO source.position VALUES (?, ?, ?)", [company, day, 100.0 * company + i])
+    LocalSourceCache(str(tmp_path)).sync(DuckDBConnection(source).cursor())
+    query_cache.clear()
+    reset_company_dimension()
+    yield get_duckdb_connection(str(tmp_path))
+    query_cache.clear()
+    reset_company_dimension()
+
+def test_daily_and_sector_totals_match_sql(conn):
+    cursor = conn.cursor()
+    daily, sector_daily = consume(iter_daily_position(cursor, batch_rows=7), DailyTotalAggregator(),
+                                  SectorDailyAggregator(fetch_company_sectors(cursor)))
+    pd.testing.assert_frame_equal(daily.result(), fetch_position_aggregate.uncached(cursor, 'date'), check_dtype=False)
+    expected = fetch_position_aggregate.uncached(cursor, 'sector_date')
+    result = sector_daily.result()
+    assert 'UNKNOWN' in set(result['SECTOR_NAME'])
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+def test_company_averages_start_at_start_date(conn):
+    cursor = conn.cursor()
+    companies, = consume(iter_daily_position(cursor, batch_rows=7), CompanyAggregator(DATES[1]))
+    result = companies.result().set_index('COMPANY_ID')
+    assert (result['DAYS'] == len(DATES) - 1).all()
+    frame = pd.concat(iter_daily_position(cursor))
+    recent = frame[frame['DATE'] >= pd.Timestamp(DATES[1])]
+    pd.testing.assert_series_equal(result['AVERAGE_POSITION_USD'], recent.groupby('COMPANY_ID')['DAILY_POSITION_USD'].mean(),
+                                   check_names=False)
+
+def test_streamed_reports_match_sql(conn):
+    cursor = conn.cursor()
+    pd.testing.assert_frame_equal(stream_top_quartile_positions(cursor), fetch_top_quartile_positions.uncached(cursor),
+                                  check_dtype=False)
+    assert len(stream_sector_daily(cursor)) == len(fetch_position_aggregate.uncached(cursor, 'sector_date'))
+
+def test_run_reports_stream_engine(conn, tmp_path):
+    results = run_reports(['ex1', 'ex2', 'ex3'], str(tmp_path / 'stream'), ['parquet'], conn=conn, engine='stream')
+    expected = run_reports(['ex1', 'ex2', 'ex3'], str(tmp_path / 'sql'), ['parquet'], conn=conn, engine='sql')
+    for name in ('ex1', 'ex2', 'ex3'):
+        assert results[name]['rows'] == expected[name]['rows']
+        streamed = pd.read_parquet(tmp_path / 'stream' / f"{name}.parquet")
+        queried = pd.read_parquet(tmp_path / 'sql' / f"{name}.parquet")
+        pd.testing.assert_frame_equal(streamed, queried, check_dtype=False)
@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+from src.Backend.analytics import compact_rows, compute_analytics, daily_returns, log_returns
+
+def test_compact_rows():
+    values = np.array([[1.0, np.nan, 2.0, 3.0],
+                       [np.nan, 4.0, np.nan, np.nan]])
+    compact, positions, slots = compact_rows(values)
+    np.testing.assert_array_equal(compact, [[1.0, 2.0, 3.0], [4.0, np.nan, np.nan]])
+    restored = np.full(values.shape, np.nan)
+    restored[positions] = compact[slots]
+    np.testing.assert_array_equal(restored, values)
+
+def test_windows_count_each_rows_own_observations():
+    rng = np.random.default_rng(7)
+    prices = rng.uniform(50, 150, (3, 60))
+    prices[0, ::3] = np.nan
+    prices[1, :10] = np.nan
+    compact, _, slots = compact_rows(prices)
+    analytics = compute_analytics(compact, 5)
+    for row in range(len(prices)):
+        series = pd.Series(prices[row]).dropna().reset_index(drop=True)
+        log_return = np.log(series / series.shift())
+        own = slots[0] == row
+        np.testing.assert_allclose(analytics['ROLLING_MEAN'][row, slots[1][own]], series.rolling(5).mean())
+        np.testing.assert_allclose(analytics['ROLLING_VOLATILITY'][row, slots[1][own]],
+                                   log_return.rolling(5).std() * np.sqrt(252))
+
+def test_returns_are_nan_where_sql_gives_null():
+    prices = np.array([[10.0, 0.0, 5.0, 5.0]])
+    np.testing.assert_array_equal(daily_returns(prices), [[np.nan, -1.0, np.nan, 0.0]])
+    np.testing.assert_array_equal(log_returns(prices), [[np.nan, np.nan, np.nan, 0.0]])
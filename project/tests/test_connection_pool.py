@@ -0,0 +1,174 @@
+import threading
+import time
+import pytest
+from src.Backend.snowflake_connection import SESSION_EXPIRED_ERRNOS, ConnectionPool, PoolTimeoutError
+
+#Stands in for a SnowflakeConnection: counts health checks and can be made to fail them
+class FakeConnection:
+    def __init__(self, number: int):
+        self.number = number
+        self.closed = False
+        self.healthy = True
+        self.health_checks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def is_closed(self) -> bool:
+        return self.closed
+
+    def close(self):
+        self.closed = True
+
+class FakeCursor:
+    def __init__(self, conn: FakeConnection):
+        self._conn = conn
+
+    def execute(self, query):
+        self._conn.health_checks += 1
+        if not self._conn.healthy:
+            raise ConnectionError("session gone")
+
+    def fetchone(self):
+        return (1,)
+
+    def close(self):
+        pass
+
+class FakeConnector:
+    def __init__(self):
+        self.opened = []
+
+    def __call__(self) -> FakeConnection:
+        self.opened.append(FakeConnection(len(self.opened)))
+        return self.opened[-1]
+
+class SnowflakeError(Exception):
+    def __init__(self, errno: int):
+        super().__init__(f"error {errno}")
+        self.errno = errno
+
+@pytest.fixture
+def connector():
+    return FakeConnector()
+
+def test_released_connection_is_reused(connector):
+    pool = ConnectionPool(connector, max_size=2, timeout=1)
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    assert len(connector.opened) == 1
+
+def test_opens_up_to_max_size(connector):
+    pool = ConnectionPool(connector, max_size=2, timeout=0.05)
+    first, second = pool.acquire(), pool.acquire()
+    assert first is not second
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    assert len(connector.opened) == 2
+
+def test_timeout_is_counted(connector):
+    pool = ConnectionPool(connector, max_size=1, timeout=0.05)
+    pool.acquire()
+    start = time.monotonic()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+    assert time.monotonic() - start >= 0.05
+    assert pool.stats()['timeouts'] == 1
+
+def test_waiter_gets_released_connection(connector):
+    pool = ConnectionPool(connector, max_size=1, timeout=5)
+    conn = pool.acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+    waiter.start()
+    time.sleep(0.05)
+    assert not acquired
+    pool.release(conn)
+    waiter.join(timeout=5)
+    assert acquired == [conn]
+    assert pool.stats()['max_wait_s'] > 0
+
+@pytest.mark.parametrize('errno', sorted(SESSION_EXPIRED_ERRNOS))
+def test_expired_session_is_discarded(connector, errno):
+    pool = ConnectionPool(connector, max_size=1, timeout=1)
+    with pytest.raises(SnowflakeError):
+        with pool.connection() as conn:
+            raise SnowflakeError(errno)
+    assert conn.closed
+    assert pool.stats()['size'] == 0
+    assert pool.acquire() is not conn
+
+def test_other_errors_keep_the_connection(connector):
+    pool = ConnectionPool(connector, max_size=1, timeout=1)
+    with pytest.raises(SnowflakeError):
+        with pool.connection() as conn:
+            raise SnowflakeError(2003)
+    assert not conn.closed
+    assert pool.acquire() is conn
+
+def test_closed_connection_is_replaced(connector):
+    pool = ConnectionPool(connector, max_size=1, timeout=1)
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.close()
+    assert pool.acquire() is not conn
+    assert pool.stats()['size'] == 1
+
+def test_idle_connection_is_health_checked(connector):
+    pool = ConnectionPool(connector, max_size=1, timeout=1, health_check_interval=0)
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    assert conn.health_checks == 1
+    pool.release(conn)
+    conn.healthy = False
+    replacement = pool.acquire()
+    assert replacement is not conn and conn.closed
+    assert pool.stats()['reconnects'] == 1
+
+def test_recently_used_connection_skips_health_check(connector):
+    pool = ConnectionPool(connector, max_size=1, timeout=1, health_check_interval=60)
+    conn = pool.acquire()
+    pool.release(conn)
+    pool.acquire()
+    assert conn.health_checks == 0
+
+def test_failed_connect_frees_its_slot():
+    attempts = []
+
+    def connect():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("warehouse unreachable")
+        return FakeConnection(len(attempts))
+
+    pool = ConnectionPool(connect, max_size=1, timeout=0.05)
+    with pytest.raises(ConnectionError):
+        pool.acquire()
+    assert pool.acquire().number == 2
+
+def test_stats(connector):
+    pool = ConnectionPool(connector, max_size=3, timeout=1)
+    first, second = pool.acquire(), pool.acquire()
+    pool.release(first)
+    stats = pool.stats()
+    assert stats['max_size'] == 3
+    assert stats['size'] == 2
+    assert stats['idle'] == 1
+    assert stats['in_use'] == 1
+    assert stats['checkouts'] == 2
+    assert stats['created'] == 2
+    assert stats['avg_wait_s'] == pytest.approx(stats['total_wait_s'] / 2)
+
+def test_close_closes_idle_and_refuses_acquire(connector):
+    pool = ConnectionPool(connector, max_size=2, timeout=1)
+    idle, busy = pool.acquire(), pool.acquire()
+    pool.release(idle)
+    pool.close()
+    assert idle.closed
+    # A connection checked out at close time is closed on release
+    pool.release(busy)
+    assert busy.closed
+    with pytest.raises(RuntimeError):
+        pool.acquire()
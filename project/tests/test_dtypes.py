@@ -0,0 +1,45 @@
+import duckdb
+import pyarrow as pa
+import pytest
+from src.Backend.data_queries import company_dimension, fetch_companies, fetch_sector_list, reset_company_dimension
+from src.Backend.duckdb_backend import DuckDBConnection
+from src.Backend.dtypes import UNKNOWN_SECTOR, CompanyDimension
+
+@pytest.fixture
+def source():
+    conn = duckdb.connect()
+    conn.execute("CREATE SCHEMA source")
+    conn.execute("CREATE TABLE source.company (ID BIGINT, TICKER VARCHAR, SECTOR_NAME VARCHAR)")
+    conn.execute("INSERT INTO source.company VALUES (1, 'AAA', 'Energy'), (2, 'BBB', 'Utilities'), (3, 'CCC', NULL)")
+    reset_company_dimension()
+    yield DuckDBConnection(conn)
+    reset_company_dimension()
+
+def test_encode_reports_values_missing_from_chunked_columns():
+    dimension = CompanyDimension({'TICKER': pa.array(['AAA', 'BBB']), 'SECTOR_NAME': pa.array(['Energy', UNKNOWN_SECTOR])})
+    table = pa.Table.from_batches([pa.record_batch({'TICKER': ['AAA', 'NEW'], 'SECTOR_NAME': ['Energy', None]}),
+                                   pa.record_batch({'TICKER': ['NEW', None], 'SECTOR_NAME': ['Energy', 'Energy']})])
+    encoded, missing = dimension.encode(table)
+    assert missing['TICKER'].to_pylist() == ['NEW']
+    assert encoded['TICKER'].type == pa.string()
+    assert pa.types.is_dictionary(encoded['SECTOR_NAME'].type)
+    assert encoded['SECTOR_NAME'].to_pylist() == ['Energy', None, 'Energy', 'Energy']
+
+def test_dimension_reloads_for_companies_added_after_the_first_encode(source):
+    cursor = source.cursor()
+    first = fetch_companies.uncached(cursor)
+    assert 'NEWCO' not in first['TICKER'].cat.categories
+    source._conn.execute("INSERT INTO source.company VALUES (999, 'NEWCO', 'Brand New')")
+
+    companies = fetch_companies.uncached(cursor)
+    dimension = company_dimension(cursor)
+    assert 'NEWCO' in dimension.dtypes['TICKER'].categories
+    assert 'Brand New' in dimension.dtypes['SECTOR_NAME'].categories
+    assert companies['TICKER'].dtype == dimension.dtypes['TICKER']
+    assert companies['SECTOR_NAME'].dtype == dimension.dtypes['SECTOR_NAME']
+    new = companies[companies['ID'] == 999].iloc[0]
+    assert (new['TICKER'], new['SECTOR_NAME']) == ('NEWCO', 'Brand New')
+    assert companies.set_index('ID')['TICKER'].astype(str).to_dict() == {1: 'AAA', 2: 'BBB', 3: 'CCC', 999: 'NEWCO'}
+
+def test_sector_list_leaves_out_null_sectors(source):
+    assert sorted(fetch_sector_list.uncached(source.cursor())) == ['Energy', 'Utilities']
@@ -0,0 +1,103 @@
+import threading
+from datetime import date, datetime
+import duckdb
+import pytest
+from src.Backend.duckdb_backend import DuckDBConnection, get_duckdb_connection, translate_sql
+from src.Backend.local_cache import LocalSourceCache
+from src.Backend.materialization import DAILY_POSITION_TABLE
+from src.Backend.snowflake_connection import ConnectionPool
+
+DATES = [date(2024, 1, 30), date(2024, 1, 31), date(2024, 2, 1)]
+
+#Parquet cache synced from a small in-memory source: 3 companies over 3 days, company 3 without prices
+@pytest.fixture
+def cache_dir(tmp_path):
+    source = duckdb.connect()
+    source.execute("CREATE SCHEMA source")
+    source.execute("CREATE TABLE source.company (ID BIGINT, TICKER VARCHAR, SECTOR_NAME VARCHAR)")
+    source.execute("INSERT INTO source.company VALUES (1, 'AAA', 'Energy'), (2, 'BBB', 'Utilities'), (3, 'CCC', 'Energy')")
+    source.execute("CREATE TABLE source.price (COMPANY_ID BIGINT, DATE DATE, CLOSE_USD DOUBLE)")
+    source.execute("CREATE TABLE source.position (COMPANY_ID BIGINT, DATE DATE, SHARES DOUBLE)")
+    for i, day in enumerate(DATES):
+        source.execute("INSERT INTO source.price VALUES (1, ?, ?), (2, ?, ?)", [day, 10.0 + i, day, 20.0 + i])
+        source.execute("INSERT INTO source.position VALUES (1, ?, 100), (2, ?, NULL), (3, ?, 50)", [day, day, day])
+    LocalSourceCache(str(tmp_path)).sync(DuckDBConnection(source).cursor())
+    return str(tmp_path)
+
+def fetch(conn: DuckDBConnection, query: str, params=None):
+    cursor = conn.cursor()
+    try:
+        return cursor.execute(query, params).fetchall()
+    finally:
+        cursor.close()
+
+def test_translate_sql():
+    assert translate_sql("SELECT DATEADD(year, -1, CURRENT_DATE())") == "SELECT DATEADD('year', -1, CURRENT_DATE)"
+    assert translate_sql("SELECT dateadd( DAY , 1, d)") == "SELECT DATEADD('DAY', 1, d)"
+
+def test_empty_cache_raises(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        get_duckdb_connection(str(tmp_path / 'missing'))
+
+def test_source_views_read_the_cache(cache_dir):
+    conn = get_duckdb_connection(cache_dir)
+    assert fetch(conn, "SELECT COUNT(*) FROM source.company") == [(3,)]
+    assert fetch(conn, "SELECT COUNT(*) FROM source.price") == [(6,)]
+    assert fetch(conn, "SELECT MIN(DATE), MAX(DATE) FROM source.position") == [(DATES[0], DATES[-1])]
+
+def test_daily_position_is_materialized(cache_dir):
+    conn = get_duckdb_connection(cache_dir)
+    rows = fetch(conn, f"""
+    SELECT COMPANY_ID, TICKER, SHARES, CLOSE_USD, DAILY_POSITION_USD
+    FROM {DAILY_POSITION_TABLE}
+    WHERE DATE = ?
+    ORDER BY COMPANY_ID
+    """, [DATES[-1]])
+    # Company 3 has no prices, missing shares count as 0
+    assert rows == [(1, 'AAA', 100.0, 12.0, 1200.0), (2, 'BBB', 0.0, 22.0, 0.0)]
+
+def test_snowflake_syntax_runs(cache_dir):
+    conn = get_duckdb_connection(cache_dir)
+    assert fetch(conn, "SELECT DATEADD(day, 1, MAX(DATE)) FROM source.price") == [(datetime(2024, 2, 2),)]
+    assert fetch(conn, "SELECT CURRENT_DATE() >= MAX(DATE) FROM source.price") == [(True,)]
+
+def test_arrow_batches(cache_dir):
+    cursor = get_duckdb_connection(cache_dir).cursor()
+    cursor.execute("SELECT COMPANY_ID, DATE FROM source.position ORDER BY COMPANY_ID, DATE")
+    tables = list(cursor.fetch_arrow_batches())
+    assert sum(table.num_rows for table in tables) == 9
+    assert tables[0].column_names == ['COMPANY_ID', 'DATE']
+    assert cursor.description[0][0] == 'COMPANY_ID'
+
+def test_connections_share_one_database(cache_dir):
+    first, second = get_duckdb_connection(cache_dir), get_duckdb_connection(cache_dir)
+    fetch(first, "CREATE TABLE scratch AS SELECT 1 AS X")
+    assert fetch(second, "SELECT X FROM scratch") == [(1,)]
+    # Materialized once, not once per connection
+    assert fetch(second, f"SELECT COUNT(*) FROM {DAILY_POSITION_TABLE}") == [(6,)]
+
+def test_closing_a_connection_keeps_the_database(cache_dir):
+    first = get_duckdb_connection(cache_dir)
+    first.close()
+    assert first.is_closed()
+    assert fetch(get_duckdb_connection(cache_dir), "SELECT COUNT(*) FROM source.company") == [(3,)]
+
+def test_pooled_connections_query_concurrently(cache_dir):
+    pool = ConnectionPool(lambda: get_duckdb_connection(cache_dir), max_size=4, timeout=5)
+    results, errors = [], []
+
+    def worker():
+        try:
+            with pool.connection() as conn:
+                results.append(fetch(conn, f"SELECT SUM(DAILY_POSITION_USD) FROM {DAILY_POSITION_TABLE}")[0][0])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert results == [3300.0] * 8
+    pool.close()
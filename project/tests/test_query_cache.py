@@ -0,0 +1,25 @@
+import math
+import pytest
+from src.Backend.data_queries import bind_in_list
+from src.Backend.query_cache import QueryCache
+
+def test_list_arguments_with_mixed_types_share_a_key():
+    cache = QueryCache()
+    calls = []
+
+    @cache.cached()
+    def query(cursor, sectors):
+        calls.append(sectors)
+        return len(sectors)
+
+    assert query(None, ['Energy', math.nan, 'Utilities']) == 3
+    assert query(None, ['Utilities', 'Energy', math.nan]) == 3
+    assert len(calls) == 1
+
+def test_bind_in_list_sorts_mixed_types():
+    placeholders, params = bind_in_list(['b', None, 'a', 'b'])
+    assert placeholders == '?, ?, ?, ?'
+    assert params[:3] == sorted(params[:3], key=lambda v: (type(v).__name__, repr(v)))
+    assert set(params) == {'a', 'b', None}
+    with pytest.raises(ValueError):
+        bind_in_list([])
@@ -0,0 +1,43 @@
+import threading
+from concurrent.futures import Future
+import pytest
+from src.Backend.query_scheduler import as_ready
+
+def resolve_later(future: Future, event: threading.Event, value=None, error=None):
+    def run():
+        event.wait(5)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(value)
+    threading.Thread(target=run).start()
+
+def test_names_are_yielded_in_completion_order():
+    slow, fast = Future(), Future()
+    release_slow, release_fast = threading.Event(), threading.Event()
+    resolve_later(slow, release_slow, 1)
+    resolve_later(fast, release_fast, 2)
+    ready = as_ready({'first': [slow], 'second': [fast]})
+    release_fast.set()
+    assert next(ready) == 'second'
+    release_slow.set()
+    assert next(ready) == 'first'
+    with pytest.raises(StopIteration):
+        next(ready)
+
+def test_name_waits_for_all_of_its_futures():
+    done, later = Future(), Future()
+    done.set_result(None)
+    release = threading.Event()
+    resolve_later(later, release)
+    ready = as_ready({'both': [done, later], 'one': [done]})
+    assert next(ready) == 'one'
+    release.set()
+    assert next(ready) == 'both'
+
+def test_names_without_futures_and_failures_are_yielded():
+    failed = Future()
+    failed.set_exception(RuntimeError("query failed"))
+    assert sorted(as_ready({'none': [], 'failed': [failed]})) == ['failed', 'none']
+    with pytest.raises(RuntimeError):
+        failed.result()
@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+from src.Backend.search_index import SearchIndex
+
+@pytest.fixture
+def index():
+    return SearchIndex(pd.DataFrame({
+        'TICKER': ['AAP', 'AAPL', 'GOOG', 'JPM', 'MS', 'MSFT', 'SLB', 'TSLA'],
+        'SECTOR_NAME': pd.Categorical(['Consumer', 'Technology', 'Technology', 'Financials', 'Financials',
+                                       'Technology', 'Energy', None]),
+    }))
+
+def tickers(frame: pd.DataFrame) -> list:
+    return frame['TICKER'].tolist()
+
+def test_ranks_exact_then_prefix_then_substring(index):
+    assert tickers(index.search('aap')) == ['AAP', 'AAPL']
+    assert tickers(index.search('MS')) == ['MS', 'MSFT']
+    assert tickers(index.search('sl')) == ['SLB', 'TSLA']
+
+@pytest.mark.parametrize('query, expected', [
+    ('PM', ['JPM']),
+    ('OO', ['GOOG']),
+    ('l', ['SLB', 'AAPL', 'TSLA', 'JPM', 'MS', 'GOOG', 'MSFT']),
+    ('oog', ['GOOG']),
+    ('OLOG', ['AAPL', 'GOOG', 'MSFT']),
+])
+def test_substrings_of_any_length(index, query, expected):
+    assert tickers(index.search(query)) == expected
+
+def test_matches_str_contains(index):
+    frame = index.frame
+    for query in ['A', 'S', 'T', 'NA', 'ECH', 'NCIAL', 'GY', 'Z']:
+        expected = frame[frame['TICKER'].str.contains(query, case=False)
+                         | frame['SECTOR_NAME'].astype(str).str.contains(query, case=False)]
+        assert set(index.search(query).index) == set(expected.index)
+
+def test_misspellings_match_nothing(index):
+    assert index.search('MSFTX').empty
+    assert index.search('tecnology').empty
+
+def test_suggest(index):
+    assert index.suggest('tecnology') == ['Technology']
+    # Values already matched are not suggested
+    assert 'MSFT' not in index.suggest('MSFT')
+    assert index.suggest('') == []
+
+def test_limit_and_empty_query(index):
+    assert tickers(index.search('a', limit=2)) == ['AAP', 'AAPL']
+    assert len(index.search('  ')) == len(index.frame)